@@ -0,0 +1,144 @@
+import uuid, os, time, zipfile
+from typing import List, Optional
+from fastapi import APIRouter, UploadFile, File, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+from fastapi.concurrency import run_in_threadpool
+from app.core.security import verify_api_key, key_fingerprint
+from app.core.config import BATCH_MAX_FILES, BATCH_QUEUE_SIZE
+from app.api.convert import submit_upload, queue_full_error, image_options
+from app.services.job_queue import create_batch, get_batch, count_jobs
+from app.services.temp_manager import get_temp
+from app.services.uploads import UploadTooLargeError
+from app.services.output_store import StorageFullError
+from app.services.storage import storage
+from app.services.zip_stream import stream_zip
+
+router = APIRouter()
+
+TERMINAL_STATUSES = ("completed", "failed")
+
+@router.post("/batch")
+async def convert_batch(
+    target_format: str,
+    files: List[UploadFile] = File(...),
+    options: Optional[dict] = Depends(image_options),
+    api_key: str = Depends(verify_api_key)
+):
+    """Convert many files (or the members of one .zip upload) to target_format under a single batch id.
+
+    Image options (see POST /api/convert) apply to every file; non-image files are rejected when there are any.
+    """
+    # A single .zip upload is expanded into its members; reading its directory blocks, so off the event loop
+    if len(files) == 1 and files[0].filename.lower().endswith(".zip"):
+        archive = await run_in_threadpool(_open_archive, files[0].file)
+        members = [m for m in archive.infolist() if not m.is_dir() and not os.path.basename(m.filename).startswith(".")]
+        sources = [(os.path.basename(m.filename), lambda m=m: archive.open(m)) for m in members]
+    else:
+        archive = None
+        sources = [(f.filename, lambda f=f: f.file) for f in files]
+
+    accepted, rejected = [], []
+    try:
+        if len(sources) > BATCH_MAX_FILES:
+            raise HTTPException(status_code=400,
+                                detail=f"Too many files in batch ({len(sources)} > {BATCH_MAX_FILES})")
+        # Admitted whole or not at all, so a client never has to resubmit half a batch
+        if await run_in_threadpool(count_jobs, "queued", batch=True) + len(sources) > BATCH_QUEUE_SIZE:
+            raise queue_full_error()
+
+        batch_id = str(uuid.uuid4())
+        await run_in_threadpool(create_batch, batch_id, target_format)
+
+        for filename, open_source in sources:
+            src = await run_in_threadpool(open_source)
+            try:
+                result = await submit_upload(src, filename, target_format, batch_id=batch_id,
+                                             api_key_id=key_fingerprint(api_key), options=options)
+                accepted.append({"filename": filename, **result})
+            except (ValueError, UploadTooLargeError, StorageFullError) as e:
+                rejected.append({"filename": filename, "error": str(e)})
+            finally:
+                if archive is not None:
+                    src.close()
+    finally:
+        if archive is not None:
+            archive.close()
+
+    return {
+        "batch_id": batch_id,
+        "accepted": len(accepted),
+        "rejected": rejected,
+        "tasks": accepted
+    }
+
+def _open_archive(upload):
+    if not zipfile.is_zipfile(upload):
+        raise HTTPException(status_code=400, detail="Uploaded .zip is not a valid ZIP archive")
+    upload.seek(0)
+    return zipfile.ZipFile(upload)
+
+@router.get("/batch/{batch_id}")
+def get_batch_status(batch_id: str):
+    """Per-file and overall progress of a batch"""
+    batch = _load_batch(batch_id)
+    jobs = batch["jobs"]
+    counts = {}
+    for job in jobs:
+        counts[job["status"]] = counts.get(job["status"], 0) + 1
+
+    finished = all(job["status"] in TERMINAL_STATUSES for job in jobs)
+    return {
+        "batch_id": batch_id,
+        "target_format": batch["target_format"],
+        "total": len(jobs),
+        "counts": counts,
+        "finished": finished,
+        "download_url": f"/api/batch/{batch_id}/download" if finished and counts.get("completed") else None,
+        "tasks": [
+            {"task_id": job["task_id"], "filename": job["filename"], "status": job["status"], "error": job["error"]}
+            for job in jobs
+        ]
+    }
+
+@router.get("/batch/{batch_id}/download")
+def download_batch(batch_id: str, partial: bool = False):
+    """Stream every completed output of the batch as one ZIP, built while it is sent"""
+    batch = _load_batch(batch_id)
+    jobs = batch["jobs"]
+    if not partial and not all(job["status"] in TERMINAL_STATUSES for job in jobs):
+        raise HTTPException(status_code=409, detail="Batch is still running; pass partial=true to download finished files now")
+
+    entries = []
+    used_names = set()
+    now = time.time()
+    for job in jobs:
+        if job["status"] != "completed":
+            continue
+        row = get_temp(job["task_id"])
+        if not row or now > row[1]:
+            continue
+        try:
+            key = storage.locate(row[0])[0]
+        except FileNotFoundError:
+            continue
+        stem = os.path.splitext(job["filename"])[0] or job["task_id"]
+        name = f"{stem}.{batch['target_format']}"
+        if name in used_names:
+            name = f"{stem}_{job['task_id'][:8]}.{batch['target_format']}"
+        used_names.add(name)
+        entries.append((name, key))
+
+    if not entries:
+        raise HTTPException(status_code=404, detail="No converted files available for this batch")
+
+    return StreamingResponse(
+        stream_zip(entries),
+        media_type="application/zip",
+        headers={"Content-Disposition": f"attachment; filename=batch_{batch_id}.zip"}
+    )
+
+def _load_batch(batch_id):
+    batch = get_batch(batch_id)
+    if batch is None:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    return batch
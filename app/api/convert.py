@@ -1,211 +1,267 @@
-import uuid, shutil, os
-from fastapi import APIRouter, UploadFile, BackgroundTasks, Depends
-from app.core.security import verify_api_key
-from app.services.image_converter import convert_image
-from app.services.document_converter import pdf_to_docx, txt_to_docx, docx_to_txt, docx_to_pptx
-from app.services.spreadsheet_converter import convert_spreadsheet
-from app.services.presentation_converter import convert_presentation
+import uuid, os, time
+import asyncio
+from typing import Literal, Optional
+from fastapi import APIRouter, UploadFile, Depends, HTTPException, Response
+from fastapi.concurrency import run_in_threadpool
+from app.core.security import verify_api_key, key_fingerprint
+from app.core.config import CONVERSION_QUEUE_SIZE, CONVERSION_RETRY_AFTER_SECONDS, SYNC_MAX_BYTES, SYNC_MAX_CONCURRENCY
+from app.services.job_queue import enqueue_job, count_jobs
+from app.services.job_dispatcher import job_dispatcher
+from app.services.pipeline import (registry, plan_conversion, job_options, file_extension, resize_options,
+                                   AUDIO_AVAILABLE, VIDEO_AVAILABLE)
+from app.services import result_cache
+from app.services.result_cache import make_cache_key
+from app.services.uploads import save_upload, hash_file, UploadTooLargeError
 from app.services.temp_manager import save_temp
+from app.services.output_store import output_store, StorageFullError
+from app.services.storage import storage, input_key, output_key
+from app.services.precompress import store_variants
+from app.services.image_encoding import encoder_options
+from app.services.media_types import media_type_for
+from app.services.metrics import metrics
 from app.core.firebase import update_job
 
-# Optional imports for audio/video (may not be available on all platforms)
-try:
-    from app.services.audio_converter import convert_audio
-    AUDIO_AVAILABLE = True
-except ImportError:
-    AUDIO_AVAILABLE = False
-    print("Audio conversion not available - missing dependencies")
+router = APIRouter()
 
-try:
-    from app.services.video_converter import convert_video, extract_audio_from_video
-    VIDEO_AVAILABLE = True
-except ImportError:
-    VIDEO_AVAILABLE = False
-    print("Video conversion not available - missing dependencies")
+# Caps how many inline conversions share the API process with request handling
+_inline_slots = asyncio.Semaphore(SYNC_MAX_CONCURRENCY)
 
-router = APIRouter()
+def image_options(
+    width: Optional[int] = None,
+    height: Optional[int] = None,
+    fit: Optional[Literal["contain", "cover", "fill"]] = None,
+    thumbnail: Optional[int] = None,
+    profile: Optional[Literal["fast", "balanced", "smallest"]] = None,
+    quality: Optional[int] = None,
+    progressive: Optional[bool] = None,
+    subsampling: Optional[str] = None,
+    optimize: Optional[bool] = None,
+    compress_level: Optional[int] = None,
+    method: Optional[int] = None,
+    lossless: Optional[bool] = None,
+    compression: Optional[str] = None
+):
+    """Converter options from the query string, or None when there are none.
+
+    Images can be resized on the way: width and/or height with fit (contain, cover
+    or fill), or thumbnail for the longest side, which never enlarges. profile
+    (fast, balanced, smallest) picks encoder settings; quality, progressive,
+    subsampling (JPEG), optimize, compress_level (PNG), method, lossless (WebP) and
+    compression (TIFF) override it for the formats they apply to.
+    """
+    try:
+        options = {
+            **(resize_options(width, height, fit, thumbnail) or {}),
+            **(encoder_options(profile, quality=quality, progressive=progressive, subsampling=subsampling,
+                               optimize=optimize, compress_level=compress_level, method=method,
+                               lossless=lossless, compression=compression) or {})
+        }
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return options or None
 
 @router.post("/convert")
 async def convert_file(
-    background_tasks: BackgroundTasks,
     file: UploadFile,
     target_format: str,
-    _: str = Depends(verify_api_key)
+    response: Response,
+    sync: bool = False,
+    options: Optional[dict] = Depends(image_options),
+    api_key: str = Depends(verify_api_key)
 ):
-    task_id = str(uuid.uuid4())
-    input_path = f"app/storage/input/{task_id}_{file.filename}"
-    output_path = f"app/storage/output/{task_id}.{target_format}"
+    """Queue a conversion and return its task_id.
+
+    With sync=true, small uploads with an in-memory converter are converted right
+    away and the converted bytes are returned in this response instead. Anything
+    else falls back to the normal queued flow (check the X-Conversion-Mode header).
+    Image conversions take resize and encoder options (see image_options).
+    """
+    if sync:
+        inline = await convert_inline(file, target_format, options)
+        if inline is not None:
+            return inline
+        response.headers["X-Conversion-Mode"] = "queued"
     
-    with open(input_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+    # Fail fast before touching the upload when the backlog is already full. Batch jobs
+    # have their own limit (BATCH_QUEUE_SIZE), so a large batch doesn't lock out single uploads.
+    if await run_in_threadpool(count_jobs, "queued", batch=False) >= CONVERSION_QUEUE_SIZE:
+        raise queue_full_error()
     
-    update_job(task_id, {"status": "processing"})
+    try:
+        return await submit_upload(file.file, file.filename, target_format, api_key_id=key_fingerprint(api_key),
+                                   options=options)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except StorageFullError as e:
+        raise HTTPException(status_code=507, detail=str(e))
+
+async def convert_inline(file, target_format, options=None):
+    """Convert a small upload in memory. Returns None when it has to go through the queue."""
+    if file.size is None or file.size > SYNC_MAX_BYTES or _inline_slots.locked():
+        return None
+    try:
+        route = plan_conversion(os.path.basename(file.filename or ""), target_format, options)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if len(route) != 1 or not route[0].in_memory:
+        return None
+    options = job_options(route, target_format, options)
     
-    def process():
+    converter = route[0]
+    async with _inline_slots:
+        data = await file.read()
+        metrics.inc("nodeblack_upload_bytes_total", len(data), source=converter.source)
         try:
-            print(f"Processing file: {file.filename} -> {target_format}")
-            print(f"Input path: {input_path}")
-            print(f"Output path: {output_path}")
-            
-            # Ensure output directory exists
-            os.makedirs(os.path.dirname(output_path), exist_ok=True)
-            
-            file_ext = file.filename.lower().split('.')[-1] if '.' in file.filename else ''
-            
-            print(f"🔍 Debug: file_ext='{file_ext}', target_format='{target_format.lower()}'")
-            
-            # Image conversions
-            if file_ext in ["png", "jpg", "jpeg", "webp", "bmp", "tiff", "gif"]:
-                print("📸 Processing as image conversion")
-                convert_image(input_path, output_path, target_format)
-            
-            # Document conversions
-            elif file_ext == "pdf" and target_format.lower() == "docx":
-                print("📄 Processing PDF to DOCX")
-                pdf_to_docx(input_path, output_path)
-            elif file_ext == "txt" and target_format.lower() == "docx":
-                print("📝 Processing TXT to DOCX")
-                txt_to_docx(input_path, output_path)
-            elif file_ext == "txt" and target_format.lower() == "pptx":
-                print("📝 Processing TXT to PPTX")
-                from app.services.document_converter import txt_to_pptx
-                txt_to_pptx(input_path, output_path)
-            elif file_ext == "docx" and target_format.lower() == "txt":
-                print("📄 Processing DOCX to TXT")
-                docx_to_txt(input_path, output_path)
-            elif file_ext == "docx" and target_format.lower() == "pptx":
-                print("📄 Processing DOCX to PPTX")
-                docx_to_pptx(input_path, output_path)
-            
-            # Audio conversions
-            elif file_ext in ["mp3", "wav", "ogg", "flac", "aac", "m4a", "wma"]:
-                print("🎵 Processing audio conversion")
-                if AUDIO_AVAILABLE:
-                    convert_audio(input_path, output_path, target_format)
-                else:
-                    raise ValueError(f"Audio conversion not available on this server. Supported conversions: Images (PNG↔JPG↔WEBP), Documents (PDF→DOCX, TXT→DOCX/PPTX, DOCX→TXT/PPTX), Spreadsheets (CSV↔XLSX↔JSON), Presentations (PPTX↔TXT)")
-            
-            # Spreadsheet conversions
-            elif file_ext in ["csv", "xlsx", "xls"] and target_format.lower() in ["csv", "xlsx", "xls", "json", "html"]:
-                convert_spreadsheet(input_path, output_path, target_format)
-            
-            # Presentation conversions
-            elif file_ext == "pptx" and target_format.lower() in ["txt", "json"]:
-                convert_presentation(input_path, output_path, target_format)
-            elif file_ext == "txt" and target_format.lower() == "pptx":
-                convert_presentation(input_path, output_path, target_format)
-            
-            # Video conversions
-            elif file_ext in ["mp4", "avi", "mov", "webm", "mkv", "flv"]:
-                print("🎬 Processing video conversion")
-                if VIDEO_AVAILABLE:
-                    if target_format.lower() in ["mp4", "avi", "mov", "webm", "gif"]:
-                        convert_video(input_path, output_path, target_format)
-                    elif target_format.lower() in ["mp3", "wav"]:
-                        # Extract audio from video
-                        extract_audio_from_video(input_path, output_path)
-                    else:
-                        raise ValueError(f"Unsupported video conversion: {file_ext} -> {target_format}")
-                else:
-                    raise ValueError(f"Video conversion not available on this server. Supported conversions: Images (PNG↔JPG↔WEBP), Documents (PDF→DOCX, TXT→DOCX/PPTX, DOCX→TXT/PPTX), Spreadsheets (CSV↔XLSX↔JSON), Presentations (PPTX↔TXT)")
-            
-            else:
-                raise ValueError(f"Unsupported conversion: {file_ext} -> {target_format}")
-            
-            # Check if output file was created
-            if not os.path.exists(output_path):
-                raise FileNotFoundError(f"Conversion failed - output file not created: {output_path}")
-            
-            print(f"Conversion successful: {output_path}")
-            save_temp(task_id, output_path)
-            update_job(task_id, {
-                "status": "completed",
-                "download_url": f"/api/download/{task_id}"
-            })
-            
-            # Clean up input file
-            try:
-                os.remove(input_path)
-            except:
-                pass
-                
+            with metrics.time("nodeblack_stage_duration_seconds", stage="inline", source=converter.source,
+                              target=converter.target, converter=converter.name):
+                output = await run_in_threadpool(converter.run_bytes, data, options)
         except Exception as e:
-            print(f"Conversion error: {str(e)}")
-            update_job(task_id, {
-                "status": "failed",
-                "error": str(e)
-            })
-            # Clean up input file on error
-            try:
-                os.remove(input_path)
-            except:
-                pass
+            raise HTTPException(status_code=422, detail=f"Conversion failed: {str(e)}")
+    
+    target = target_format.lower()
+    return Response(
+        content=output,
+        media_type=media_type_for(target),
+        headers={
+            "Content-Disposition": f"attachment; filename=converted.{target}",
+            "X-Conversion-Mode": "inline"
+        }
+    )
+
+async def submit_upload(src, filename, target_format, batch_id=None, api_key_id=None, options=None):
+    """Store one upload and queue its conversion, or complete it straight from the result cache.
+
+    Raises ValueError for unsupported conversions, UploadTooLargeError for oversized files
+    and StorageFullError when the output could never fit in the output store.
+    """
+    received_at = time.time()
+    filename = os.path.basename(filename or "")
+    route = plan_conversion(filename, target_format, options)
+    # Also what the worker gets, so it encodes what the cache key says whatever its own default profile
+    options = job_options(route, target_format, options)
+    
+    task_id = str(uuid.uuid4())
+    # Storage keys; the job row keeps them in its input_path/output_path columns
+    input_path = input_key(task_id, filename)
+    output_path = output_key(task_id, target_format)
+    staged_input = storage.staging_path(input_path)
+    
+    labels = {"source": file_extension(filename), "target": target_format.lower()}
+    
+    # Copy in chunks on a worker thread so big uploads don't block the event loop
+    with metrics.time("nodeblack_stage_duration_seconds", stage="upload", converter="", **labels):
+        size, content_hash = await run_in_threadpool(save_upload, src, staged_input)
+    metrics.inc("nodeblack_upload_bytes_total", size, source=labels["source"])
+    
+    # Same bytes, same target: hand out the stored result instead of converting again
+    cache_key = make_cache_key(content_hash, target_format, options)
+    job = dict(task_id=task_id, input_path=input_path, output_path=output_path, filename=filename,
+               target_format=target_format, cache_key=cache_key, batch_id=batch_id, api_key_id=api_key_id,
+               received_at=received_at, options=options)
+    # The cache, the database and storage all block, so each branch runs on a worker thread
+    if await run_in_threadpool(_complete_from_cache, staged_input, **job):
+        metrics.inc("nodeblack_jobs_total", outcome="cached", **labels)
+        return {"task_id": task_id, "cached": True}
+    await run_in_threadpool(_queue_upload, staged_input, size, **job)
+    job_dispatcher.notify()
     
-    background_tasks.add_task(process)
     return {"task_id": task_id}
 
+def _complete_from_cache(staged_input, task_id, input_path, output_path, filename, target_format, cache_key,
+                         batch_id, api_key_id, received_at, options):
+    """Store the cached result as this job's output and record the job completed. False on a cache miss."""
+    staged_output = storage.staging_path(output_path)
+    # Precompressed variants come out of the cache with the output, so a hit compresses nothing
+    variants = result_cache.lookup(cache_key, staged_output)
+    if variants is None:
+        return False
+    os.remove(staged_input)
+    output_hash = hash_file(staged_output)
+    storage.put(output_path, staged_output)
+    encodings = store_variants(output_path, variants)
+    save_temp(task_id, output_path, api_key_id=api_key_id, content_hash=output_hash, encodings=encodings)
+    enqueue_job(task_id, input_path, output_path, filename, target_format, cache_key,
+                batch_id=batch_id, status="completed", api_key_id=api_key_id, received_at=received_at,
+                options=options)
+    update_job(task_id, {"status": "completed", "download_url": f"/api/download/{task_id}"})
+    return True
+
+def _queue_upload(staged_input, size, task_id, input_path, output_path, filename, target_format, cache_key,
+                  batch_id, api_key_id, received_at, options):
+    """Store the upload and queue its conversion"""
+    # Outputs that merely don't fit yet wait in the queue; ones that never could are refused now
+    estimated_bytes = output_store.estimate(size, target_format)
+    if not output_store.fits_ever(estimated_bytes):
+        os.remove(staged_input)
+        raise StorageFullError(f"Not enough storage for the converted file (~{estimated_bytes // (1024 * 1024)}MB)")
+    storage.put(input_path, staged_input)
+    
+    # The job is durable from here on: a restart before conversion just leaves it queued
+    enqueue_job(task_id, input_path, output_path, filename, target_format, cache_key,
+                batch_id=batch_id, api_key_id=api_key_id, received_at=received_at, estimated_bytes=estimated_bytes,
+                options=options)
+    update_job(task_id, {"status": "queued"})
+
+def queue_full_error():
+    return HTTPException(
+        status_code=429,
+        detail="Conversion queue is full, retry later",
+        headers={"Retry-After": str(CONVERSION_RETRY_AFTER_SECONDS)}
+    )
+
+@router.get("/cache/stats")
+def get_cache_stats():
+    """Result cache size and hit/miss counters"""
+    return result_cache.cache_stats()
+
 @router.get("/formats")
 def get_supported_formats():
-    """Get all supported file formats and conversions"""
+    """Get all supported file formats and conversions (generated from the converter registry)"""
+    supported = {}
+    for category, conversions in registry.categories().items():
+        entry = {
+            "input_formats": list(conversions),
+            "output_formats": sorted({target for targets in conversions.values() for target in targets})
+        }
+        for source, targets in conversions.items():
+            entry[f"{source}_to"] = targets
+        supported[category] = entry
+    
+    multi_hop = {}
+    for conversions in registry.categories().values():
+        for source in conversions:
+            targets = registry.multi_hop_targets(source)
+            if targets:
+                multi_hop[source] = targets
+    
     formats = {
-        "supported_conversions": {
-            "images": {
-                "input_formats": ["png", "jpg", "jpeg", "webp", "bmp", "tiff", "gif"],
-                "output_formats": ["png", "jpg", "jpeg", "webp", "bmp", "tiff"]
-            },
-            "documents": {
-                "pdf_to": ["docx"],
-                "txt_to": ["docx", "pptx"],
-                "docx_to": ["txt", "pptx"]
-            },
-            "spreadsheets": {
-                "input_formats": ["csv", "xlsx", "xls"],
-                "output_formats": ["csv", "xlsx", "xls", "json", "html"]
-            },
-            "presentations": {
-                "pptx_to": ["txt", "json"],
-                "txt_to": ["pptx"]
-            }
-        },
+        "supported_conversions": supported,
+        "multi_hop_conversions": multi_hop,
         "examples": {
             "image": "PNG to JPG, WEBP to PNG",
             "document": "PDF to DOCX, TXT to PPTX, DOCX to TXT",
             "spreadsheet": "CSV to XLSX, Excel to JSON",
-            "presentation": "PPTX to TXT, TXT to PPTX"
+            "presentation": "PPTX to TXT, TXT to PPTX",
+            "multi_hop": "PDF to TXT (via DOCX), PPTX to DOCX (via TXT)"
         },
         "availability": {
             "audio": AUDIO_AVAILABLE,
             "video": VIDEO_AVAILABLE
         }
     }
-    
-    # Add audio/video formats only if available
     if AUDIO_AVAILABLE:
-        formats["supported_conversions"]["audio"] = {
-            "input_formats": ["mp3", "wav", "ogg", "flac", "aac", "m4a", "wma"],
-            "output_formats": ["mp3", "wav", "ogg", "flac", "aac", "m4a"]
-        }
         formats["examples"]["audio"] = "MP3 to WAV, FLAC to MP3"
-    else:
-        formats["unavailable_conversions"] = formats.get("unavailable_conversions", {})
-        formats["unavailable_conversions"]["audio"] = {
-            "reason": "Missing system dependencies (ffmpeg)",
-            "formats": ["mp3", "wav", "ogg", "flac", "aac", "m4a"]
-        }
-    
     if VIDEO_AVAILABLE:
-        formats["supported_conversions"]["video"] = {
-            "input_formats": ["mp4", "avi", "mov", "webm", "mkv", "flv"],
-            "output_formats": ["mp4", "avi", "mov", "webm", "gif"],
-            "extract_audio_to": ["mp3", "wav"]
-        }
         formats["examples"]["video"] = "MP4 to GIF, AVI to MP4"
         formats["examples"]["video_audio"] = "MP4 to MP3 (extract audio)"
-    else:
-        formats["unavailable_conversions"] = formats.get("unavailable_conversions", {})
-        formats["unavailable_conversions"]["video"] = {
-            "reason": "Missing system dependencies (ffmpeg)",
-            "formats": ["mp4", "avi", "mov", "webm", "mkv", "flv"]
+    
+    unavailable = registry.unavailable_categories()
+    if unavailable:
+        formats["unavailable_conversions"] = {
+            category: {"reason": "Missing system dependencies (ffmpeg)", "formats": sources}
+            for category, sources in unavailable.items()
         }
     
     return formats
@@ -0,0 +1,133 @@
+import asyncio, json
+from fastapi import APIRouter, Depends, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from app.core.security import verify_api_key, key_fingerprint
+from app.services.job_queue import get_job
+from app.services.job_events import job_event_broadcaster, TERMINAL_STATES
+
+router = APIRouter()
+
+HEARTBEAT_SECONDS = 15
+
+def _snapshot(job):
+    """Current state of a job in the same shape as pushed events"""
+    return {
+        "seq": None,
+        "task_id": job["task_id"],
+        "state": job["status"],
+        "progress": 1.0 if job["status"] == "completed" else None,
+        "error": job["error"],
+        "created_at": job["updated_at"]
+    }
+
+def _public(event):
+    event = {k: v for k, v in event.items() if k != "api_key_id"}
+    if event["state"] == "completed":
+        event["download_url"] = f"/api/download/{event['task_id']}"
+    return event
+
+def _sse(event):
+    event = _public(event)
+    lines = [f"event: {event['state']}", f"data: {json.dumps(event)}"]
+    if event["seq"] is not None:
+        lines.insert(0, f"id: {event['seq']}")
+    return "\n".join(lines) + "\n\n"
+
+def _is_stale(event, snapshot):
+    """Events queued up before the snapshot was read are already reflected in it"""
+    return snapshot is not None and event["created_at"] < snapshot["created_at"]
+
+async def _event_stream(queue, first=None, stop_on_terminal=True, unsubscribe=None):
+    try:
+        if first is not None:
+            yield _sse(first)
+            if stop_on_terminal and first["state"] in TERMINAL_STATES:
+                return
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(), timeout=HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                # Comment line keeps proxies from closing an idle stream
+                yield ": keep-alive\n\n"
+                continue
+            if _is_stale(event, first):
+                continue
+            yield _sse(event)
+            if stop_on_terminal and event["state"] in TERMINAL_STATES:
+                return
+    finally:
+        unsubscribe()
+
+def _load_job(task_id):
+    job = get_job(task_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Task ID not found")
+    return job
+
+@router.get("/events/{task_id}")
+async def stream_job_events(task_id: str):
+    """Server-Sent Events for one job: queued, running, progress, completed, failed. Ends on completed/failed."""
+    queue = job_event_broadcaster.subscribe(task_id=task_id)
+    try:
+        job = await asyncio.to_thread(_load_job, task_id)
+    except HTTPException:
+        job_event_broadcaster.unsubscribe(queue, task_id=task_id)
+        raise
+    return StreamingResponse(
+        _event_stream(queue, first=_snapshot(job),
+                      unsubscribe=lambda: job_event_broadcaster.unsubscribe(queue, task_id=task_id)),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("/events")
+async def stream_key_events(api_key: str = Depends(verify_api_key)):
+    """Server-Sent Events for every job submitted with this API key. Stays open."""
+    api_key_id = key_fingerprint(api_key)
+    queue = job_event_broadcaster.subscribe(api_key_id=api_key_id)
+    return StreamingResponse(
+        _event_stream(queue, stop_on_terminal=False,
+                      unsubscribe=lambda: job_event_broadcaster.unsubscribe(queue, api_key_id=api_key_id)),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.websocket("/ws/{task_id}")
+async def job_events_websocket(websocket: WebSocket, task_id: str):
+    """WebSocket variant of /events/{task_id}: one JSON message per state change, closed after the final one"""
+    await websocket.accept()
+    queue = job_event_broadcaster.subscribe(task_id=task_id)
+    try:
+        job = await asyncio.to_thread(get_job, task_id)
+        if job is None:
+            await websocket.send_json({"task_id": task_id, "state": "not_found"})
+            await websocket.close(code=4404)
+            return
+        snapshot = event = _snapshot(job)
+        await websocket.send_json(_public(event))
+        # Clients never send anything, but reading is how a disconnect shows up while no events come
+        receiver = asyncio.ensure_future(websocket.receive())
+        getter = None
+        try:
+            while event["state"] not in TERMINAL_STATES:
+                getter = getter or asyncio.ensure_future(queue.get())
+                done, _ = await asyncio.wait((getter, receiver), return_when=asyncio.FIRST_COMPLETED)
+                if receiver in done:
+                    if receiver.result()["type"] == "websocket.disconnect":
+                        return
+                    receiver = asyncio.ensure_future(websocket.receive())
+                if getter not in done:
+                    continue
+                event, getter = getter.result(), None
+                if _is_stale(event, snapshot):
+                    continue
+                await websocket.send_json(_public(event))
+        finally:
+            for task in (getter, receiver):
+                if task is not None:
+                    task.cancel()
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        job_event_broadcaster.unsubscribe(queue, task_id=task_id)
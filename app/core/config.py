@@ -5,5 +5,88 @@ load_dotenv()
 
 API_KEY = os.getenv("API_KEY")
 FIREBASE_DB_URL = os.getenv("FIREBASE_DB_URL")
-MAX_FILE_SIZE = 20 * 1024 * 1024  # 20MB
-TEMP_EXPIRY_SECONDS = 600  # 10 minutes
\ No newline at end of file
+# Job updates are buffered and sent to Firebase in one write per interval
+FIREBASE_FLUSH_INTERVAL = float(os.getenv("FIREBASE_FLUSH_INTERVAL", "0.5"))
+FIREBASE_MAX_RETRIES = int(os.getenv("FIREBASE_MAX_RETRIES", "5"))
+FIREBASE_RETRY_BACKOFF_SECONDS = float(os.getenv("FIREBASE_RETRY_BACKOFF_SECONDS", "1.0"))
+MAX_FILE_SIZE = int(os.getenv("MAX_FILE_SIZE", str(20 * 1024 * 1024)))  # 20MB
+UPLOAD_CHUNK_SIZE = 1024 * 1024  # 1MB
+TEMP_EXPIRY_SECONDS = 600  # 10 minutes
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "8"))  # idle temp.db connections kept open per process
+TEMP_CACHE_ENTRIES = int(os.getenv("TEMP_CACHE_ENTRIES", "10000"))  # download/status rows cached in memory
+# How long a cached row may outlive its deletion by another process (sweeper, eviction in a worker)
+TEMP_CACHE_TTL_SECONDS = float(os.getenv("TEMP_CACHE_TTL_SECONDS", "5"))
+
+# Expiry sweeper: deletes expired outputs/rows and orphaned files in bounded batches
+SWEEP_INTERVAL_SECONDS = float(os.getenv("SWEEP_INTERVAL_SECONDS", "60"))
+SWEEP_BATCH_SIZE = int(os.getenv("SWEEP_BATCH_SIZE", "500"))
+SWEEP_MAX_BATCHES = int(os.getenv("SWEEP_MAX_BATCHES", "20"))  # per sweep; the rest waits for the next one
+ORPHAN_GRACE_SECONDS = int(os.getenv("ORPHAN_GRACE_SECONDS", "3600"))  # untracked files younger than this are kept
+JOB_RETENTION_SECONDS = int(os.getenv("JOB_RETENTION_SECONDS", str(24 * 3600)))  # finished jobs and their batches
+METRICS_RETENTION_SECONDS = int(os.getenv("METRICS_RETENTION_SECONDS", str(7 * 24 * 3600)))  # rows no process updated
+
+# Output store quota: least recently downloaded outputs are evicted to make room for new ones
+OUTPUT_QUOTA_BYTES = int(os.getenv("OUTPUT_QUOTA_BYTES", str(2 * 1024 * 1024 * 1024)))  # 2GB
+OUTPUT_MIN_FREE_BYTES = int(os.getenv("OUTPUT_MIN_FREE_BYTES", str(256 * 1024 * 1024)))  # left free on the disk
+OUTPUT_DEFER_SECONDS = int(os.getenv("OUTPUT_DEFER_SECONDS", "15"))  # requeue delay for jobs that don't fit yet
+
+# Text outputs (txt, csv, json, html) are also stored gzip/brotli/zstd compressed and served by Accept-Encoding
+PRECOMPRESS_ENABLED = os.getenv("PRECOMPRESS_ENABLED", "true").lower() in ("1", "true", "yes")
+PRECOMPRESS_MIN_BYTES = int(os.getenv("PRECOMPRESS_MIN_BYTES", "1024"))  # smaller outputs are sent as they are
+
+# Where uploads and outputs are stored: local (files under STORAGE_ROOT), memory (this process only) or s3
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "local").lower()
+STORAGE_ROOT = os.getenv("STORAGE_ROOT", "app/storage")
+S3_BUCKET = os.getenv("S3_BUCKET")
+S3_PREFIX = os.getenv("S3_PREFIX", "")  # prepended to every object key, e.g. "nodeblack/"
+S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL")  # e.g. http://127.0.0.1:9000 for a local MinIO
+S3_REGION = os.getenv("S3_REGION")
+
+# Conversion executor (process pool)
+CONVERSION_WORKERS = int(os.getenv("CONVERSION_WORKERS", os.cpu_count() or 1))
+CONVERSION_QUEUE_SIZE = int(os.getenv("CONVERSION_QUEUE_SIZE", "32"))  # queued single-file jobs before /api/convert returns 429
+CONVERSION_RETRY_AFTER_SECONDS = int(os.getenv("CONVERSION_RETRY_AFTER_SECONDS", "5"))
+# forkserver: a clean server process imports the converters once and forks every worker from it
+CONVERSION_START_METHOD = os.getenv("CONVERSION_START_METHOD", "forkserver" if os.name == "posix" else "spawn")
+CONVERSION_PRELOAD = os.getenv("CONVERSION_PRELOAD", "true").lower() == "true"
+
+# Durable job queue (jobs table in temp.db)
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "300"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_RETRY_BACKOFF_SECONDS = int(os.getenv("JOB_RETRY_BACKOFF_SECONDS", "10"))  # doubled after every failed attempt
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "1.0"))
+# Set to false when conversions are handled by separate `python -m app.worker` processes
+EMBEDDED_WORKER = os.getenv("EMBEDDED_WORKER", "true").lower() in ("1", "true", "yes")
+
+# Content-addressed conversion result cache
+RESULT_CACHE_ENABLED = os.getenv("RESULT_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+RESULT_CACHE_MAX_BYTES = int(os.getenv("RESULT_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))  # 512MB
+
+# Batch conversions
+BATCH_MAX_FILES = int(os.getenv("BATCH_MAX_FILES", "500"))
+BATCH_QUEUE_SIZE = int(os.getenv("BATCH_QUEUE_SIZE", "2000"))  # queued batch jobs; a batch that would pass it gets 429
+BATCH_MAX_UPLOAD_SIZE = int(os.getenv("BATCH_MAX_UPLOAD_SIZE", str(500 * 1024 * 1024)))  # 500MB per request
+
+# Inline (sync=true) conversions, answered in the upload request itself
+SYNC_MAX_BYTES = int(os.getenv("SYNC_MAX_BYTES", str(2 * 1024 * 1024)))  # 2MB
+SYNC_MAX_CONCURRENCY = int(os.getenv("SYNC_MAX_CONCURRENCY", "4"))
+
+# Image encoder settings when a job names no profile: fast, balanced (Pillow's defaults) or smallest
+IMAGE_ENCODER_PROFILE = os.getenv("IMAGE_ENCODER_PROFILE", "balanced").lower()
+# Largest image a worker decodes (after JPEG draft scaling); 100 MP is ~400MB as RGBA
+MAX_IMAGE_PIXELS = int(os.getenv("MAX_IMAGE_PIXELS", "100000000"))
+
+# Job status push (SSE / WebSocket)
+EVENT_POLL_INTERVAL = float(os.getenv("EVENT_POLL_INTERVAL", "0.25"))
+EVENT_RETENTION_SECONDS = int(os.getenv("EVENT_RETENTION_SECONDS", "3600"))
+
+# Logging: app.* loggers write leveled, structured lines to stderr (LOG_FORMAT=json for one JSON object per line)
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")
+
+# Metrics: every process keeps its own counters and writes them to temp.db for /metrics at this interval
+METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", "5.0"))
+
+# /api/files pagination
+FILES_PAGE_SIZE = int(os.getenv("FILES_PAGE_SIZE", "100"))
+FILES_MAX_PAGE_SIZE = int(os.getenv("FILES_MAX_PAGE_SIZE", "1000"))
@@ -1,29 +1,60 @@
-import firebase_admin
-from firebase_admin import credentials, db
-from app.core.config import FIREBASE_DB_URL
+from app.core.config import FIREBASE_DB_URL, FIREBASE_FLUSH_INTERVAL, FIREBASE_MAX_RETRIES, FIREBASE_RETRY_BACKOFF_SECONDS
+from app.services.write_behind import WriteBehindQueue
+import atexit
+import logging
+import multiprocessing.util
 import os
+import threading
 
-# Initialize Firebase only if the key file exists
+# Firebase is only used if the key file exists. firebase_admin itself is imported on the
+# first flush, on the writer's background thread, so it never slows down startup.
+firebase_enabled = os.path.exists("firebase_key.json")
 firebase_initialized = False
+_init_lock = threading.Lock()
+logger = logging.getLogger(__name__)
 
-if os.path.exists("firebase_key.json"):
-    try:
-        cred = credentials.Certificate("firebase_key.json")
-        firebase_admin.initialize_app(cred, {"databaseURL": FIREBASE_DB_URL})
-        firebase_initialized = True
-    except Exception as e:
-        print(f"Firebase initialization failed: {e}")
-        firebase_initialized = False
-else:
+if not firebase_enabled:
     print("Warning: firebase_key.json not found. Firebase features disabled.")
-    firebase_initialized = False
+
+def _firebase_db():
+    global firebase_initialized
+    with _init_lock:
+        import firebase_admin
+        from firebase_admin import credentials, db
+        if not firebase_initialized:
+            cred = credentials.Certificate("firebase_key.json")
+            firebase_admin.initialize_app(cred, {"databaseURL": FIREBASE_DB_URL})
+            firebase_initialized = True
+    return db
+
+def firebase_sink(updates: dict):
+    """Send all buffered job updates as one multi-path update under /jobs"""
+    paths = {}
+    for task_id, fields in updates.items():
+        for field, value in fields.items():
+            paths[f"{task_id}/{field}"] = value
+    _firebase_db().reference("jobs").update(paths)
+
+def log_sink(updates: dict):
+    if logger.isEnabledFor(logging.DEBUG):
+        for task_id, data in updates.items():
+            logger.debug("firebase disabled, job update not sent", extra={"task_id": task_id, "update": data})
+
+job_update_writer = WriteBehindQueue(
+    firebase_sink if firebase_enabled else log_sink,
+    flush_interval=FIREBASE_FLUSH_INTERVAL,
+    max_retries=FIREBASE_MAX_RETRIES,
+    backoff=FIREBASE_RETRY_BACKOFF_SECONDS
+)
+# Flush what is left on exit: atexit covers the API and worker processes, Finalize the
+# pool children, which leave through os._exit and never run atexit handlers
+atexit.register(job_update_writer.close)
+multiprocessing.util.Finalize(None, job_update_writer.close, exitpriority=10)
 
 def update_job(task_id: str, data: dict):
-    if firebase_initialized:
-        try:
-            ref = db.reference(f"jobs/{task_id}")
-            ref.update(data)
-        except Exception as e:
-            print(f"Firebase update failed: {e}")
-    else:
-        print(f"Firebase disabled - would update job {task_id}: {data}")
\ No newline at end of file
+    """Queue a job update for Firebase; returns immediately and is written by a background flush"""
+    job_update_writer.update(task_id, data)
+
+def set_job_update_sink(sink):
+    """Replace where job updates go, e.g. a MemorySink to run offline"""
+    job_update_writer.sink = sink
@@ -0,0 +1,54 @@
+import json
+import logging
+import sys
+import time
+from app.core.config import LOG_LEVEL, LOG_FORMAT
+
+# Attributes every LogRecord has; anything else was passed through extra= and is a structured field
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+def _fields(record):
+    return {key: value for key, value in vars(record).items() if key not in _RECORD_ATTRIBUTES}
+
+def _quote(value):
+    return json.dumps(value) if isinstance(value, str) and (not value or " " in value) else value
+
+class KeyValueFormatter(logging.Formatter):
+    """`2024-01-01T12:00:00 INFO app.services.pipeline job completed task_id=... seconds=1.2`"""
+
+    def format(self, record):
+        line = f"{time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(record.created))} " \
+               f"{record.levelname} {record.name} {record.getMessage()}"
+        for key, value in _fields(record).items():
+            line += f" {key}={_quote(value)}"
+        if record.exc_info:
+            line += "\n" + self.formatException(record.exc_info)
+        return line
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, for log shippers"""
+
+    def format(self, record):
+        entry = {"ts": round(record.created, 3), "level": record.levelname, "logger": record.name,
+                 "event": record.getMessage(), **_fields(record)}
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+def configure_logging(level=None, fmt=None):
+    """Send the app.* loggers to stderr at LOG_LEVEL. Safe to call more than once (e.g. in every worker process).
+
+    Log calls pass their data as extra= fields instead of formatting strings, so a
+    disabled level costs one level check and nothing is formatted.
+    """
+    logger = logging.getLogger("app")
+    logger.setLevel((level or LOG_LEVEL).upper())
+    if not any(getattr(handler, "_nodeblack", False) for handler in logger.handlers):
+        handler = logging.StreamHandler(sys.stderr)
+        handler._nodeblack = True
+        logger.addHandler(handler)
+        logger.propagate = False
+    for handler in logger.handlers:
+        if getattr(handler, "_nodeblack", False):
+            handler.setFormatter(JsonFormatter() if (fmt or LOG_FORMAT) == "json" else KeyValueFormatter())
+    return logger
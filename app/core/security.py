@@ -1,6 +1,12 @@
+import hashlib
 from fastapi import Header, HTTPException
 from app.core.config import API_KEY
 
 def verify_api_key(x_api_key: str = Header(...)):
     if x_api_key != API_KEY:
-        raise HTTPException(status_code=401, detail="Invalid API key")
\ No newline at end of file
+        raise HTTPException(status_code=401, detail="Invalid API key")
+    return x_api_key
+
+def key_fingerprint(api_key: str) -> str:
+    """Stable identifier for an API key that is safe to store next to job data"""
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16]
\ No newline at end of file
@@ -0,0 +1,65 @@
+from starlette.responses import JSONResponse
+
+# Room for multipart boundaries and part headers on top of the file itself
+MULTIPART_OVERHEAD = 64 * 1024
+
+class UploadSizeLimitMiddleware:
+    """Reject oversized upload bodies while they are still arriving.
+
+    Starlette parses the whole multipart body before the endpoint runs, so a size
+    check inside the endpoint only happens after the full upload hit the disk.
+    This counts body bytes as the server receives them and answers 413 as soon
+    as the limit is crossed (or right away when Content-Length is already too big).
+    """
+
+    def __init__(self, app, max_body_size: int, paths=("/api/convert",)):
+        self.app = app
+        self.max_file_size = max_body_size
+        self.max_body_size = max_body_size + MULTIPART_OVERHEAD
+        self.paths = tuple(paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or not scope["path"].startswith(self.paths):
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        content_length = headers.get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > self.max_body_size:
+            await self._reject(scope, receive, send)
+            return
+
+        received = 0
+        rejected = False
+
+        async def limited_receive():
+            nonlocal received, rejected
+            if rejected:
+                return {"type": "http.disconnect"}
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_body_size:
+                    rejected = True
+                    await self._reject(scope, receive, send)
+                    # Makes the form parser give up; its error response is swallowed below
+                    return {"type": "http.disconnect"}
+            return message
+
+        async def guarded_send(message):
+            if not rejected:
+                await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except Exception:
+            if not rejected:
+                raise
+
+    async def _reject(self, scope, receive, send):
+        response = JSONResponse(
+            {"detail": f"File exceeds the {self.max_file_size // (1024 * 1024)}MB upload limit"},
+            status_code=413,
+            headers={"Connection": "close"}
+        )
+        await response(scope, receive, send)
@@ -0,0 +1,104 @@
+"""
+Import-time report for the API process.
+
+Imports a module in a fresh interpreter with `python -X importtime` and prints
+how long each imported module took, in milliseconds:
+
+    python -m app.import_report                      # app.main, slowest 25 modules
+    python -m app.import_report --top 0 --json       # every module, machine readable
+    python -m app.import_report --budget-ms 1500     # fail (exit 1) when startup gets slower
+
+The run also fails when a converter library shows up in the import graph, since
+the API is meant to import those on first use only (see --forbid).
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+# Libraries that belong to converters (or the Firebase writer) and must stay out of API startup
+FORBIDDEN_MODULES = ["pandas", "openpyxl", "pdf2docx", "docx", "pptx", "moviepy", "pydub", "firebase_admin"]
+
+def measure_imports(module="app.main", python=None):
+    """[{"module", "self_ms", "cumulative_ms", "depth"}] in import order, from a fresh interpreter"""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run(
+        [python or sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=root, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3 or not parts[0].strip().isdigit():
+            continue  # header line
+        name = parts[2].rstrip()
+        modules.append({
+            "module": name.strip(),
+            "self_ms": int(parts[0]) / 1000,
+            "cumulative_ms": int(parts[1]) / 1000,
+            "depth": (len(name) - len(name.lstrip())) // 2
+        })
+    return modules
+
+def build_report(modules, module="app.main", forbidden=FORBIDDEN_MODULES):
+    top = next((m for m in reversed(modules) if m["module"] == module), None)
+    loaded_forbidden = sorted({
+        m["module"].split(".")[0] for m in modules if m["module"].split(".")[0] in forbidden
+    })
+    return {
+        "module": module,
+        "total_ms": round(top["cumulative_ms"] if top else sum(m["self_ms"] for m in modules), 1),
+        "module_count": len(modules),
+        "forbidden_imports": loaded_forbidden,
+        "modules": sorted(modules, key=lambda m: m["cumulative_ms"], reverse=True)
+    }
+
+def print_report(report, top=25):
+    print(f"Import time for {report['module']}: {report['total_ms']:.1f} ms ({report['module_count']} modules)")
+    print(f"{'cumulative ms':>14} {'self ms':>10}  module")
+    rows = report["modules"][:top] if top else report["modules"]
+    for m in rows:
+        print(f"{m['cumulative_ms']:>14.1f} {m['self_ms']:>10.1f}  {m['module']}")
+    if report["forbidden_imports"]:
+        print(f"Converter libraries imported at startup: {', '.join(report['forbidden_imports'])}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-module import times (ms) for NodeBlack startup")
+    parser.add_argument("--module", default="app.main", help="module to import (default: app.main)")
+    parser.add_argument("--top", type=int, default=25, help="slowest modules to list, 0 for all (default: 25)")
+    parser.add_argument("--json", action="store_true", help="print the full report as JSON")
+    parser.add_argument("--budget-ms", type=float, default=None,
+                        help="exit with status 1 when the total import time is above this")
+    parser.add_argument("--forbid", default=",".join(FORBIDDEN_MODULES),
+                        help="comma-separated top-level packages that must not be imported ('' to allow all)")
+    args = parser.parse_args()
+
+    forbidden = [name.strip() for name in args.forbid.split(",") if name.strip()]
+    try:
+        modules = measure_imports(args.module)
+    except RuntimeError as e:
+        print(e, file=sys.stderr)
+        sys.exit(2)
+    report = build_report(modules, args.module, forbidden)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report, args.top)
+
+    failed = False
+    if report["forbidden_imports"]:
+        print(f"FAIL: {args.module} imports {', '.join(report['forbidden_imports'])}", file=sys.stderr)
+        failed = True
+    if args.budget_ms is not None and report["total_ms"] > args.budget_ms:
+        print(f"FAIL: import took {report['total_ms']:.1f} ms, budget is {args.budget_ms:.1f} ms", file=sys.stderr)
+        failed = True
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,31 @@
-from fastapi import FastAPI
-from fastapi.responses import FileResponse, HTMLResponse
+from fastapi import FastAPI, Header, HTTPException, Query, Request
+from fastapi.responses import HTMLResponse, PlainTextResponse
+from starlette.background import BackgroundTask
 from fastapi.staticfiles import StaticFiles
 from app.api.convert import router
-from app.services.temp_manager import init_db, get_temp
+from app.api.batch import router as batch_router
+from app.api.events import router as events_router
+from app.services.temp_manager import init_db, get_temp, list_temp
 from app.services.keep_alive import keep_alive_service
+from app.services.media_types import media_type_for
+from app.services.job_queue import init_queue, get_job_status
+from app.services.result_cache import init_cache
+from app.services.conversion_executor import conversion_executor
+from app.services.job_dispatcher import job_dispatcher
+from app.services.job_events import job_event_broadcaster
+from app.services.expiry_sweeper import expiry_sweeper
+from app.services.output_store import output_store
+from app.services.storage import storage
+from app.services.delivery import object_response
+from app.services.precompress import negotiate, variant_key, delete_output
+from app.services.metrics import metrics, init_metrics, render_metrics
+from app.core.config import EMBEDDED_WORKER, MAX_FILE_SIZE, BATCH_MAX_UPLOAD_SIZE, FILES_PAGE_SIZE, FILES_MAX_PAGE_SIZE
+from app.core.security import verify_api_key, key_fingerprint
+from app.core.upload_limit import UploadSizeLimitMiddleware
+from app.core.log import configure_logging
 import time, os
+import base64, json
+from typing import Literal, Optional
 import asyncio
 
 app = FastAPI(
@@ -15,8 +36,16 @@ app = FastAPI(
     redoc_url="/redoc"
 )
 
+configure_logging()
 init_db()
+init_queue()
+init_cache()
+init_metrics()
+app.add_middleware(UploadSizeLimitMiddleware, max_body_size=MAX_FILE_SIZE)
+app.add_middleware(UploadSizeLimitMiddleware, max_body_size=BATCH_MAX_UPLOAD_SIZE, paths=("/api/batch",))
 app.include_router(router, prefix="/api")
+app.include_router(batch_router, prefix="/api")
+app.include_router(events_router, prefix="/api")
 
 # Serve static files and landing page
 try:
@@ -318,39 +347,75 @@ async def startup_event():
     render_url = os.getenv("RENDER_URL", "http://127.0.0.1:8000")  # Default to localhost for development
     keep_alive_service.url = render_url
     keep_alive_service.start()
+    job_event_broadcaster.start()
+    expiry_sweeper.start()
+    if EMBEDDED_WORKER:
+        # Also picks up jobs left queued or abandoned by a previous run
+        conversion_executor.start()
+        job_dispatcher.start()
 
 @app.on_event("shutdown")
 async def shutdown_event():
-    """Stop keep-alive service when app shuts down"""
+    """Stop keep-alive service and conversion workers when app shuts down"""
     keep_alive_service.stop()
+    job_event_broadcaster.stop()
+    expiry_sweeper.stop()
+    output_store.close()
+    job_dispatcher.stop()
+    conversion_executor.stop()
+
+def _encode_cursor(expires_at, task_id):
+    return base64.urlsafe_b64encode(json.dumps([expires_at, task_id]).encode()).decode().rstrip("=")
+
+def _decode_cursor(cursor):
+    try:
+        expires_at, task_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if not isinstance(expires_at, int) or not isinstance(task_id, str):
+            raise ValueError("cursor fields have the wrong types")
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return expires_at, task_id
+
+def _stored(key):
+    try:
+        storage.locate(key)
+        return True
+    except FileNotFoundError:
+        return False
 
 @app.get("/api/files")
-def list_files():
-    """Get all converted files from database"""
-    import sqlite3
-    conn = sqlite3.connect("temp.db")
-    cur = conn.cursor()
-    cur.execute("SELECT task_id, file_path, expires_at FROM temp_downloads")
-    rows = cur.fetchall()
-    conn.close()
-    
-    files = []
+def list_files(limit: int = Query(FILES_PAGE_SIZE, ge=1, le=FILES_MAX_PAGE_SIZE), cursor: Optional[str] = None,
+               status: Optional[Literal["available", "expired"]] = None, check_files: bool = False,
+               x_api_key: Optional[str] = Header(None)):
+    """One page of converted files, latest expiry first.
+
+    Pass next_cursor back as cursor for the following page. With an X-API-Key header
+    only that key's files are listed. file_exists is only checked (one stat per file)
+    with check_files=true, and is null otherwise.
+    """
+    api_key_id = key_fingerprint(verify_api_key(x_api_key)) if x_api_key is not None else None
+    after = _decode_cursor(cursor) if cursor else None
     current_time = int(time.time())
-    
+    rows, has_more = list_temp(limit, after=after, status=status, api_key_id=api_key_id, now=current_time)
+
+    files = []
     for task_id, file_path, expires_at in rows:
-        status = "expired" if current_time > expires_at else "available"
-        file_exists = os.path.exists(file_path)
-        
+        file_status = "expired" if current_time > expires_at else "available"
+        file_exists = _stored(file_path) if check_files else None
+
         files.append({
             "task_id": task_id,
             "file_path": file_path,
             "expires_at": expires_at,
-            "status": status,
+            "status": file_status,
             "file_exists": file_exists,
-            "download_url": f"/api/download/{task_id}" if status == "available" and file_exists else None
+            "download_url": f"/api/download/{task_id}" if file_status == "available" and file_exists is not False else None
         })
-    
-    return {"files": files, "total": len(files)}
+
+    last_task_id, _, last_expires_at = rows[-1] if rows else (None, None, None)
+    next_cursor = _encode_cursor(last_expires_at, last_task_id) if has_more else None
+    # total is the number of files on this page; walking every row to count them is what paging avoids
+    return {"files": files, "total": len(files), "next_cursor": next_cursor}
 
 @app.get("/api/ping")
 def ping_endpoint():
@@ -373,85 +438,97 @@ def test_endpoint():
         }
     }
 
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics_endpoint():
+    """Stage latencies, job counters, queue depth, active workers and storage bytes (Prometheus text format)"""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 @app.get("/api/status/{task_id}")
 def get_status(task_id: str):
-    """Check the status of a conversion job"""
-    row = get_temp(task_id)
-    if not row:
+    """Check the status of a conversion job (one indexed read of the local job table)"""
+    job = get_job_status(task_id)
+    if not job:
         return {"status": "not_found", "message": "Task ID not found in database"}
     
-    path, expires = row
-    if time.time() > expires:
-        return {"status": "expired", "message": "File has expired"}
+    timings = {
+        "received_at": job["received_at"],
+        "started_at": job["started_at"],
+        "finished_at": job["finished_at"]
+    }
+    if job["started_at"] and job["received_at"]:
+        timings["queue_seconds"] = round(job["started_at"] - job["received_at"], 3)
+    if job["finished_at"] and job["started_at"]:
+        timings["run_seconds"] = round(job["finished_at"] - job["started_at"], 3)
+    result = {"task_id": task_id, "state": job["status"], "attempts": job["attempts"], "timings": timings}
+    
+    if job["status"] == "failed":
+        return {**result, "status": "failed", "message": job["error"] or "Conversion failed", "error": job["error"]}
+    if job["status"] == "queued":
+        message = "Waiting for a worker" if not job["error"] else f"Retrying after error: {job['error']}"
+        return {**result, "status": "queued", "message": message}
+    if job["status"] == "running":
+        return {**result, "status": "processing", "message": "File is being processed"}
     
-    if os.path.exists(path):
-        return {"status": "ready", "message": "File ready for download", "path": path}
-    else:
-        return {"status": "processing", "message": "File is being processed or conversion failed", "expected_path": path}
+    if job["expires_at"] is None or time.time() > job["expires_at"]:
+        return {**result, "status": "expired", "message": "File has expired"}
+    return {**result, "status": "ready", "message": "File ready for download", "download_url": f"/api/download/{task_id}"}
 
-@app.get("/api/download/{task_id}")
-def download(task_id: str):
+@app.api_route("/api/download/{task_id}", methods=["GET", "HEAD"])
+def download(task_id: str, request: Request):
+    """The converted file. Supports Range (resume), If-None-Match/If-Range against a strong ETag, and HEAD.
+
+    Text outputs stored precompressed are sent in the best encoding the client accepts.
+    """
+    started = time.perf_counter()
     row = get_temp(task_id)
     if not row:
         return {"error": "File not found or expired"}
     
-    path, expires = row
+    path, expires, content_hash, encodings = row
     if time.time() > expires:
-        try:
-            os.remove(path)
-        except:
-            pass
+        delete_output(storage.resolve(path))
         return {"error": "File expired"}
     
-    # Check if file actually exists
-    if not os.path.exists(path):
+    # Check if file actually exists; one stat gives its current key and size
+    try:
+        path, size = storage.locate(path)
+    except FileNotFoundError:
         return {"error": "File not found - conversion may have failed"}
     
     # Get file extension for proper filename
     file_ext = os.path.splitext(path)[1]
     filename = f"converted_{task_id}{file_ext}"
     
-    # Set proper media type based on extension
-    media_type_map = {
-        # Images
-        '.png': 'image/png',
-        '.jpg': 'image/jpeg', 
-        '.jpeg': 'image/jpeg',
-        '.webp': 'image/webp',
-        '.bmp': 'image/bmp',
-        '.tiff': 'image/tiff',
-        '.gif': 'image/gif',
-        # Documents
-        '.docx': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
-        '.pdf': 'application/pdf',
-        '.txt': 'text/plain',
-        # Audio
-        '.mp3': 'audio/mpeg',
-        '.wav': 'audio/wav',
-        '.ogg': 'audio/ogg',
-        '.flac': 'audio/flac',
-        '.aac': 'audio/aac',
-        '.m4a': 'audio/mp4',
-        # Spreadsheets
-        '.csv': 'text/csv',
-        '.xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-        '.xls': 'application/vnd.ms-excel',
-        '.json': 'application/json',
-        '.html': 'text/html',
-        # Presentations
-        '.pptx': 'application/vnd.openxmlformats-officedocument.presentationml.presentation',
-        # Video
-        '.mp4': 'video/mp4',
-        '.avi': 'video/x-msvideo',
-        '.mov': 'video/quicktime',
-        '.webm': 'video/webm'
-    }
+    media_type = media_type_for(file_ext)
+    headers = {"Content-Disposition": f"attachment; filename={filename}"}
+    
+    # The variant is the same content, so it keeps the filename and type but needs its own ETag
+    encodings = encodings.split(",") if encodings else []
+    encoding = negotiate(request.headers.get("accept-encoding"), encodings)
+    if encodings:
+        headers["Vary"] = "Accept-Encoding"
+    etag = content_hash
+    if encoding:
+        try:
+            size = storage.stat(variant_key(path, encoding))[0]
+            path = variant_key(path, encoding)
+            headers["Content-Encoding"] = encoding
+            etag = content_hash and f"{content_hash}-{encoding}"
+        except FileNotFoundError:
+            pass  # evicted under us; the plain file is still fine
+    
+    output_store.touch(task_id)
     
-    media_type = media_type_map.get(file_ext.lower(), 'application/octet-stream')
+    # Runs once the whole file has been sent, so this covers the transfer as well
+    def observe_download():
+        metrics.observe("nodeblack_stage_duration_seconds", time.perf_counter() - started,
+                        stage="download", source="", target=file_ext.lstrip(".").lower(), converter="")
     
-    return FileResponse(
-        path=path,
-        filename=filename,
+    return object_response(
+        request, path, size,
+        etag=f'"{etag}"' if etag else None,
+        max_age=expires - time.time(),
         media_type=media_type,
-        headers={"Content-Disposition": f"attachment; filename={filename}"}
+        headers=headers,
+        background=BackgroundTask(observe_download)
     )
\ No newline at end of file
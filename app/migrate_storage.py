@@ -0,0 +1,67 @@
+"""
+Move flat stored files into the sharded layout.
+
+Objects written before sharding sit directly in their area (output/{task_id}.{ext}).
+New ones go to output/{id[:2]}/{id[2:4]}/{task_id}.{ext}. This moves the old ones
+over in batches, while the API and workers keep running:
+
+    python -m app.migrate_storage --dry-run
+    python -m app.migrate_storage --batch-size 1000
+
+Each batch first points the download rows and jobs at the new keys, then moves the
+objects. Anything reading in between resolves the key to wherever the object
+currently is (see Storage.resolve), so downloads keep working during the move.
+"""
+import argparse
+import os
+from app.services.temp_manager import init_db, rename_temp
+from app.services.job_queue import init_queue, rename_job_paths
+from app.services.storage import storage, LocalStorage, AREAS, sharded_key
+
+def flat_keys(area):
+    """Keys stored directly in area, not in a shard"""
+    for key, _, _ in storage.list(f"{area}/"):
+        if key.count("/") == 1:
+            yield key
+
+def migrate(batch_size=500, dry_run=False):
+    """Returns the number of objects moved (or that would be)"""
+    moved = 0
+    for area in AREAS:
+        # Materialized first: moving objects while listing them would change the listing
+        keys = list(flat_keys(area))
+        for start in range(0, len(keys), batch_size):
+            batch = [(key, sharded_key(key)) for key in keys[start:start + batch_size]]
+            if dry_run:
+                for key, new_key in batch:
+                    print(f"{key} -> {new_key}")
+                moved += len(batch)
+                continue
+            renames = list(batch)
+            if isinstance(storage, LocalStorage):
+                # Rows written before storage keys hold the full local path
+                renames += [(os.path.join(storage.root, key), new_key) for key, new_key in batch]
+            rename_temp(renames)
+            rename_job_paths(renames)
+            for key, new_key in batch:
+                try:
+                    storage.move(key, new_key)
+                    moved += 1
+                except FileNotFoundError:
+                    pass  # expired and swept in the meantime
+            print(f"{area}: moved {moved} objects so far")
+    return moved
+
+def main():
+    parser = argparse.ArgumentParser(description="Move flat stored files into the sharded storage layout")
+    parser.add_argument("--batch-size", type=int, default=500, help="objects per batch (default: 500)")
+    parser.add_argument("--dry-run", action="store_true", help="only print what would move")
+    args = parser.parse_args()
+
+    init_db()
+    init_queue()
+    moved = migrate(args.batch_size, args.dry_run)
+    print(f"{'Would move' if args.dry_run else 'Moved'} {moved} objects")
+
+if __name__ == "__main__":
+    main()
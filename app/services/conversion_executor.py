@@ -0,0 +1,109 @@
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from app.core.config import CONVERSION_WORKERS, CONVERSION_START_METHOD, CONVERSION_PRELOAD
+from app.core.log import configure_logging
+from app.services.storage import storage
+
+logger = logging.getLogger(__name__)
+
+class QueueFullError(Exception):
+    """Raised when every worker is busy and the waiting queue is full"""
+
+class ConversionExecutor:
+    """Process pool running conversions.
+
+    Waiting jobs belong in the durable queue (see JobDispatcher), so by default the pool
+    only holds the jobs its workers are running; queue_size lets it buffer more.
+    """
+
+    def __init__(self, workers: int = None, queue_size: int = 0, start_method: str = None, preload: bool = None):
+        self.workers = max(1, workers or CONVERSION_WORKERS)
+        self.queue_size = queue_size
+        self.start_method = start_method or CONVERSION_START_METHOD
+        self.preload = CONVERSION_PRELOAD if preload is None else preload
+        self.pool = None
+        self.pending = 0  # running + waiting jobs
+        self.lock = threading.Lock()
+
+    @property
+    def capacity(self) -> int:
+        """Jobs that can be in flight at once (one per worker plus queue_size)"""
+        return self.workers + self.queue_size
+
+    def is_full(self) -> bool:
+        return self.pending >= self.capacity
+
+    def start(self):
+        """Create the process pool if it is not running yet"""
+        if storage.process_local:
+            raise RuntimeError(f"{type(storage).__name__} keeps objects inside one process, so conversion worker "
+                               "processes can't read the uploads; use STORAGE_BACKEND=local or s3")
+        with self.lock:
+            if self.pool is None:
+                context = multiprocessing.get_context(self.start_method)
+                if self.preload and self.start_method == "forkserver":
+                    # Imported here so the API process itself stays free of converter imports
+                    from app.services.pipeline import PRELOAD_MODULES
+                    context.set_forkserver_preload(PRELOAD_MODULES)
+                self.pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=context,
+                                                initializer=_init_worker, initargs=(self.preload,))
+                if self.preload:
+                    # Start the workers now (in the background) rather than on the first jobs;
+                    # _init_worker does the preloading, so each task is a no-op
+                    for _ in range(self.workers):
+                        self.pool.submit(_started)
+
+    def submit(self, fn, *args):
+        """Queue a picklable callable on the pool, or raise QueueFullError"""
+        with self.lock:
+            if self.pending >= self.capacity:
+                raise QueueFullError(f"Conversion queue is full ({self.pending}/{self.capacity} jobs)")
+            self.pending += 1
+
+        try:
+            self.start()
+            future = self.pool.submit(fn, *args)
+        except Exception as e:
+            with self.lock:
+                self.pending -= 1
+                # Broke while idle (a worker died starting up); start a fresh pool next time
+                if isinstance(e, BrokenProcessPool):
+                    self.pool = None
+            raise
+
+        future.add_done_callback(self._job_done)
+        return future
+
+    def _job_done(self, future):
+        with self.lock:
+            self.pending -= 1
+            error = None if future.cancelled() else future.exception()
+            # A worker died (OOM, segfault in a native lib); the pool is unusable, start a fresh one next time
+            if isinstance(error, BrokenProcessPool):
+                self.pool = None
+        if error is not None:
+            logger.error("conversion worker error", extra={"error": str(error)})
+
+    def stop(self):
+        """Shut down the pool without waiting for running conversions"""
+        with self.lock:
+            pool, self.pool = self.pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+def _init_worker(preload):
+    """Pool initializer: configure logging and, in preload mode, import every converter"""
+    configure_logging()
+    if preload:
+        # With forkserver this finds everything imported already; with spawn it imports per worker
+        from app.services.pipeline import preload_converters
+        preload_converters()
+
+def _started():
+    """Submitted once per worker so the pool starts them (and runs _init_worker) right away"""
+
+# Global instance
+conversion_executor = ConversionExecutor()
@@ -0,0 +1,204 @@
+import io
+import heapq
+import importlib
+import logging
+import threading
+from app.services.temp_manager import pool
+from app.services.write_behind import WriteBehindQueue
+
+logger = logging.getLogger(__name__)
+
+# Extra cost charged per hop so a direct conversion wins over an equally fast chain
+HOP_OVERHEAD = 0.05
+# Weight of a new measurement in the moving average of recorded costs
+COST_SMOOTHING = 0.2
+MAX_HOPS = 3
+
+class Converter:
+    """One (source, target) conversion and the function that performs it"""
+
+    def __init__(self, source, target, func, category, cost, pass_format=True, available=True, in_memory=False):
+        self.source = source
+        self.target = target
+        self.func = func  # callable, or "package.module:function" imported on first use
+        self.category = category
+        self.cost = cost  # estimated seconds per MB of input, replaced by measurements
+        self.pass_format = pass_format
+        self.available = available
+        self.in_memory = in_memory  # func also accepts file objects instead of paths
+
+    @property
+    def name(self):
+        return self.func.split(":")[1] if isinstance(self.func, str) else getattr(self.func, "__name__", str(self.func))
+
+    @property
+    def module(self):
+        return self.func.split(":")[0] if isinstance(self.func, str) else getattr(self.func, "__module__", None)
+
+    def load(self):
+        """The conversion function, importing its module the first time it is needed"""
+        if isinstance(self.func, str):
+            module, name = self.func.split(":")
+            self.func = getattr(importlib.import_module(module), name)
+        return self.func
+
+    def run(self, input_path, output_path, options=None):
+        """options are passed to func as keyword arguments (image resizing)"""
+        func = self.load()
+        if self.pass_format:
+            func(input_path, output_path, self.target, **(options or {}))
+        else:
+            func(input_path, output_path, **(options or {}))
+
+    def run_bytes(self, data, options=None):
+        """Convert without touching the disk. Only for converters registered with in_memory=True."""
+        src = io.BytesIO(data)
+        src.name = f"upload.{self.source}"  # lets converters detect the input format like they do from a path
+        dest = io.BytesIO()
+        self.run(src, dest, options)
+        return dest.getvalue()
+
+    def __repr__(self):
+        return f"Converter({self.source}->{self.target}, {self.name})"
+
+class ConverterRegistry:
+    def __init__(self):
+        self.converters = {}  # (source, target) -> Converter
+        self.edges = {}  # source -> {target: Converter}
+        self.lock = threading.Lock()
+        # Measured costs are written in the background, one transaction for every hop since the last flush
+        self.cost_writer = WriteBehindQueue(self._store_costs, flush_interval=5.0, max_retries=3)
+        self.samples = {}  # (source, target) -> runs measured by this process
+        self.saved_samples = {}  # (source, target) -> of those, already counted in converter_costs
+
+    def register(self, sources, targets, func, category, cost=1.0, pass_format=True, available=True, in_memory=False):
+        """Register func for every source -> target pair. The first registration of a pair wins."""
+        for source in sources:
+            for target in targets:
+                if (source, target) in self.converters:
+                    continue
+                converter = Converter(source, target, func, category, cost, pass_format, available, in_memory)
+                self.converters[(source, target)] = converter
+                self.edges.setdefault(source, {})[target] = converter
+
+    def get(self, source, target):
+        converter = self.converters.get((source, target))
+        return converter if converter and converter.available else None
+
+    def plan_route(self, source, target, max_hops=MAX_HOPS):
+        """Cheapest chain of available converters from source to target (Dijkstra), or None"""
+        source, target = source.lower(), target.lower()
+        if source == target:
+            direct = self.get(source, target)
+            return [direct] if direct else None
+
+        # Keyed by (format, hops) so a cheap but long chain never hides a shorter one within max_hops
+        best = {(source, 0): 0.0}
+        queue = [(0.0, 0, source, [])]
+        while queue:
+            cost, hops, fmt, route = heapq.heappop(queue)
+            if fmt == target:
+                return route
+            if cost > best.get((fmt, hops), float("inf")) or hops >= max_hops:
+                continue
+            for next_fmt, converter in self.edges.get(fmt, {}).items():
+                if not converter.available or next_fmt == fmt:
+                    continue
+                next_cost = cost + converter.cost + HOP_OVERHEAD
+                if next_cost < best.get((next_fmt, hops + 1), float("inf")):
+                    best[(next_fmt, hops + 1)] = next_cost
+                    heapq.heappush(queue, (next_cost, hops + 1, next_fmt, route + [converter]))
+        return None
+
+    def unavailable_reason(self, source, target):
+        """Explain why source -> target can't run here, when it is known but disabled"""
+        for converter in self.edges.get(source.lower(), {}).values():
+            if not converter.available:
+                return f"{converter.category.capitalize()} conversion not available on this server - missing system dependencies (ffmpeg)"
+        return None
+
+    def record_cost(self, converter, seconds, input_bytes, persist=True):
+        """Fold a measured run into the converter's cost (seconds per MB of input)"""
+        sample = seconds / max(input_bytes / (1024 * 1024), 0.01)
+        key = (converter.source, converter.target)
+        with self.lock:
+            converter.cost = (1 - COST_SMOOTHING) * converter.cost + COST_SMOOTHING * sample
+            self.samples[key] = self.samples.get(key, 0) + 1
+            if persist:
+                self.cost_writer.update(key, {"cost": converter.cost, "samples": self.samples[key]})
+
+    def _store_costs(self, updates):
+        # samples are running totals, so a retried flush never counts a run twice
+        with self.lock:
+            rows = [(source, target, fields["cost"], fields["samples"] - self.saved_samples.get((source, target), 0))
+                    for (source, target), fields in updates.items()]
+        with pool.connection() as conn:
+            conn.executemany("""
+                INSERT INTO converter_costs (source, target, cost, samples) VALUES (?, ?, ?, ?)
+                ON CONFLICT (source, target) DO UPDATE SET cost=excluded.cost, samples=samples+excluded.samples
+            """, rows)
+        with self.lock:
+            for key, fields in updates.items():
+                self.saved_samples[key] = max(self.saved_samples.get(key, 0), fields["samples"])
+
+    def load_costs(self):
+        """Start from the costs measured by earlier runs instead of the built-in estimates"""
+        with pool.connection() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS converter_costs (
+                    source TEXT NOT NULL,
+                    target TEXT NOT NULL,
+                    cost REAL NOT NULL,
+                    samples INTEGER NOT NULL,
+                    PRIMARY KEY (source, target)
+                )
+            """)
+            rows = conn.execute("SELECT source, target, cost FROM converter_costs").fetchall()
+        for source, target, cost in rows:
+            converter = self.converters.get((source, target))
+            if converter:
+                converter.cost = cost
+
+    def modules(self):
+        """Modules of all available converters, for workers that import them up front"""
+        return sorted({c.module for c in self.converters.values() if c.available and c.module})
+
+    def preload(self):
+        """Import every available converter now instead of on first use"""
+        failed = set()
+        for converter in self.converters.values():
+            if converter.available and converter.module not in failed:
+                try:
+                    converter.load()
+                except Exception as e:
+                    # A broken import must not take the pool down; the job that needs it fails instead.
+                    # Its other converters would only fail the same import again.
+                    failed.add(converter.module)
+                    logger.warning("converter preload failed", extra={"converter_module": converter.module,
+                                                                         "error": str(e)})
+
+    def categories(self):
+        """{category: {source: [direct targets]}} for available converters"""
+        result = {}
+        for (source, target), converter in self.converters.items():
+            if converter.available:
+                result.setdefault(converter.category, {}).setdefault(source, []).append(target)
+        return result
+
+    def unavailable_categories(self):
+        result = {}
+        for converter in self.converters.values():
+            if not converter.available:
+                formats = result.setdefault(converter.category, [])
+                if converter.source not in formats:
+                    formats.append(converter.source)
+        return result
+
+    def multi_hop_targets(self, source):
+        """Targets reachable from source only through a chain of converters"""
+        direct = set(self.edges.get(source, {}))
+        all_targets = {target for (_, target) in self.converters}
+        return sorted(
+            target for target in all_targets - direct - {source}
+            if self.plan_route(source, target) is not None
+        )
@@ -0,0 +1,119 @@
+import anyio
+from starlette.responses import Response
+from app.services.storage import storage
+
+CHUNK_SIZE = 256 * 1024
+
+class RangeNotSatisfiable(Exception):
+    """The Range header asks only for bytes past the end of the file"""
+
+def parse_range(header, size):
+    """(start, end) inclusive for a single "bytes=" range, or None to send the whole file.
+
+    Multiple ranges and malformed headers are answered with the whole file, which
+    RFC 9110 allows. Raises RangeNotSatisfiable when the range starts past the end.
+    """
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    first, sep, last = header[len("bytes="):].strip().partition("-")
+    if not sep:
+        return None
+    try:
+        if first:
+            start = int(first)
+            end = int(last) if last else size - 1
+            if start < size and end < start:
+                return None
+        elif last:
+            # Suffix range: the last N bytes
+            suffix = int(last)
+            if suffix == 0:
+                raise RangeNotSatisfiable()
+            start, end = max(size - suffix, 0), size - 1
+        else:
+            return None
+    except ValueError:
+        return None
+    if start >= size:
+        raise RangeNotSatisfiable()
+    return start, min(end, size - 1)
+
+def etag_matches(header, etag):
+    """If-None-Match comparison (weak, so W/"x" matches "x")"""
+    if not header or not etag:
+        return False
+    if header.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in header.split(","))
+
+class StoredObjectResponse(Response):
+    """Sends a stored object, or one byte range of it.
+
+    Local files go out through the ASGI zero-copy send extension (sendfile) when the
+    server offers it. Otherwise, and for other backends, the range is read in chunks
+    on a worker thread so the event loop never blocks on disk or network.
+    """
+
+    def __init__(self, key, start, length, status_code=200, headers=None, media_type=None, background=None):
+        super().__init__(status_code=status_code, headers={**(headers or {}), "Content-Length": str(length)},
+                         media_type=media_type, background=background)
+        self.key = key
+        self.start = start
+        self.length = length
+
+    async def __call__(self, scope, receive, send):
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        local_path = storage.local_path(self.key)
+        if scope["method"] == "HEAD" or not self.length:
+            await send({"type": "http.response.body", "body": b""})
+        elif local_path is not None and "http.response.zerocopysend" in scope.get("extensions", {}):
+            with open(local_path, "rb") as f:
+                await send({"type": "http.response.zerocopysend", "file": f, "offset": self.start,
+                            "count": self.length})
+        else:
+            await self._send_chunks(send)
+        if self.background is not None:
+            await self.background()
+
+    async def _send_chunks(self, send):
+        src = await anyio.to_thread.run_sync(storage.open, self.key, self.start, self.length)
+        try:
+            remaining = self.length
+            while remaining > 0:
+                chunk = await anyio.to_thread.run_sync(src.read, min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break  # shorter than its recorded size; the client sees a truncated body
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+            if remaining > 0:
+                await send({"type": "http.response.body", "body": b""})
+        finally:
+            await anyio.to_thread.run_sync(src.close)
+
+def object_response(request, key, size, etag=None, max_age=0, media_type=None, headers=None, background=None):
+    """The response to a GET or HEAD for a stored object: 200, 206, 304 or 416.
+
+    etag is the quoted strong ETag (None when unknown). max_age is how long clients and
+    shared caches may reuse the response; the object never changes under the same URL.
+    """
+    headers = {**(headers or {}), "Accept-Ranges": "bytes", "Cache-Control": f"public, max-age={max(int(max_age), 0)}"}
+    if etag:
+        headers["ETag"] = etag
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers, background=background)
+
+    # If-Range: only resume when the client's copy is this exact file (a date never matches a strong ETag here)
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if if_range is not None and (not etag or if_range.strip() != etag):
+        range_header = None
+    try:
+        byte_range = parse_range(range_header, size)
+    except RangeNotSatisfiable:
+        return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+    if byte_range is None:
+        return StoredObjectResponse(key, 0, size, headers=headers, media_type=media_type, background=background)
+    start, end = byte_range
+    headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    return StoredObjectResponse(key, start, end - start + 1, status_code=206, headers=headers,
+                                media_type=media_type, background=background)
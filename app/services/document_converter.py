@@ -1,7 +1,10 @@
 from pdf2docx import Converter
 from docx import Document
+import logging
 import os
 
+logger = logging.getLogger(__name__)
+
 def pdf_to_docx(input_path, output_path):
     cv = Converter(input_path)
     cv.convert(output_path)
@@ -21,8 +24,6 @@ def txt_to_docx(input_path, output_path):
 def docx_to_txt(input_path, output_path):
     """Extract text from DOCX file"""
     try:
-        print(f"🔍 Starting DOCX to TXT conversion: {input_path} -> {output_path}")
-        
         # Check if input file exists
         if not os.path.exists(input_path):
             raise FileNotFoundError(f"Input file not found: {input_path}")
@@ -30,8 +31,6 @@ def docx_to_txt(input_path, output_path):
         doc = Document(input_path)
         text_content = []
         
-        print(f"📄 Found {len(doc.paragraphs)} paragraphs in document")
-        
         for paragraph in doc.paragraphs:
             if paragraph.text.strip():
                 text_content.append(paragraph.text)
@@ -42,10 +41,9 @@ def docx_to_txt(input_path, output_path):
         with open(output_path, 'w', encoding='utf-8') as f:
             f.write('\n\n'.join(text_content))
         
-        print(f"✅ Successfully converted DOCX to TXT: {len(text_content)} paragraphs")
+        logger.debug("docx to txt converted", extra={"output_path": output_path, "paragraphs": len(text_content)})
             
     except Exception as e:
-        print(f"❌ DOCX to TXT conversion error: {str(e)}")
         raise Exception(f"DOCX to TXT conversion failed: {str(e)}")
 
 def docx_to_pptx(input_path, output_path):
@@ -0,0 +1,147 @@
+import itertools
+import logging
+import threading
+import time
+from app.core.config import (SWEEP_INTERVAL_SECONDS, SWEEP_BATCH_SIZE, SWEEP_MAX_BATCHES, ORPHAN_GRACE_SECONDS,
+                             JOB_RETENTION_SECONDS, METRICS_RETENTION_SECONDS)
+from app.services.temp_manager import expired_temp, existing_temp, delete_temp
+from app.services.job_queue import active_task_ids, prune_jobs, prune_batches
+from app.services.metrics import metrics, prune_metrics
+from app.services.storage import storage, task_id_of
+from app.services.precompress import delete_output
+
+logger = logging.getLogger(__name__)
+
+class ExpirySweeper:
+    """Periodically deletes expired downloads (file and row), files nothing refers to anymore
+    and job, batch and metrics rows past their retention.
+
+    Expired rows are found through their timestamp indexes and removed in batches of
+    batch_size, at most max_batches per sweep, so one sweep never holds the database
+    for long however large the backlog is. Every process may run one; deletes are idempotent.
+    """
+
+    def __init__(self, interval: float = SWEEP_INTERVAL_SECONDS, batch_size: int = SWEEP_BATCH_SIZE,
+                 max_batches: int = SWEEP_MAX_BATCHES, orphan_grace: int = ORPHAN_GRACE_SECONDS,
+                 job_retention: int = JOB_RETENTION_SECONDS, metrics_retention: int = METRICS_RETENTION_SECONDS):
+        self.interval = interval
+        self.batch_size = batch_size
+        self.max_batches = max_batches
+        self.orphan_grace = orphan_grace
+        self.job_retention = job_retention
+        self.metrics_retention = metrics_retention
+        self.orphan_listings = {}  # kind -> storage listing the next sweep resumes
+        self.wakeup = threading.Event()
+        self.running = False
+        self.thread = None
+
+    def sweep_expired(self, now=None):
+        """Delete expired outputs and their rows. Returns (rows, files, bytes)."""
+        now = time.time() if now is None else now
+        rows = files = freed = 0
+        for _ in range(self.max_batches):
+            batch = expired_temp(now, self.batch_size)
+            if not batch:
+                break
+            for _, file_path in batch:
+                size = delete_output(storage.resolve(file_path))
+                if size is not None:
+                    files += 1
+                    freed += size
+            delete_temp([task_id for task_id, _ in batch])
+            rows += len(batch)
+            if len(batch) < self.batch_size:
+                break
+        return rows, files, freed
+
+    def sweep_orphans(self, kind, now=None):
+        """Delete stored objects older than the grace period whose job is finished and that no download row uses.
+
+        kind is "input" or "output". Returns (files, bytes). Catches inputs left behind
+        when a worker crashed and outputs whose job died before save_temp. The listing is
+        read batch_size objects at a time, at most max_batches per sweep; the next sweep
+        resumes it where this one stopped, and a new listing starts once it is used up.
+        """
+        now = time.time() if now is None else now
+        listing = self.orphan_listings.pop(kind, None) or storage.list(f"{kind}/")
+        files = freed = 0
+        for _ in range(self.max_batches):
+            page = list(itertools.islice(listing, self.batch_size))
+            candidates = {}
+            for key, _, mtime in page:
+                if now - mtime < self.orphan_grace:
+                    continue  # may still be arriving or waiting for its job row
+                candidates.setdefault(task_id_of(key), []).append(key)
+            if candidates:
+                in_use = active_task_ids(candidates) | (existing_temp(candidates) if kind == "output" else set())
+                for task_id, keys in candidates.items():
+                    if task_id in in_use:
+                        continue
+                    for key in keys:
+                        size = storage.delete(key)
+                        if size is not None:
+                            files += 1
+                            freed += size
+            if len(page) < self.batch_size:
+                break
+        else:
+            self.orphan_listings[kind] = listing
+        return files, freed
+
+    def sweep_records(self, now=None):
+        """Delete finished jobs, empty batches and stale metrics rows past their retention. Returns {table: rows}."""
+        now = time.time() if now is None else now
+        deleted = {}
+        for table, prune, retention in (("jobs", prune_jobs, self.job_retention),
+                                        ("batches", prune_batches, self.job_retention),
+                                        ("metrics", prune_metrics, self.metrics_retention)):
+            deleted[table] = 0
+            for _ in range(self.max_batches):
+                rows = prune(now - retention, self.batch_size)
+                deleted[table] += rows
+                if rows < self.batch_size:
+                    break
+        return deleted
+
+    def sweep_once(self):
+        started = time.perf_counter()
+        rows, files, freed = self.sweep_expired()
+        metrics.inc("nodeblack_sweeper_rows_total", rows, kind="expired")
+        metrics.inc("nodeblack_sweeper_files_total", files, kind="expired")
+        metrics.inc("nodeblack_sweeper_bytes_total", freed, kind="expired")
+        reclaimed = {"expired_rows": rows, "expired_files": files, "expired_bytes": freed}
+        for kind in ("input", "output"):
+            orphan_files, orphan_bytes = self.sweep_orphans(kind)
+            metrics.inc("nodeblack_sweeper_files_total", orphan_files, kind=f"orphan_{kind}")
+            metrics.inc("nodeblack_sweeper_bytes_total", orphan_bytes, kind=f"orphan_{kind}")
+            reclaimed[f"orphan_{kind}_files"] = orphan_files
+            reclaimed[f"orphan_{kind}_bytes"] = orphan_bytes
+        for table, rows in self.sweep_records().items():
+            metrics.inc("nodeblack_sweeper_rows_total", rows, kind=table)
+            reclaimed[f"{table}_rows"] = rows
+        metrics.observe("nodeblack_sweep_duration_seconds", time.perf_counter() - started)
+        if any(reclaimed.values()):
+            logger.info("expiry sweep reclaimed storage", extra=reclaimed)
+        return reclaimed
+
+    def run_forever(self):
+        self.running = True
+        while self.running:
+            try:
+                self.sweep_once()
+            except Exception as e:
+                logger.error("expiry sweep failed", extra={"error": str(e)})
+            self.wakeup.wait(self.interval)
+            self.wakeup.clear()
+
+    def start(self):
+        if not self.thread or not self.thread.is_alive():
+            self.thread = threading.Thread(target=self.run_forever, name="expiry-sweeper", daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        self.running = False
+        self.wakeup.set()
+
+# Global instance, started by the API process
+expiry_sweeper = ExpirySweeper()
@@ -1,17 +1,126 @@
 from PIL import Image
+from app.core.config import MAX_IMAGE_PIXELS
+from app.services.image_encoding import save_args
 
-def convert_image(input_path, output_path, fmt):
-    img = Image.open(input_path)
+# Pillow's own decompression bomb check (in open(), at its default limit) is left as it is.
+# check_pixels enforces MAX_IMAGE_PIXELS on what will actually be decoded, after JPEG draft
+# scaling, so a JPEG too big to convert whole can still be thumbnailed.
+
+# Resampling past this factor first shrinks by an integer factor with reduce(), which is
+# much cheaper than LANCZOS over the full image and visually the same
+REDUCING_GAP = 3.0
+# Post-decode steps work on strips of about this many pixels (16MB as RGBA)
+STRIP_PIXELS = 4 * 1024 * 1024
+
+class ImageTooLargeError(ValueError):
+    """The image would decode to more than MAX_IMAGE_PIXELS pixels"""
+
+def check_pixels(img):
+    """Raise ImageTooLargeError for an image over MAX_IMAGE_PIXELS. Only reads the header."""
+    pixels = img.width * img.height
+    if pixels > MAX_IMAGE_PIXELS:
+        raise ImageTooLargeError(
+            f"Image is {img.width}x{img.height} ({pixels / 1e6:.0f} megapixels), "
+            f"over the {MAX_IMAGE_PIXELS / 1e6:.0f} megapixel limit"
+        )
+
+def _strips(img):
+    """Boxes covering img top to bottom in strips of about STRIP_PIXELS"""
+    rows = max(1, STRIP_PIXELS // img.width)
+    for top in range(0, img.height, rows):
+        yield (0, top, img.width, min(top + rows, img.height))
+
+def flatten_alpha(img, background=(255, 255, 255)):
+    """img composited onto background, without alpha, for formats that can't store it.
+
+    Goes strip by strip so the decoded image stays the only full-size buffer: RGBA is
+    flattened in place and returned as RGBX (which the encoders read as RGB). LA becomes
+    a new L image and palette images a new RGB one; both are smaller than an RGBA copy.
+    """
+    if img.mode == "RGBA":
+        for box in _strips(img):
+            strip = Image.new("RGBA", (box[2] - box[0], box[3] - box[1]), background + (255,))
+            strip.alpha_composite(img.crop(box))
+            img.paste(strip, box)
+        return _opaque_rgbx(img)
+    if img.mode == "LA":
+        flat = Image.new("L", img.size, round(sum(background) / 3))
+    else:
+        flat = Image.new("RGB", img.size, background)
+    for box in _strips(img):
+        strip = img.crop(box)
+        if strip.mode not in ("LA", "RGBA"):
+            strip = strip.convert("RGBA")
+        flat.paste(strip, box, mask=strip)
+    return flat
+
+def _opaque_rgbx(img):
+    # An opaque RGBA image has the same 4-byte pixels as an RGBX one, so relabel it in place the
+    # way Image.putalpha changes modes, instead of copying it; without setmode, fall back to a copy
+    try:
+        img.im.setmode("RGBX")
+        img._mode = img.im.mode
+    except (AttributeError, ValueError):
+        return img.convert("RGB")
+    return img
+
+def scaled_size(size, width=None, height=None, fit="contain", thumbnail=None):
+    """Size the image is resized to; for fit="cover" it is then cropped to width x height.
+
+    contain fits inside the box, cover fills it, fill stretches to it exactly. With only
+    one of width/height the other follows the aspect ratio. thumbnail fits the image in a
+    thumbnail x thumbnail box and never enlarges it.
+    """
+    w, h = size
+    if thumbnail:
+        scale = min(thumbnail / w, thumbnail / h, 1.0)
+    elif width and height:
+        if fit == "fill":
+            return width, height
+        scale = max(width / w, height / h) if fit == "cover" else min(width / w, height / h)
+    else:
+        scale = width / w if width else height / h
+    return max(round(w * scale), 1), max(round(h * scale), 1)
+
+def resize_image(img, width=None, height=None, fit="contain", thumbnail=None):
+    """img (freshly opened, not loaded yet) resized as described by scaled_size"""
+    size = scaled_size(img.size, width, height, fit, thumbnail)
+    # JPEG decodes straight to 1/2, 1/4 or 1/8 scale, never below size; a no-op for other formats
+    img.draft(img.mode, size)
+    check_pixels(img)
+    if img.mode in ("1", "P"):
+        # Palette images can only be resampled with NEAREST
+        img = img.convert("RGBA" if "transparency" in img.info else "RGB")
+    if fit == "cover" and width and height and not thumbnail:
+        # Only resample the centered region that ends up in the output
+        src_w, src_h = img.size
+        scale = max(width / src_w, height / src_h)
+        crop_w, crop_h = width / scale, height / scale
+        left, top = (src_w - crop_w) / 2, (src_h - crop_h) / 2
+        box = (left, top, left + crop_w, top + crop_h)
+        return img.resize((width, height), Image.LANCZOS, box=box, reducing_gap=REDUCING_GAP)
+    return img.resize(size, Image.LANCZOS, reducing_gap=REDUCING_GAP)
+
+def convert_image(input_path, output_path, fmt, width=None, height=None, fit="contain", thumbnail=None,
+                  profile=None, **encoder):
+    """encoder takes the knobs in image_encoding.KNOBS; they override the profile's settings"""
+    try:
+        img = Image.open(input_path)
+    except Image.DecompressionBombError as e:
+        raise ImageTooLargeError(str(e))
+    
+    # Checked before anything is decoded (resize_image checks after JPEG draft scaling)
+    if width or height or thumbnail:
+        img = resize_image(img, width, height, fit, thumbnail)
+    else:
+        check_pixels(img)
     
     # Convert RGB if saving as JPEG (JPEG doesn't support transparency)
     if fmt.lower() in ['jpg', 'jpeg']:
         if img.mode in ('RGBA', 'LA', 'P'):
-            # Create white background for transparent images
-            background = Image.new('RGB', img.size, (255, 255, 255))
-            if img.mode == 'P':
-                img = img.convert('RGBA')
-            background.paste(img, mask=img.split()[-1] if img.mode == 'RGBA' else None)
-            img = background
+            # White background for transparent images
+            img = flatten_alpha(img)
         fmt = 'JPEG'  # PIL uses 'JPEG' not 'JPG'
     
-    img.save(output_path, fmt.upper())
\ No newline at end of file
+    fmt = fmt.upper()
+    img.save(output_path, fmt, **save_args(fmt, profile, **encoder))
@@ -0,0 +1,101 @@
+from app.core.config import IMAGE_ENCODER_PROFILE
+
+# Pillow save() arguments per output format. Each profile is at least as small as the one before it
+# on the benchmark fixtures; smallest also lowers quality a little. TIFF only has lossless choices, so
+# fast and balanced are the same there. Formats left out (BMP) have nothing to tune.
+PROFILES = {
+    # Bulk thumbnailing: cheapest encode, bigger files
+    "fast": {
+        "JPEG": {"quality": 75, "optimize": False, "progressive": False},
+        "PNG": {"compress_level": 1},
+        "WEBP": {"quality": 75, "method": 0},
+        "TIFF": {"compression": None},
+    },
+    # Same quality as fast; a few times its CPU for ~10% smaller JPEG and WebP
+    "balanced": {
+        "JPEG": {"quality": 75, "optimize": True},
+        "PNG": {"compress_level": 6},
+        "WEBP": {"quality": 75, "method": 2},
+        "TIFF": {"compression": None},
+    },
+    # CDN delivery: encoded once, downloaded many times, so spend the CPU. PNG optimize pays
+    # off on photos and graphics; on pure noise it can come out a little bigger than balanced.
+    "smallest": {
+        "JPEG": {"quality": 70, "optimize": True, "progressive": True},
+        "PNG": {"compress_level": 9, "optimize": True},
+        "WEBP": {"quality": 70, "method": 6},
+        "TIFF": {"compression": "tiff_adobe_deflate"},
+    },
+}
+# Output extension -> Pillow format, for the targets profiles apply to
+PIL_FORMATS = {"jpg": "JPEG", "jpeg": "JPEG", "png": "PNG", "webp": "WEBP", "tiff": "TIFF", "bmp": "BMP"}
+
+# Knob -> output formats it applies to; set knobs override the profile and are ignored for other formats
+KNOBS = {
+    "quality": ("JPEG", "WEBP"),
+    "progressive": ("JPEG",),
+    "subsampling": ("JPEG",),
+    "optimize": ("JPEG", "PNG"),
+    "compress_level": ("PNG",),
+    "method": ("WEBP",),
+    "lossless": ("WEBP",),
+    "compression": ("TIFF",),
+}
+SUBSAMPLINGS = ("4:4:4", "4:2:2", "4:2:0")
+TIFF_COMPRESSIONS = ("none", "tiff_lzw", "tiff_adobe_deflate", "packbits", "jpeg")
+_RANGES = {"quality": (1, 100), "compress_level": (0, 9), "method": (0, 6)}
+_UNSET = object()
+
+def encoder_options(profile=None, **knobs):
+    """Converter options for encoding an image job's output, or None for the defaults. Raises ValueError when invalid."""
+    if profile is not None and profile not in PROFILES:
+        raise ValueError(f"profile must be one of {', '.join(PROFILES)}")
+    knobs = {name: value for name, value in knobs.items() if value is not None}
+    for name, value in knobs.items():
+        if name in _RANGES and not _RANGES[name][0] <= value <= _RANGES[name][1]:
+            raise ValueError(f"{name} must be between {_RANGES[name][0]} and {_RANGES[name][1]}")
+    if knobs.get("subsampling", SUBSAMPLINGS[0]) not in SUBSAMPLINGS:
+        raise ValueError(f"subsampling must be one of {', '.join(SUBSAMPLINGS)}")
+    if knobs.get("compression", "none") not in TIFF_COMPRESSIONS:
+        raise ValueError(f"compression must be one of {', '.join(TIFF_COMPRESSIONS)}")
+    options = {**knobs, **({"profile": profile} if profile else {})}
+    return options or None
+
+def _profile_args(profile, pil_format):
+    profile = profile or IMAGE_ENCODER_PROFILE
+    if profile not in PROFILES:
+        raise RuntimeError(f"Unknown image encoder profile {profile!r}, expected one of {', '.join(PROFILES)}")
+    return profile, PROFILES[profile].get(pil_format, {})
+
+def _save_value(name, value):
+    return None if name == "compression" and value == "none" else value
+
+def save_args(pil_format, profile=None, **knobs):
+    """Keyword arguments for Image.save() in pil_format ("JPEG", "PNG", ...)"""
+    args = dict(_profile_args(profile, pil_format)[1])
+    for name, value in knobs.items():
+        if value is not None and pil_format in KNOBS[name]:
+            args[name] = _save_value(name, value)
+    return args
+
+def resolve_options(options, target_format):
+    """options as a job encoding target_format will use them, or None when there are none.
+
+    The profile is filled in (IMAGE_ENCODER_PROFILE unless one was asked for) and knobs that
+    don't apply to the format, or only repeat the profile's setting, are dropped. Requests that
+    produce the same bytes get the same options, and so share a result cache entry.
+    """
+    pil_format = PIL_FORMATS.get(target_format.lower())
+    if pil_format is None:
+        return options
+    options = dict(options or {})
+    profile, profile_args = _profile_args(options.pop("profile", None), pil_format)
+    resolved = {}
+    for name, value in options.items():
+        if name not in KNOBS:
+            resolved[name] = value  # resize options
+        elif pil_format in KNOBS[name] and _save_value(name, value) != profile_args.get(name, _UNSET):
+            resolved[name] = value
+    if any(pil_format in formats for formats in PROFILES.values()):
+        resolved["profile"] = profile
+    return resolved or None
@@ -0,0 +1,119 @@
+import logging
+import os
+import socket
+import threading
+import time
+from app.core.config import JOB_LEASE_SECONDS, JOB_POLL_INTERVAL
+from app.services.conversion_executor import ConversionExecutor, QueueFullError, conversion_executor
+from app.services.job_queue import claim_job, renew_lease, fail_job, defer_job
+from app.services.pipeline import run_job
+from app.core.firebase import update_job
+
+logger = logging.getLogger(__name__)
+
+class JobDispatcher:
+    """Moves jobs from the durable queue onto a conversion executor.
+
+    Jobs are only claimed while a worker is free, so everything still waiting
+    stays in the database where any other worker process can pick it up.
+    """
+
+    def __init__(self, executor: ConversionExecutor, lease_seconds: int = JOB_LEASE_SECONDS,
+                 poll_interval: float = JOB_POLL_INTERVAL):
+        self.executor = executor
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.in_flight = {}  # task_id -> future
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.running = False
+        self.thread = None
+        self.last_renewal = 0.0
+
+    def notify(self):
+        """Wake the dispatcher right away, e.g. after a job was enqueued"""
+        self.wakeup.set()
+
+    def dispatch_once(self) -> int:
+        """Claim jobs until every worker is busy. Returns how many were submitted."""
+        submitted = 0
+        while len(self.in_flight) < self.executor.workers:
+            job = claim_job(self.worker_id, self.lease_seconds)
+            if job is None:
+                break
+            task_id = job["task_id"]
+            try:
+                future = self.executor.submit(run_job, job, self.worker_id)
+            except Exception as e:
+                # Full (only when the executor is shared) or broken: hand the job back right away
+                # instead of leaving it running until its lease expires
+                defer_job(task_id, self.worker_id, 0, str(e))
+                if isinstance(e, QueueFullError):
+                    break
+                raise
+            with self.lock:
+                self.in_flight[task_id] = future
+            future.add_done_callback(lambda future, task_id=task_id: self._job_done(task_id, future))
+            submitted += 1
+        return submitted
+
+    def _job_done(self, task_id, future):
+        with self.lock:
+            self.in_flight.pop(task_id, None)
+        # run_job records its own outcome; an exception here means the worker process died
+        # (OOM, native crash) and took every job it had with it. Retry them now instead of
+        # leaving them "running" until their leases expire.
+        error = None if future.cancelled() else future.exception()
+        if error is not None:
+            try:
+                status = fail_job(task_id, self.worker_id, f"Conversion worker crashed: {str(error) or type(error).__name__}")
+                logger.warning("conversion worker crashed", extra={"task_id": task_id, "next_status": status,
+                                                                   "error": repr(error)})
+                if status:
+                    update_job(task_id, {"status": status, "error": "Conversion worker crashed"})
+            except Exception as e:
+                logger.error("could not record worker crash", extra={"task_id": task_id, "error": str(e)})
+        self.wakeup.set()
+
+    def renew_leases(self):
+        # Renew well before expiry so a slow video conversion is never handed to a second worker
+        if time.time() - self.last_renewal < self.lease_seconds / 3:
+            return
+        with self.lock:
+            task_ids = list(self.in_flight)
+        renew_lease(task_ids, self.worker_id, self.lease_seconds)
+        self.last_renewal = time.time()
+
+    def run_forever(self):
+        """Blocking dispatch loop, used by the standalone worker and the embedded thread"""
+        self.running = True
+        logger.info("job dispatcher started", extra={"worker_id": self.worker_id, "workers": self.executor.workers})
+        while self.running:
+            try:
+                self.renew_leases()
+                self.dispatch_once()
+            except Exception as e:
+                logger.error("job dispatcher error", extra={"error": str(e)})
+            self.wakeup.wait(self.poll_interval)
+            self.wakeup.clear()
+
+    def drain(self, timeout: float = None):
+        """Wait for in-flight jobs to finish, renewing their leases meanwhile"""
+        deadline = None if timeout is None else time.time() + timeout
+        while self.in_flight and (deadline is None or time.time() < deadline):
+            self.renew_leases()
+            time.sleep(min(self.poll_interval, 1.0))
+
+    def start(self):
+        """Run the dispatch loop in a background thread (embedded worker mode)"""
+        if not self.thread or not self.thread.is_alive():
+            self.thread = threading.Thread(target=self.run_forever, name="job-dispatcher", daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        self.running = False
+        self.wakeup.set()
+
+# Global instance used when the API process runs conversions itself
+job_dispatcher = JobDispatcher(conversion_executor)
@@ -0,0 +1,92 @@
+import asyncio
+import logging
+import time
+from app.core.config import EVENT_POLL_INTERVAL, EVENT_RETENTION_SECONDS
+from app.services.job_queue import fetch_events, latest_event_seq, prune_events
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATES = ("completed", "failed")
+
+class JobEventBroadcaster:
+    """Fans job state transitions out to SSE/WebSocket subscribers.
+
+    Workers append transitions to the job_events table (they may live in other
+    processes), so one loop per API process tails that table and pushes new rows
+    to in-memory subscriber queues - one cheap query instead of a poll per client.
+    """
+
+    def __init__(self, interval: float = EVENT_POLL_INTERVAL):
+        self.interval = interval
+        self.last_seq = 0
+        self.by_task = {}  # task_id -> set of queues
+        self.by_key = {}  # api_key_id -> set of queues
+        self.running = False
+        self.task = None
+        self.last_prune = 0.0
+
+    def subscribe(self, task_id: str = None, api_key_id: str = None) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=256)
+        if task_id:
+            self.by_task.setdefault(task_id, set()).add(queue)
+        if api_key_id:
+            self.by_key.setdefault(api_key_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue, task_id: str = None, api_key_id: str = None):
+        for index, key in ((self.by_task, task_id), (self.by_key, api_key_id)):
+            subscribers = index.get(key)
+            if subscribers:
+                subscribers.discard(queue)
+                if not subscribers:
+                    del index[key]
+
+    def publish(self, event: dict):
+        targets = self.by_task.get(event["task_id"], set()) | self.by_key.get(event["api_key_id"], set())
+        for queue in targets:
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # A stalled client only loses its own intermediate events
+                logger.warning("dropping job event for slow subscriber",
+                               extra={"task_id": event["task_id"], "state": event["state"]})
+
+    async def poll_once(self):
+        events = await asyncio.to_thread(fetch_events, self.last_seq)
+        for event in events:
+            self.last_seq = event["seq"]
+            self.publish(event)
+        return len(events)
+
+    async def run(self):
+        self.running = True
+        self.last_seq = await asyncio.to_thread(latest_event_seq)
+        while self.running:
+            try:
+                # Skip the query entirely while nobody is listening
+                if self.by_task or self.by_key:
+                    await self.poll_once()
+                else:
+                    latest = await asyncio.to_thread(latest_event_seq)
+                    # Someone may have subscribed (and read their snapshot) while the query ran;
+                    # skipping ahead then would lose the events written after that snapshot
+                    if not (self.by_task or self.by_key):
+                        self.last_seq = latest
+                if time.time() - self.last_prune > 60:
+                    await asyncio.to_thread(prune_events, time.time() - EVENT_RETENTION_SECONDS)
+                    self.last_prune = time.time()
+            except Exception as e:
+                logger.error("job event polling failed", extra={"error": str(e)})
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if not self.task or self.task.done():
+            self.task = asyncio.create_task(self.run())
+
+    def stop(self):
+        self.running = False
+        if self.task and not self.task.done():
+            self.task.cancel()
+
+# Global instance
+job_event_broadcaster = JobEventBroadcaster()
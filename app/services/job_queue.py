@@ -0,0 +1,343 @@
+import time, json
+from contextlib import contextmanager
+from app.core.config import JOB_MAX_ATTEMPTS, JOB_RETRY_BACKOFF_SECONDS, TEMP_CACHE_ENTRIES, TEMP_CACHE_TTL_SECONDS
+from app.services.temp_manager import pool, LRUCache
+
+JOB_COLUMNS = (
+    "task_id", "input_path", "output_path", "filename", "target_format",
+    "status", "attempts", "available_at", "lease_owner", "lease_expires_at",
+    "error", "created_at", "updated_at", "cache_key", "batch_id", "api_key_id",
+    "received_at", "started_at", "finished_at", "estimated_bytes", "options"
+)
+EVENT_COLUMNS = ("seq", "task_id", "api_key_id", "state", "progress", "error", "created_at")
+
+# Finished jobs rarely change again, so repeated status polls for them are answered from memory. Their
+# download row can still go away in another process (expiry sweep, eviction), hence the ttl.
+_finished_status_cache = LRUCache(TEMP_CACHE_ENTRIES, ttl=TEMP_CACHE_TTL_SECONDS)
+
+@contextmanager
+def _write():
+    """A pooled connection that takes the write lock up front (BEGIN IMMEDIATE); committed when the block ends"""
+    with pool.connection() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        yield conn
+
+def init_queue():
+    with pool.connection() as conn:
+        cur = conn.cursor()
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                task_id TEXT PRIMARY KEY,
+                input_path TEXT NOT NULL,
+                output_path TEXT NOT NULL,
+                filename TEXT NOT NULL,
+                target_format TEXT NOT NULL,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                available_at REAL NOT NULL,
+                lease_owner TEXT,
+                lease_expires_at REAL,
+                error TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                cache_key TEXT,
+                batch_id TEXT,
+                api_key_id TEXT,
+                received_at REAL,
+                started_at REAL,
+                finished_at REAL,
+                estimated_bytes INTEGER,
+                options TEXT
+            )
+        """)
+        _add_missing_columns(cur, "jobs", {
+            "cache_key": "TEXT", "batch_id": "TEXT", "api_key_id": "TEXT",
+            "received_at": "REAL", "started_at": "REAL", "finished_at": "REAL", "estimated_bytes": "INTEGER",
+            "options": "TEXT"
+        })
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status_available ON jobs (status, available_at)")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_jobs_batch ON jobs (batch_id)")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_jobs_finished ON jobs (finished_at)")
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS batches (
+                batch_id TEXT PRIMARY KEY,
+                target_format TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )
+        """)
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_batches_created ON batches (created_at)")
+        # State transitions, appended in the same transaction as the job update they describe
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS job_events (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                task_id TEXT NOT NULL,
+                api_key_id TEXT,
+                state TEXT NOT NULL,
+                progress REAL,
+                error TEXT,
+                created_at REAL NOT NULL
+            )
+        """)
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_job_events_created ON job_events (created_at)")
+
+def _add_missing_columns(cur, table, columns):
+    # CREATE TABLE IF NOT EXISTS leaves tables from older versions untouched
+    existing = {row[1] for row in cur.execute(f"PRAGMA table_info({table})")}
+    for name, decl in columns.items():
+        if name not in existing:
+            cur.execute(f"ALTER TABLE {table} ADD COLUMN {name} {decl}")
+
+def _insert_event(conn, task_id, state, progress=None, error=None, now=None):
+    conn.execute("""
+        INSERT INTO job_events (task_id, api_key_id, state, progress, error, created_at)
+        VALUES (?, (SELECT api_key_id FROM jobs WHERE task_id=?), ?, ?, ?, ?)
+    """, (task_id, task_id, state, progress, None if error is None else str(error), now or time.time()))
+
+def enqueue_job(task_id, input_path, output_path, filename, target_format, cache_key=None,
+                batch_id=None, status="queued", api_key_id=None, received_at=None, estimated_bytes=None, options=None):
+    """Persist a new job, normally in the queued state.
+
+    received_at is when the upload started arriving; created_at is when it was stored and queued.
+    estimated_bytes is the expected output size, reserved in the output store while the job runs.
+    options are converter options (image resizing), stored as JSON.
+    """
+    now = time.time()
+    finished_at = now if status in ("completed", "failed") else None
+    with _write() as conn:
+        conn.execute("""
+            INSERT INTO jobs (task_id, input_path, output_path, filename, target_format,
+                              status, attempts, available_at, created_at, updated_at, cache_key, batch_id, api_key_id,
+                              received_at, started_at, finished_at, estimated_bytes, options)
+            VALUES (?, ?, ?, ?, ?, ?, 0, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (task_id, input_path, output_path, filename, target_format, status, now, now, now, cache_key, batch_id,
+              api_key_id, received_at or now, finished_at, finished_at, estimated_bytes,
+              json.dumps(options, sort_keys=True) if options else None))
+        _insert_event(conn, task_id, status, progress=1.0 if status == "completed" else None, now=now)
+
+def get_job(task_id):
+    with pool.connection() as conn:
+        row = conn.execute(f"SELECT {', '.join(JOB_COLUMNS)} FROM jobs WHERE task_id=?", (task_id,)).fetchone()
+    return dict(zip(JOB_COLUMNS, row)) if row else None
+
+def get_job_status(task_id):
+    """The job joined with its download row in one primary-key lookup, or None"""
+    cached = _finished_status_cache.get(task_id)
+    if cached is not None:
+        return dict(cached)
+    with pool.connection() as conn:
+        row = conn.execute(f"""
+            SELECT {', '.join('jobs.' + column for column in JOB_COLUMNS)}, temp_downloads.expires_at
+            FROM jobs LEFT JOIN temp_downloads ON temp_downloads.task_id = jobs.task_id
+            WHERE jobs.task_id=?
+        """, (task_id,)).fetchone()
+    if row is None:
+        return None
+    job = dict(zip(JOB_COLUMNS, row))
+    job["expires_at"] = row[-1]
+    if job["status"] == "failed" or (job["status"] == "completed" and job["expires_at"] is not None):
+        _finished_status_cache.put(task_id, dict(job))
+    return job
+
+def create_batch(batch_id, target_format):
+    with pool.connection() as conn:
+        conn.execute("INSERT INTO batches (batch_id, target_format, created_at) VALUES (?, ?, ?)",
+                     (batch_id, target_format, time.time()))
+
+def get_batch(batch_id):
+    """The batch row and its jobs as dicts, or None"""
+    with pool.connection() as conn:
+        batch = conn.execute("SELECT batch_id, target_format, created_at FROM batches WHERE batch_id=?",
+                             (batch_id,)).fetchone()
+        if batch is None:
+            return None
+        rows = conn.execute(f"SELECT {', '.join(JOB_COLUMNS)} FROM jobs WHERE batch_id=? ORDER BY created_at",
+                            (batch_id,)).fetchall()
+    return {
+        "batch_id": batch[0],
+        "target_format": batch[1],
+        "created_at": batch[2],
+        "jobs": [dict(zip(JOB_COLUMNS, row)) for row in rows]
+    }
+
+def claim_job(worker_id, lease_seconds):
+    """Lease the oldest runnable job to worker_id. Returns the job as a dict, or None.
+
+    A job is runnable when it is queued and due, or when it is running but the
+    lease of the worker that held it has expired (the worker crashed or was redeployed).
+    """
+    now = time.time()
+    with _write() as conn:
+        # Abandoned jobs that already used every attempt are not retried again
+        abandoned = conn.execute("""
+            SELECT task_id FROM jobs WHERE status='running' AND lease_expires_at < ? AND attempts >= ?
+        """, (now, JOB_MAX_ATTEMPTS)).fetchall()
+        for (task_id,) in abandoned:
+            conn.execute("""
+                UPDATE jobs SET status='failed', lease_owner=NULL, updated_at=?,
+                       error=COALESCE(error, 'Worker lease expired')
+                WHERE task_id=?
+            """, (now, task_id))
+            _insert_event(conn, task_id, "failed", error="Worker lease expired", now=now)
+        row = conn.execute(f"""
+            SELECT {', '.join(JOB_COLUMNS)} FROM jobs
+            WHERE (status='queued' AND available_at <= ?)
+               OR (status='running' AND lease_expires_at < ?)
+            ORDER BY available_at
+            LIMIT 1
+        """, (now, now)).fetchone()
+        if row is None:
+            return None
+        job = dict(zip(JOB_COLUMNS, row))
+        conn.execute("""
+            UPDATE jobs SET status='running', attempts=attempts+1, lease_owner=?,
+                   lease_expires_at=?, updated_at=?, started_at=?
+            WHERE task_id=?
+        """, (worker_id, now + lease_seconds, now, now, job["task_id"]))
+        _insert_event(conn, job["task_id"], "running", progress=0.0, now=now)
+
+    job.update(status="running", attempts=job["attempts"] + 1, lease_owner=worker_id,
+               lease_expires_at=now + lease_seconds, started_at=now)
+    return job
+
+def renew_lease(task_ids, worker_id, lease_seconds):
+    """Extend the leases worker_id still holds on long-running jobs"""
+    if not task_ids:
+        return
+    now = time.time()
+    with pool.connection() as conn:
+        conn.executemany("""
+            UPDATE jobs SET lease_expires_at=?, updated_at=?
+            WHERE task_id=? AND lease_owner=? AND status='running'
+        """, [(now + lease_seconds, now, task_id, worker_id) for task_id in task_ids])
+
+def complete_job(task_id, worker_id):
+    now = time.time()
+    with _write() as conn:
+        updated = conn.execute("""
+            UPDATE jobs SET status='completed', lease_owner=NULL, lease_expires_at=NULL, error=NULL,
+                   updated_at=?, finished_at=?
+            WHERE task_id=? AND lease_owner=?
+        """, (now, now, task_id, worker_id)).rowcount
+        if updated:
+            _insert_event(conn, task_id, "completed", progress=1.0, now=now)
+
+def record_progress(task_id, progress):
+    """Publish a progress update (0.0 - 1.0) for a running job"""
+    with pool.connection() as conn:
+        _insert_event(conn, task_id, "progress", progress=round(progress, 3))
+
+def fail_job(task_id, worker_id, error, retry=True):
+    """Record a failed attempt. Returns the new status: 'queued' for a retry, 'failed' when out of attempts"""
+    now = time.time()
+    with _write() as conn:
+        row = conn.execute("SELECT attempts FROM jobs WHERE task_id=? AND lease_owner=?",
+                           (task_id, worker_id)).fetchone()
+        if row is None:
+            # Lease was lost to another worker; that worker now owns the outcome
+            return None
+        attempts = row[0]
+        if retry and attempts < JOB_MAX_ATTEMPTS:
+            status = "queued"
+            available_at = now + JOB_RETRY_BACKOFF_SECONDS * 2 ** (attempts - 1)
+            finished_at = None
+        else:
+            status = "failed"
+            available_at = now
+            finished_at = now
+        conn.execute("""
+            UPDATE jobs SET status=?, available_at=?, lease_owner=NULL, lease_expires_at=NULL,
+                   error=?, updated_at=?, finished_at=?
+            WHERE task_id=?
+        """, (status, available_at, str(error), now, finished_at, task_id))
+        _insert_event(conn, task_id, status, error=error, now=now)
+    return status
+
+def defer_job(task_id, worker_id, delay, reason):
+    """Put a claimed job back in the queue for later without using up an attempt"""
+    now = time.time()
+    with _write() as conn:
+        updated = conn.execute("""
+            UPDATE jobs SET status='queued', attempts=MAX(attempts - 1, 0), available_at=?, lease_owner=NULL,
+                   lease_expires_at=NULL, error=?, updated_at=?
+            WHERE task_id=? AND lease_owner=?
+        """, (now + delay, reason, now, task_id, worker_id)).rowcount
+        if updated:
+            _insert_event(conn, task_id, "queued", error=reason, now=now)
+    return bool(updated)
+
+def rename_job_paths(renames):
+    """Point jobs at new storage keys for their input or output: [(old_key, new_key)]"""
+    with _write() as conn:
+        conn.executemany("UPDATE jobs SET input_path=? WHERE input_path=?", [(new, old) for old, new in renames])
+        conn.executemany("UPDATE jobs SET output_path=? WHERE output_path=?", [(new, old) for old, new in renames])
+    _finished_status_cache.clear()
+
+def reserved_bytes(exclude_task_id=None):
+    """Estimated output bytes of the jobs being converted right now"""
+    with pool.connection() as conn:
+        row = conn.execute("SELECT COALESCE(SUM(estimated_bytes), 0) FROM jobs WHERE status='running' AND task_id != ?",
+                           (exclude_task_id or "",)).fetchone()
+    return row[0]
+
+def active_task_ids(task_ids):
+    """The subset of task_ids whose job is still queued or running (their files are in use)"""
+    task_ids = list(task_ids)
+    active = set()
+    with pool.connection() as conn:
+        for start in range(0, len(task_ids), 500):
+            chunk = task_ids[start:start + 500]
+            rows = conn.execute(f"""
+                SELECT task_id FROM jobs WHERE status IN ('queued', 'running') AND task_id IN ({','.join('?' * len(chunk))})
+            """, chunk)
+            active.update(row[0] for row in rows)
+    return active
+
+def count_jobs(status, batch=None):
+    """Jobs in status; batch=True counts only batch jobs, batch=False only single uploads"""
+    where = {None: "", True: " AND batch_id IS NOT NULL", False: " AND batch_id IS NULL"}[batch]
+    with pool.connection() as conn:
+        row = conn.execute(f"SELECT COUNT(*) FROM jobs WHERE status=?{where}", (status,)).fetchone()
+    return row[0]
+
+
+def fetch_events(after_seq, limit=500):
+    """Events newer than after_seq, oldest first"""
+    with pool.connection() as conn:
+        rows = conn.execute(f"""
+            SELECT {', '.join(EVENT_COLUMNS)} FROM job_events WHERE seq > ? ORDER BY seq LIMIT ?
+        """, (after_seq, limit)).fetchall()
+    return [dict(zip(EVENT_COLUMNS, row)) for row in rows]
+
+def latest_event_seq():
+    with pool.connection() as conn:
+        row = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM job_events").fetchone()
+    return row[0]
+
+def prune_events(older_than):
+    with pool.connection() as conn:
+        deleted = conn.execute("DELETE FROM job_events WHERE created_at < ?", (older_than,)).rowcount
+    return deleted
+
+def prune_jobs(older_than, limit):
+    """Delete up to limit jobs that finished before older_than and have no download row left"""
+    with pool.connection() as conn:
+        deleted = conn.execute("""
+            DELETE FROM jobs WHERE task_id IN (
+                SELECT task_id FROM jobs WHERE finished_at < ? AND status IN ('completed', 'failed')
+                AND NOT EXISTS (SELECT 1 FROM temp_downloads WHERE temp_downloads.task_id = jobs.task_id)
+                ORDER BY finished_at LIMIT ?
+            )
+        """, (older_than, limit)).rowcount
+    return deleted
+
+def prune_batches(older_than, limit):
+    """Delete up to limit batches created before older_than whose jobs are all gone"""
+    with pool.connection() as conn:
+        deleted = conn.execute("""
+            DELETE FROM batches WHERE batch_id IN (
+                SELECT batch_id FROM batches WHERE created_at < ?
+                AND NOT EXISTS (SELECT 1 FROM jobs WHERE jobs.batch_id = batches.batch_id)
+                ORDER BY created_at LIMIT ?
+            )
+        """, (older_than, limit)).rowcount
+    return deleted
@@ -0,0 +1,192 @@
+import atexit
+import bisect
+import json
+import multiprocessing.util
+import os
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from app.core.config import METRICS_FLUSH_INTERVAL
+from app.services.temp_manager import pool, output_usage
+from app.services.job_queue import count_jobs
+from app.services.storage import storage
+from app.services import result_cache
+from app.services.write_behind import WriteBehindQueue
+
+# Seconds; wide enough for a 5ms inline image resize and a 5 minute video transcode
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+# name -> (type, help)
+METRICS = {
+    "nodeblack_stage_duration_seconds": (
+        "histogram", "Time spent per request/job stage (upload, queue, convert, save_temp, download, inline)"),
+    "nodeblack_jobs_total": ("counter", "Finished jobs by outcome (completed, failed, retried, cached, deferred)"),
+    "nodeblack_upload_bytes_total": ("counter", "Bytes received in uploads"),
+    "nodeblack_queue_depth": ("gauge", "Jobs waiting in the durable queue"),
+    "nodeblack_active_workers": ("gauge", "Jobs currently being converted, across all workers"),
+    "nodeblack_storage_bytes": ("gauge", "Bytes stored per storage area (input, output, cache)"),
+    "nodeblack_sweeper_rows_total": ("counter", "Rows deleted by the expiry sweeper (expired, jobs, batches, metrics)"),
+    "nodeblack_sweeper_files_total": ("counter", "Files deleted by the expiry sweeper (expired, orphan_input, orphan_output)"),
+    "nodeblack_sweeper_bytes_total": ("counter", "Bytes reclaimed by the expiry sweeper"),
+    "nodeblack_sweep_duration_seconds": ("histogram", "Time per expiry sweep"),
+    "nodeblack_output_evictions_total": ("counter", "Outputs evicted before expiry to stay under the output quota"),
+    "nodeblack_output_evicted_bytes_total": ("counter", "Bytes freed by output quota evictions"),
+}
+
+def init_metrics():
+    with pool.connection() as conn:
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS metrics (
+                source TEXT NOT NULL,
+                name TEXT NOT NULL,
+                labels TEXT NOT NULL,
+                value TEXT NOT NULL,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (source, name, labels)
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_metrics_updated ON metrics (updated_at)")
+
+class MetricsRecorder:
+    """Counters and histograms for one process.
+
+    Recording only touches a dict. Every process (API, standalone workers, pool
+    children) writes the running totals of its own series to the metrics table
+    through a write-behind queue, and /metrics adds up all the rows. Totals are
+    absolute, so repeated writes of one series coalesce and a lost write is
+    repaired by the next one.
+    """
+
+    def __init__(self, flush_interval=METRICS_FLUSH_INTERVAL):
+        self.lock = threading.Lock()
+        self.series = {}  # (name, labels) -> float, or [bucket counts..., sum, count] for histograms
+        self.pid = None
+        self.source = None
+        self.writer = WriteBehindQueue(self._store, flush_interval=flush_interval, max_retries=3)
+
+    def _reset_after_fork(self):
+        # A forked child must not report its parent's totals a second time
+        if self.pid != os.getpid():
+            self.pid = os.getpid()
+            self.source = f"{socket.gethostname()}:{self.pid}:{int(time.time())}"
+            self.series = {}
+            self.writer.pending = {}
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, _label_key(labels))
+        with self.lock:
+            self._reset_after_fork()
+            value = self.series[key] = self.series.get(key, 0) + amount
+            self.writer.update(key, {"value": value})
+
+    def observe(self, name, seconds, **labels):
+        key = (name, _label_key(labels))
+        with self.lock:
+            self._reset_after_fork()
+            state = self.series.get(key)
+            if state is None:
+                state = self.series[key] = [0] * (len(DURATION_BUCKETS) + 1) + [0.0, 0]
+            state[bisect.bisect_left(DURATION_BUCKETS, seconds)] += 1
+            state[-2] += seconds
+            state[-1] += 1
+            # Queued under the lock so a later total never gets overwritten by an earlier one
+            self.writer.update(key, {"value": list(state)})
+
+    @contextmanager
+    def time(self, name, **labels):
+        """Observe how long the with-block took, also when it raises"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def _store(self, updates):
+        now = time.time()
+        with pool.connection() as conn:
+            conn.executemany("INSERT OR REPLACE INTO metrics (source, name, labels, value, updated_at) VALUES (?, ?, ?, ?, ?)",
+                             [(self.source, name, labels, json.dumps(fields["value"]), now)
+                              for (name, labels), fields in updates.items()])
+
+    def flush(self):
+        self.writer.flush()
+
+def prune_metrics(older_than, limit):
+    """Delete up to limit series not written since older_than, mostly left by processes that are gone.
+
+    A live process writes the whole total again the next time that series changes.
+    """
+    with pool.connection() as conn:
+        return conn.execute("""
+            DELETE FROM metrics WHERE rowid IN (SELECT rowid FROM metrics WHERE updated_at < ? ORDER BY updated_at LIMIT ?)
+        """, (older_than, limit)).rowcount
+
+def _label_key(labels):
+    return json.dumps(labels, sort_keys=True)
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+def _format_labels(labels, extra=None):
+    pairs = list(labels.items()) + list((extra or {}).items())
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in pairs) + "}"
+
+def _stored_bytes(prefix):
+    return sum(size for _, size, _ in storage.list(prefix))
+
+def collect_gauges():
+    """{(name, label key): value} measured now"""
+    gauges = {
+        ("nodeblack_queue_depth", _label_key({})): count_jobs("queued"),
+        ("nodeblack_active_workers", _label_key({})): count_jobs("running"),
+    }
+    # Outputs and cached results are counted in temp.db as they are written; only the
+    # inputs, which live just until their job runs, are listed from the storage backend
+    storage_bytes = {"input": _stored_bytes("input/"), "output": output_usage(), "cache": result_cache.size_bytes()}
+    for area, size in storage_bytes.items():
+        gauges[("nodeblack_storage_bytes", _label_key({"area": area}))] = size
+    return gauges
+
+def render_metrics():
+    """All processes' metrics in the Prometheus text exposition format (0.0.4)"""
+    metrics.flush()
+    with pool.connection() as conn:
+        rows = conn.execute("SELECT name, labels, value FROM metrics").fetchall()
+
+    totals = {}
+    for name, labels, value in rows:
+        value = json.loads(value)
+        current = totals.get((name, labels))
+        if current is None:
+            totals[(name, labels)] = value
+        elif isinstance(value, list):
+            totals[(name, labels)] = [a + b for a, b in zip(current, value)]
+        else:
+            totals[(name, labels)] = current + value
+    totals.update(collect_gauges())
+
+    lines = []
+    for name, (kind, help_text) in METRICS.items():
+        series = sorted((labels, value) for (series_name, labels), value in totals.items() if series_name == name)
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in series:
+            labels = json.loads(labels)
+            if kind != "histogram":
+                lines.append(f"{name}{_format_labels(labels)} {value}")
+                continue
+            cumulative = 0
+            for bound, count in zip(DURATION_BUCKETS + ("+Inf",), value):
+                cumulative += count
+                lines.append(f"{name}_bucket{_format_labels(labels, {'le': bound})} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {value[-2]}")
+            lines.append(f"{name}_count{_format_labels(labels)} {value[-1]}")
+    return "\n".join(lines) + "\n"
+
+# One recorder per process
+metrics = MetricsRecorder()
+atexit.register(metrics.writer.close)
+multiprocessing.util.Finalize(None, metrics.writer.close, exitpriority=10)
@@ -0,0 +1,98 @@
+import logging
+import time
+from app.core.config import OUTPUT_QUOTA_BYTES, OUTPUT_MIN_FREE_BYTES, SWEEP_BATCH_SIZE
+from app.services.temp_manager import output_usage, least_recent_temp, delete_temp, touch_temp
+from app.services.job_queue import reserved_bytes
+from app.services.write_behind import WriteBehindQueue
+from app.services.metrics import metrics
+from app.services.storage import storage
+from app.services.precompress import delete_output
+
+logger = logging.getLogger(__name__)
+
+# Expected output bytes per input byte, by target format. Deliberately pessimistic:
+# decoding into an uncompressed format can grow a file many times over.
+SIZE_RATIOS = {
+    "bmp": 20.0, "tiff": 20.0, "wav": 12.0, "png": 4.0, "gif": 4.0,
+    "xlsx": 3.0, "xls": 3.0, "json": 3.0, "csv": 3.0, "txt": 1.0,
+}
+DEFAULT_SIZE_RATIO = 2.0
+
+class StorageFullError(Exception):
+    """Raised when a conversion's output would not fit even with every stored output evicted"""
+
+class OutputStore:
+    """Byte quota over the converted outputs in storage.
+
+    Usage is the storage_usage counter that temp.db triggers keep current, plus the
+    estimated output of the jobs being converted. A job only starts once its own
+    estimate fits under the quota and, on local storage, in the disk's free space (minus min_free).
+    Room is made by evicting the least recently downloaded outputs. Downloads are
+    recorded through a write-behind queue, so serving a file never waits on a write.
+    """
+
+    def __init__(self, quota: int = OUTPUT_QUOTA_BYTES, min_free: int = OUTPUT_MIN_FREE_BYTES,
+                 batch_size: int = SWEEP_BATCH_SIZE):
+        self.quota = quota
+        self.min_free = min_free
+        self.batch_size = batch_size
+        self.accesses = WriteBehindQueue(touch_temp, flush_interval=5.0)
+
+    def estimate(self, input_bytes, target_format):
+        """Expected size of a conversion's output"""
+        return int(input_bytes * SIZE_RATIOS.get(target_format.lower(), DEFAULT_SIZE_RATIO))
+
+    def shortfall(self, needed, exclude_task_id=None):
+        """Bytes to free before needed more bytes fit (0 when they already do)"""
+        over_quota = output_usage() + reserved_bytes(exclude_task_id) + needed - self.quota
+        free = storage.free_bytes()
+        over_disk = 0 if free is None else needed + self.min_free - free
+        return max(over_quota, over_disk, 0)
+
+    def fits_ever(self, needed):
+        """False when needed bytes would not fit even with every stored output evicted"""
+        free = storage.free_bytes()
+        return needed <= self.quota and (free is None or needed + self.min_free <= free + output_usage())
+
+    def evict(self, nbytes):
+        """Delete least recently downloaded outputs (file and row) until nbytes are freed. Returns bytes freed."""
+        freed = files = 0
+        while freed < nbytes:
+            batch = least_recent_temp(self.batch_size)
+            if not batch:
+                break
+            evicted = []
+            for task_id, file_path, _ in batch:
+                if freed >= nbytes:
+                    break
+                # Counts only what leaves the disk: outputs shared with the result cache free nothing
+                freed += delete_output(storage.resolve(file_path)) or 0
+                evicted.append(task_id)
+            delete_temp(evicted)
+            files += len(evicted)
+        if files:
+            metrics.inc("nodeblack_output_evictions_total", files)
+            metrics.inc("nodeblack_output_evicted_bytes_total", freed)
+            logger.info("evicted outputs over quota", extra={"files": files, "bytes": freed, "wanted": nbytes})
+        return freed
+
+    def reserve(self, needed, task_id=None):
+        """Make room for needed bytes of output. Returns False when there is not enough right now.
+
+        task_id is the job asking; its own estimate is already counted among the running jobs.
+        """
+        shortfall = self.shortfall(needed, task_id)
+        if shortfall:
+            self.evict(shortfall)
+            shortfall = self.shortfall(needed, task_id)
+        return shortfall == 0
+
+    def touch(self, task_id):
+        """Mark an output as just downloaded"""
+        self.accesses.update(task_id, {"last_access_at": time.time()})
+
+    def close(self):
+        self.accesses.close()
+
+# Global instance
+output_store = OutputStore()
@@ -0,0 +1,267 @@
+import os, time, zipfile, json
+import atexit
+import logging
+import multiprocessing.util
+from PIL import UnidentifiedImageError
+from importlib.util import find_spec
+from app.services.converter_registry import ConverterRegistry
+from app.services.temp_manager import save_temp
+from app.services.job_queue import complete_job, fail_job, record_progress, defer_job
+from app.services.output_store import output_store
+from app.services.storage import storage
+from app.services.uploads import hash_file
+from app.services.precompress import write_variants, store_variants
+from app.services import result_cache
+from app.services.metrics import metrics
+from app.services.image_encoding import resolve_options
+from app.core.firebase import update_job, firebase_enabled
+from app.core.config import OUTPUT_DEFER_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Converters are registered by "module:function" and imported on first use, so the API
+# starts without loading pandas, pdf2docx, python-pptx, moviepy or pydub.
+# Audio/video stay optional: probe for their libraries without importing them.
+def _module_exists(name):
+    """Whether a module is installed, checked without importing it or its parent package"""
+    package, _, submodule = name.partition(".")
+    spec = find_spec(package)
+    if spec is None or not submodule:
+        return spec is not None
+    relative = os.path.join(*submodule.split("."))
+    return any(
+        os.path.exists(os.path.join(location, relative + ".py")) or os.path.isdir(os.path.join(location, relative))
+        for location in spec.submodule_search_locations or []
+    )
+
+AUDIO_AVAILABLE = _module_exists("pydub")
+VIDEO_AVAILABLE = _module_exists("moviepy.editor")  # moviepy 2.x dropped the editor module the converter uses
+if not AUDIO_AVAILABLE:
+    logger.info("audio conversion not available - missing dependencies")
+if not VIDEO_AVAILABLE:
+    logger.info("video conversion not available - missing dependencies")
+
+IMAGE_INPUTS = ["png", "jpg", "jpeg", "webp", "bmp", "tiff", "gif"]
+IMAGE_OUTPUTS = ["png", "jpg", "jpeg", "webp", "bmp", "tiff"]
+AUDIO_INPUTS = ["mp3", "wav", "ogg", "flac", "aac", "m4a", "wma"]
+AUDIO_OUTPUTS = ["mp3", "wav", "ogg", "flac", "aac", "m4a"]
+VIDEO_INPUTS = ["mp4", "avi", "mov", "webm", "mkv", "flv"]
+VIDEO_OUTPUTS = ["mp4", "avi", "mov", "webm", "gif"]
+SPREADSHEET_FORMATS = ["csv", "xlsx", "xls"]
+RESIZE_FITS = ("contain", "cover", "fill")
+MAX_RESIZE_EDGE = 16384  # pixels; also the largest thumbnail
+
+def build_registry():
+    """Every supported (source, target) pair. Costs are rough seconds-per-MB estimates until measured."""
+    registry = ConverterRegistry()
+    registry.register(IMAGE_INPUTS, IMAGE_OUTPUTS, "app.services.image_converter:convert_image", "images",
+                      cost=0.2, in_memory=True)
+    registry.register(["pdf"], ["docx"], "app.services.document_converter:pdf_to_docx", "documents",
+                      cost=5.0, pass_format=False)
+    registry.register(["txt"], ["docx"], "app.services.document_converter:txt_to_docx", "documents",
+                      cost=0.5, pass_format=False)
+    registry.register(["txt"], ["pptx"], "app.services.document_converter:txt_to_pptx", "documents",
+                      cost=0.5, pass_format=False)
+    registry.register(["docx"], ["txt"], "app.services.document_converter:docx_to_txt", "documents",
+                      cost=0.5, pass_format=False)
+    registry.register(["docx"], ["pptx"], "app.services.document_converter:docx_to_pptx", "documents",
+                      cost=1.0, pass_format=False)
+    registry.register(AUDIO_INPUTS, AUDIO_OUTPUTS, "app.services.audio_converter:convert_audio", "audio",
+                      cost=3.0, available=AUDIO_AVAILABLE)
+    registry.register(SPREADSHEET_FORMATS, SPREADSHEET_FORMATS + ["json", "html"],
+                      "app.services.spreadsheet_converter:convert_spreadsheet", "spreadsheets", cost=1.0, in_memory=True)
+    registry.register(["pptx"], ["txt", "json"], "app.services.presentation_converter:convert_presentation",
+                      "presentations", cost=0.5)
+    registry.register(VIDEO_INPUTS, VIDEO_OUTPUTS, "app.services.video_converter:convert_video", "video",
+                      cost=20.0, available=VIDEO_AVAILABLE)
+    registry.register(VIDEO_INPUTS, ["mp3", "wav"], "app.services.video_converter:extract_audio_from_video", "video",
+                      cost=5.0, pass_format=False, available=VIDEO_AVAILABLE)
+    try:
+        registry.load_costs()
+    except Exception as e:
+        logger.warning("could not load recorded converter costs", extra={"error": str(e)})
+    return registry
+
+# Built once per process; the API uses it to validate requests, workers to plan routes
+registry = build_registry()
+atexit.register(registry.cost_writer.close)
+multiprocessing.util.Finalize(None, registry.cost_writer.close, exitpriority=10)
+
+# What conversion workers import before their first job (see ConversionExecutor preload)
+PRELOAD_MODULES = ["app.services.pipeline"] + registry.modules() + (["firebase_admin.db"] if firebase_enabled else [])
+
+def preload_converters():
+    """Pool initializer: import every converter (and the Firebase client) so no job pays the import cost"""
+    registry.preload()
+    if firebase_enabled:
+        import firebase_admin.db
+
+def file_extension(filename):
+    return filename.lower().split('.')[-1] if '.' in filename else ''
+
+def resize_options(width=None, height=None, fit=None, thumbnail=None):
+    """Converter options for resizing an image job, or None to keep its size. Raises ValueError when invalid.
+
+    Normalized so that requests producing the same output share a result cache entry.
+    """
+    for name, value in (("width", width), ("height", height), ("thumbnail", thumbnail)):
+        if value is not None and not 1 <= value <= MAX_RESIZE_EDGE:
+            raise ValueError(f"{name} must be between 1 and {MAX_RESIZE_EDGE}")
+    if fit is not None and fit not in RESIZE_FITS:
+        raise ValueError(f"fit must be one of {', '.join(RESIZE_FITS)}")
+    if thumbnail is not None:
+        if width is not None or height is not None or fit is not None:
+            raise ValueError("thumbnail can't be combined with width, height or fit")
+        return {"thumbnail": thumbnail}
+    if width is None and height is None:
+        if fit is not None:
+            raise ValueError("fit needs width and height")
+        return None
+    if width is not None and height is not None:
+        return {"width": width, "height": height, "fit": fit or "contain"}
+    # With one side given the other follows the aspect ratio, so fit changes nothing
+    return {"width": width} if height is None else {"height": height}
+
+def plan_conversion(filename, target_format, options=None):
+    """Route of converters for this upload. Raises ValueError when there is none."""
+    source = file_extension(filename)
+    target = target_format.lower()
+    route = registry.plan_route(source, target)
+    if route is None:
+        reason = registry.unavailable_reason(source, target)
+        raise ValueError(reason or f"Unsupported conversion: {source} -> {target}")
+    if options and any(converter.category != "images" for converter in route):
+        raise ValueError("Resize and encoder options are only supported for image conversions")
+    return route
+
+def job_options(route, target_format, options=None):
+    """options as a job on route carries them, so they can key the result cache.
+
+    Routes made only of image converters get their encoder settings resolved (see
+    image_encoding.resolve_options); any other route, e.g. mp4 -> gif -> png, takes none.
+    """
+    if all(converter.category == "images" for converter in route):
+        return resolve_options(options, target_format)
+    return options
+
+def convert(input_path, output_path, filename, target_format, on_progress=None, options=None):
+    """Run the cheapest converter route from filename's extension to target_format. Raises on failure.
+
+    on_progress(fraction) is called after every hop of a multi-hop route. options
+    (see resize_options and image_encoding.encoder_options) go to the first hop, so
+    later hops work on the smaller image; image routes are always a single hop.
+    """
+    # Ensure output directory exists
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    
+    route = plan_conversion(filename, target_format, options)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("conversion started", extra={
+            "upload_filename": filename, "input_path": input_path, "output_path": output_path,
+            "route": "->".join([route[0].source] + [hop.target for hop in route])
+        })
+    
+    current_path = input_path
+    intermediates = []
+    try:
+        for i, converter in enumerate(route):
+            if i == len(route) - 1:
+                hop_output = output_path
+            else:
+                # Intermediate files carry their real extension; some converters detect the format from it
+                hop_output = f"{os.path.splitext(output_path)[0]}.hop{i}.{converter.target}"
+                intermediates.append(hop_output)
+            
+            input_bytes = os.path.getsize(current_path)
+            started = time.time()
+            with metrics.time("nodeblack_stage_duration_seconds", stage="convert", source=converter.source,
+                              target=converter.target, converter=converter.name):
+                converter.run(current_path, hop_output, options if i == 0 else None)
+            registry.record_cost(converter, time.time() - started, input_bytes)
+            current_path = hop_output
+            if on_progress and i < len(route) - 1:
+                on_progress((i + 1) / len(route))
+    finally:
+        for path in intermediates:
+            _remove(path)
+    
+    # Check if output file was created
+    if not os.path.exists(output_path):
+        raise FileNotFoundError(f"Conversion failed - output file not created: {output_path}")
+
+# Unsupported conversions and unreadable inputs fail the same way every time, so they are not retried
+PERMANENT_ERRORS = (ValueError, UnidentifiedImageError, zipfile.BadZipFile)
+
+def run_job(job, worker_id):
+    """Convert one claimed job from the queue. Runs inside a conversion worker process.
+
+    input_path and output_path are storage keys; converters get local copies of them.
+    """
+    task_id = job["task_id"]
+    input_path = storage.resolve(job["input_path"])
+    output_path = job["output_path"]
+    labels = {"source": file_extension(job["filename"]), "target": job["target_format"].lower()}
+    
+    # From when the job became runnable (queued, or due for a retry) until a worker claimed it
+    metrics.observe("nodeblack_stage_duration_seconds", max(0.0, job["started_at"] - job["available_at"]),
+                    stage="queue", converter="", **labels)
+    
+    # Wait in the queue, without using up an attempt, until the output fits under the quota
+    if not output_store.reserve(job["estimated_bytes"] or 0, task_id):
+        if defer_job(task_id, worker_id, OUTPUT_DEFER_SECONDS, "Waiting for output storage space"):
+            metrics.inc("nodeblack_jobs_total", outcome="deferred", **labels)
+            logger.info("conversion deferred until output space frees up",
+                        extra={"task_id": task_id, "estimated_bytes": job["estimated_bytes"]})
+        return
+    update_job(task_id, {"status": "processing", "attempt": job["attempts"]})
+    
+    try:
+        # The output is stored when the block ends, so it goes into the result cache from its local copy
+        with storage.local_copy(input_path) as local_input, storage.writable_path(output_path) as local_output:
+            convert(local_input, local_output, job["filename"], job["target_format"],
+                    on_progress=lambda fraction: record_progress(task_id, fraction),
+                    options=json.loads(job["options"]) if job["options"] else None)
+            # Hashed once here so every download can send a strong ETag without reading the file
+            output_hash = hash_file(local_output)
+            variants = write_variants(local_output)
+            # Cached before the variants are stored, which may move them off local disk
+            try:
+                result_cache.store(job["cache_key"], local_output, variants)
+            except Exception as e:
+                logger.warning("result cache store failed", extra={"task_id": task_id, "error": str(e)})
+            encodings = store_variants(output_path, variants)
+    except Exception as e:
+        status = fail_job(task_id, worker_id, e, retry=not isinstance(e, PERMANENT_ERRORS))
+        logger.warning("conversion failed", extra={"task_id": task_id, "attempt": job["attempts"],
+                                                   "next_status": status, "error": str(e)})
+        if status:
+            metrics.inc("nodeblack_jobs_total", outcome="retried" if status == "queued" else "failed", **labels)
+        if status == "queued":
+            update_job(task_id, {"status": "queued", "error": str(e)})
+        elif status == "failed":
+            update_job(task_id, {
+                "status": "failed",
+                "error": str(e)
+            })
+            # Clean up input file once no retries are left
+            storage.delete(input_path)
+        return
+    
+    with metrics.time("nodeblack_stage_duration_seconds", stage="save_temp", converter="", **labels):
+        save_temp(task_id, output_path, content_hash=output_hash, encodings=encodings)
+    complete_job(task_id, worker_id)
+    metrics.inc("nodeblack_jobs_total", outcome="completed", **labels)
+    logger.info("conversion completed", extra={"task_id": task_id, "output_path": output_path})
+    update_job(task_id, {
+        "status": "completed",
+        "download_url": f"/api/download/{task_id}"
+    })
+    
+    # Clean up input file
+    storage.delete(input_path)
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except:
+        pass
\ No newline at end of file
@@ -0,0 +1,143 @@
+import gzip
+import logging
+import os
+import shutil
+from app.core.config import PRECOMPRESS_ENABLED, PRECOMPRESS_MIN_BYTES
+from app.services.storage import storage
+
+logger = logging.getLogger(__name__)
+
+# Text outputs shrink 5-20x; everything else the converters write is already compressed
+COMPRESSIBLE_FORMATS = {"txt", "csv", "json", "html"}
+# Content-Encoding -> file suffix, in the order they are preferred when a client accepts several
+SUFFIXES = {"br": ".br", "zstd": ".zst", "gzip": ".gz"}
+# Variants that don't save at least this fraction are not worth a second file
+MIN_SAVING = 0.1
+
+# Compressors copy a source file object into a destination one in chunks, so memory stays
+# bounded by the chunk size (and the compressor's window) whatever the size of the output
+READ_SIZE = 1024 * 1024
+
+def _chunks(src):
+    return iter(lambda: src.read(READ_SIZE), b"")
+
+def _gzip(src, dest):
+    # mtime=0 keeps the bytes (and so the ETag) the same for the same input
+    with gzip.GzipFile(fileobj=dest, mode="wb", compresslevel=9, mtime=0) as out:
+        shutil.copyfileobj(src, out, READ_SIZE)
+
+def _brotli(src, dest):
+    import brotli
+    compressor = brotli.Compressor(quality=11)
+    for chunk in _chunks(src):
+        dest.write(compressor.process(chunk))
+    dest.write(compressor.finish())
+
+def _zstd(src, dest):
+    import zstandard
+    zstandard.ZstdCompressor(level=19).copy_stream(src, dest, read_size=READ_SIZE)
+
+def _available(module):
+    try:
+        __import__(module)
+        return True
+    except ImportError:
+        return False
+
+# brotli and zstd need the optional `brotli` / `zstandard` packages; gzip is always there
+COMPRESSORS = {"gzip": _gzip}
+if _available("brotli"):
+    COMPRESSORS["br"] = _brotli
+if _available("zstandard"):
+    COMPRESSORS["zstd"] = _zstd
+
+def is_compressible(key):
+    return os.path.splitext(key)[1].lstrip(".").lower() in COMPRESSIBLE_FORMATS
+
+def variant_key(key, encoding):
+    return key + SUFFIXES[encoding]
+
+def write_variants(path):
+    """Write compressed copies of the local file at path next to it. Returns {encoding: variant path}.
+
+    Runs once per output, at conversion time, with the slowest and strongest settings:
+    downloads then serve the stored bytes without spending any CPU on compression.
+    The result cache keeps the variants with the output, so cache hits don't redo this.
+    """
+    if not PRECOMPRESS_ENABLED or not is_compressible(path):
+        return {}
+    size = os.path.getsize(path)
+    if size < PRECOMPRESS_MIN_BYTES:
+        return {}
+    variants = {}
+    for encoding, compress in COMPRESSORS.items():
+        variant_path = path + SUFFIXES[encoding]
+        try:
+            with open(path, "rb") as src, open(variant_path, "wb") as dest:
+                compress(src, dest)
+        except Exception as e:
+            logger.warning("precompression failed", extra={"encoding": encoding, "error": str(e)})
+            _remove(variant_path)
+            continue
+        if os.path.getsize(variant_path) > size * (1 - MIN_SAVING):
+            _remove(variant_path)
+            continue
+        variants[encoding] = variant_path
+    return variants
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+def store_variants(key, variants):
+    """Store the variants write_variants made for the object at key. Returns the stored encodings."""
+    for encoding, path in variants.items():
+        storage.put(variant_key(key, encoding), path)
+    return sorted(variants, key=list(SUFFIXES).index)
+
+def delete_output(key):
+    """Delete a stored output and its compressed variants. Returns the bytes freed, or None when it was gone.
+
+    Files still hard-linked from elsewhere (the result cache shares its files with tasks)
+    stay on disk, so deleting them frees nothing.
+    """
+    keys = [key] + ([variant_key(key, encoding) for encoding in SUFFIXES] if is_compressible(key) else [])
+    freed = None
+    for object_key in keys:
+        shared = _linked_elsewhere(object_key)
+        size = storage.delete(object_key)
+        if size is not None:
+            freed = (freed or 0) + (0 if shared else size)
+    return freed
+
+def _linked_elsewhere(key):
+    path = storage.local_path(key)
+    try:
+        return path is not None and os.stat(path).st_nlink > 1
+    except OSError:
+        return False
+
+def negotiate(accept_encoding, encodings):
+    """The best of the stored encodings the Accept-Encoding header allows, or None for the plain file"""
+    if not accept_encoding or not encodings:
+        return None
+    accepted = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[name.strip().lower()] = q
+    wildcard = accepted.get("*", 0.0)
+    candidates = [encoding for encoding in encodings if accepted.get(encoding, wildcard) > 0]
+    if not candidates:
+        return None
+    # Highest q wins; ties go to the better compression (the order of SUFFIXES)
+    return max(candidates, key=lambda encoding: (accepted.get(encoding, wildcard), -list(SUFFIXES).index(encoding)))
@@ -0,0 +1,161 @@
+import time, os, json, hashlib, shutil, threading
+from app.core.config import RESULT_CACHE_ENABLED, RESULT_CACHE_MAX_BYTES
+from app.services.temp_manager import pool
+from app.services.storage import storage
+from app.services.precompress import SUFFIXES, variant_key, delete_output
+
+# Hit/miss counters for this process (lookups happen in the API process)
+_stats = {"hits": 0, "misses": 0}
+_stats_lock = threading.Lock()
+
+def _count(name):
+    with _stats_lock:
+        _stats[name] += 1
+
+def init_cache():
+    with pool.connection() as conn:
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS conversion_cache (
+                cache_key TEXT PRIMARY KEY,
+                file_path TEXT NOT NULL,
+                size_bytes INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_used_at REAL NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(conversion_cache)")}
+        if "encodings" not in columns:
+            conn.execute("ALTER TABLE conversion_cache ADD COLUMN encodings TEXT")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_conversion_cache_last_used ON conversion_cache (last_used_at)")
+
+def make_cache_key(content_hash, target_format, options=None):
+    """Key a conversion result on what determines its bytes: input content, target format and options.
+
+    Options should be resolved first (pipeline.job_options) so an image profile is part of the key.
+    """
+    payload = json.dumps([content_hash, target_format.lower(), options or {}], sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def _cache_object_key(cache_key, ext):
+    # Sharded like outputs; older rows hold full local paths, which LocalStorage still accepts
+    return f"cache/{cache_key[:2]}/{cache_key[2:4]}/{cache_key}{ext}"
+
+def _link_or_copy(src, dest):
+    # Hard links let the cache and every task share one copy on disk;
+    # each side can still delete its own name independently
+    os.makedirs(os.path.dirname(dest) or ".", exist_ok=True)
+    try:
+        os.link(src, dest)
+    except OSError:
+        shutil.copyfile(src, dest)
+
+def _materialize(key, dest_path):
+    local_path = storage.local_path(key)
+    if local_path is not None:
+        _link_or_copy(local_path, dest_path)
+    else:
+        storage.fetch(key, dest_path)
+
+def lookup(cache_key, dest_path):
+    """Materialize a cached result at dest_path, and its precompressed variants next to it.
+
+    Returns {encoding: variant path} (see precompress.write_variants) on a hit, None on a miss.
+    """
+    if not RESULT_CACHE_ENABLED or not cache_key:
+        return None
+
+    variants = None
+    with pool.connection() as conn:
+        row = conn.execute("SELECT file_path, encodings FROM conversion_cache WHERE cache_key=?",
+                           (cache_key,)).fetchone()
+        if row:
+            file_path, encodings = row
+            created = []
+            try:
+                _materialize(file_path, dest_path)
+                created.append(dest_path)
+                variants = {}
+                for encoding in encodings.split(",") if encodings else []:
+                    path = dest_path + SUFFIXES[encoding]
+                    _materialize(variant_key(file_path, encoding), path)
+                    created.append(path)
+                    variants[encoding] = path
+                conn.execute("UPDATE conversion_cache SET last_used_at=?, hits=hits+1 WHERE cache_key=?",
+                             (time.time(), cache_key))
+            except OSError:
+                # Cached object was removed behind our back; forget the entry
+                variants = None
+                for path in created:
+                    os.remove(path)
+                delete_output(file_path)
+                conn.execute("DELETE FROM conversion_cache WHERE cache_key=?", (cache_key,))
+
+    _count("misses" if variants is None else "hits")
+    return variants
+
+def store(cache_key, output_path, variants=None):
+    """Add a finished conversion and its precompressed variants ({encoding: local path}) to the cache,
+    then evict least recently used entries over the size limit"""
+    if not RESULT_CACHE_ENABLED or not cache_key:
+        return
+    variants = variants or {}
+    size = os.path.getsize(output_path) + sum(os.path.getsize(path) for path in variants.values())
+    if size > RESULT_CACHE_MAX_BYTES:
+        return
+
+    key = _cache_object_key(cache_key, os.path.splitext(output_path)[1])
+    objects = [(key, output_path)] + [(variant_key(key, encoding), path) for encoding, path in variants.items()]
+    for object_key, path in objects:
+        if not storage.exists(object_key):
+            # With local storage the staging path is the object itself, so this is a hard link and put is a no-op
+            staged = storage.staging_path(object_key)
+            _link_or_copy(path, staged)
+            storage.put(object_key, staged)
+
+    now = time.time()
+    encodings = ",".join(encoding for encoding in SUFFIXES if encoding in variants) or None
+    with pool.connection() as conn:
+        conn.execute("""
+            INSERT OR REPLACE INTO conversion_cache (cache_key, file_path, size_bytes, created_at, last_used_at, hits,
+                                                     encodings)
+            VALUES (?, ?, ?, ?, ?, 0, ?)
+        """, (cache_key, key, size, now, now, encodings))
+    with pool.connection() as conn:
+        _evict(conn)
+
+def _evict(conn):
+    total = conn.execute("SELECT COALESCE(SUM(size_bytes), 0) FROM conversion_cache").fetchone()[0]
+    if total <= RESULT_CACHE_MAX_BYTES:
+        return
+
+    rows = conn.execute("SELECT cache_key, file_path, size_bytes FROM conversion_cache ORDER BY last_used_at")
+    evicted = []
+    for cache_key, file_path, size in rows.fetchall():
+        if total <= RESULT_CACHE_MAX_BYTES:
+            break
+        delete_output(file_path)
+        evicted.append((cache_key,))
+        total -= size
+    conn.executemany("DELETE FROM conversion_cache WHERE cache_key=?", evicted)
+
+def size_bytes():
+    """Bytes held by cached results"""
+    with pool.connection() as conn:
+        return conn.execute("SELECT COALESCE(SUM(size_bytes), 0) FROM conversion_cache").fetchone()[0]
+
+def cache_stats():
+    with pool.connection() as conn:
+        entries, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM conversion_cache").fetchone()
+
+    with _stats_lock:
+        stats = dict(_stats)
+    lookups = stats["hits"] + stats["misses"]
+    stats.update({
+        "enabled": RESULT_CACHE_ENABLED,
+        "entries": entries,
+        "size_bytes": size,
+        "max_bytes": RESULT_CACHE_MAX_BYTES,
+        "hit_rate": round(stats["hits"] / lookups, 4) if lookups else 0.0
+    })
+    return stats
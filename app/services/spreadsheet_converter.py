@@ -5,10 +5,14 @@ import csv
 import json
 
 def convert_spreadsheet(input_path, output_path, target_format):
-    """Convert between spreadsheet formats (CSV, XLSX, XLS, JSON)"""
+    """Convert between spreadsheet formats (CSV, XLSX, XLS, JSON)
+
+    input_path/output_path may also be binary file objects; the input format is
+    then taken from the object's name attribute.
+    """
     try:
         # Determine input format
-        input_ext = input_path.lower().split('.')[-1]
+        input_ext = str(getattr(input_path, 'name', input_path)).lower().split('.')[-1]
         
         # Read the file based on input format
         if input_ext == 'csv':
@@ -32,7 +36,10 @@ def convert_spreadsheet(input_path, output_path, target_format):
         elif target_format == 'json':
             df.to_json(output_path, orient='records', indent=2)
         elif target_format == 'html':
-            df.to_html(output_path, index=False)
+            if isinstance(output_path, str):
+                df.to_html(output_path, index=False)
+            else:
+                output_path.write(df.to_html(index=False).encode('utf-8'))
         else:
             raise ValueError(f"Unsupported target format: {target_format}")
             
@@ -0,0 +1,381 @@
+import abc
+import io
+import os
+import posixpath
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from app.core.config import (STORAGE_BACKEND, STORAGE_ROOT, S3_BUCKET, S3_PREFIX, S3_ENDPOINT_URL, S3_REGION)
+
+# Where non-local backends stage files that converters read and write
+SCRATCH_DIR = os.path.join(tempfile.gettempdir(), "nodeblack")
+AREAS = ("input", "output")
+
+# Objects are sharded two levels deep by task id, {id[:2]}/{id[2:4]}: task ids are uuid4s, so
+# each of the 65536 directories stays small however many files there are.
+# Objects stored before sharding sit directly in their area ("output/{task_id}.{ext}").
+def _shard(task_id):
+    return f"{task_id[:2]}/{task_id[2:4]}"
+
+def input_key(task_id, filename):
+    return f"input/{_shard(task_id)}/{task_id}_{filename}"
+
+def output_key(task_id, target_format):
+    return f"output/{_shard(task_id)}/{task_id}.{target_format}"
+
+def task_id_of(key):
+    """Task id an input or output key belongs to (inputs are {task_id}_{filename}, outputs {task_id}.{ext})"""
+    filename = posixpath.basename(key)
+    return filename.split("_", 1)[0] if _area(key) == "input" else filename.split(".", 1)[0]
+
+def _area(key):
+    # Also finds the area in full local paths stored by older versions ("app/storage/output/...")
+    parts = key.replace(os.sep, "/").split("/")
+    return next((part for part in parts if part in AREAS), parts[0])
+
+def flat_key(key):
+    return f"{_area(key)}/{posixpath.basename(key)}"
+
+def sharded_key(key):
+    return f"{_area(key)}/{_shard(task_id_of(key))}/{posixpath.basename(key)}"
+
+class Storage(abc.ABC):
+    """Where uploads and converted outputs live, addressed by key ("input/...", "output/...").
+
+    Converters only work on local files, so callers go through staging_path/put to
+    store a file and local_copy to read one; the local backend hands out the real
+    paths and never copies anything.
+    """
+
+    # Objects only visible to the process that stored them, so not usable with conversion worker processes
+    process_local = False
+
+    @abc.abstractmethod
+    def put(self, key, path):
+        """Store the local file at path under key. The file at path is gone afterwards."""
+
+    @abc.abstractmethod
+    def fetch(self, key, path):
+        """Copy the object at key to the local file path"""
+
+    @abc.abstractmethod
+    def open(self, key, start=0, length=None):
+        """Binary file-like object (read/close) for the object at key, or length bytes of it from start"""
+
+    @abc.abstractmethod
+    def stat(self, key):
+        """(size, mtime) of the object at key. Raises FileNotFoundError when there is none."""
+
+    @abc.abstractmethod
+    def delete(self, key):
+        """Remove the object at key, returning its size, or None when it was already gone"""
+
+    @abc.abstractmethod
+    def list(self, prefix):
+        """(key, size, mtime) of every object under prefix"""
+
+    def local_path(self, key):
+        """Path of the object on the local filesystem, or None when it isn't stored locally"""
+        return None
+
+    def free_bytes(self):
+        """Free space left for new objects, or None when the backend has no fixed limit"""
+        return None
+
+    @abc.abstractmethod
+    def move(self, key, new_key):
+        """Store the object at key under new_key instead"""
+
+    def exists(self, key):
+        try:
+            self.stat(key)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def locate(self, key):
+        """(key the object is actually stored under, its size). Raises FileNotFoundError when there is none.
+
+        Stored keys stay valid when `python -m app.migrate_storage` moves flat objects
+        into shards: a key whose object has moved (either way) is found where it is now.
+        Objects that never moved cost a single stat (HEAD for S3), which also gives their size.
+        """
+        for candidate in dict.fromkeys((key, sharded_key(key), flat_key(key))):
+            try:
+                return candidate, self.stat(candidate)[0]
+            except FileNotFoundError:
+                continue
+        raise FileNotFoundError(key)
+
+    def resolve(self, key):
+        """The key the object is actually stored under (see locate), or key itself when there is none"""
+        try:
+            return self.locate(key)[0]
+        except FileNotFoundError:
+            return key
+
+    def staging_path(self, key):
+        """Local path to write a new object to before put(key, path)"""
+        os.makedirs(SCRATCH_DIR, exist_ok=True)
+        # Same extension as the key: some converters detect the format from it
+        return os.path.join(SCRATCH_DIR, f"{uuid.uuid4().hex}_{os.path.basename(key)}")
+
+    @contextmanager
+    def writable_path(self, key):
+        """Local path to write the object at key to; whatever is there when the block ends is stored.
+
+        When the block raises nothing is stored, and a partly written file is removed.
+        """
+        path = self.staging_path(key)
+        stored = False
+        try:
+            yield path
+            if os.path.exists(path):
+                self.put(key, path)
+            stored = True
+        finally:
+            # On local storage the path is the object itself, so it is only kept once stored
+            if (not stored or path != self.local_path(key)) and os.path.exists(path):
+                os.remove(path)
+
+    @contextmanager
+    def local_copy(self, key):
+        """Local path to read the object at key from, for the duration of the block"""
+        path = self.local_path(key)
+        if path is not None:
+            yield path
+            return
+        path = self.staging_path(key)
+        try:
+            self.fetch(key, path)
+            yield path
+        finally:
+            if os.path.exists(path):
+                os.remove(path)
+
+class LocalStorage(Storage):
+    """Objects are files under root. Keys stored before this backend existed are full paths and still work."""
+
+    def __init__(self, root=STORAGE_ROOT):
+        self.root = root
+
+    def _path(self, key):
+        if os.path.isabs(key) or key.startswith(self.root.rstrip("/") + "/"):
+            return key
+        return os.path.join(self.root, key)
+
+    def local_path(self, key):
+        return self._path(key)
+
+    def staging_path(self, key):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        return path
+
+    def put(self, key, path):
+        dest = self._path(key)
+        if os.path.abspath(path) != os.path.abspath(dest):
+            os.makedirs(os.path.dirname(dest) or ".", exist_ok=True)
+            shutil.move(path, dest)
+
+    def fetch(self, key, path):
+        shutil.copyfile(self._path(key), path)
+
+    def move(self, key, new_key):
+        dest = self._path(new_key)
+        os.makedirs(os.path.dirname(dest) or ".", exist_ok=True)
+        os.replace(self._path(key), dest)
+
+    def open(self, key, start=0, length=None):
+        f = open(self._path(key), "rb")
+        f.seek(start)
+        return f
+
+    def stat(self, key):
+        st = os.stat(self._path(key))
+        return st.st_size, st.st_mtime
+
+    def delete(self, key):
+        path = self._path(key)
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+            return size
+        except OSError:
+            return None
+
+    def list(self, prefix):
+        top = self._path(prefix)
+        for dirpath, _, filenames in os.walk(top):
+            for filename in filenames:
+                if filename.startswith("."):
+                    continue
+                path = os.path.join(dirpath, filename)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue  # removed while we were walking
+                yield os.path.relpath(path, self.root).replace(os.sep, "/"), st.st_size, st.st_mtime
+
+    def free_bytes(self):
+        return shutil.disk_usage(self.root if os.path.isdir(self.root) else ".").free
+
+class MemoryStorage(Storage):
+    """Objects held in this process's memory; for tests and tools that convert in a single process"""
+
+    process_local = True
+
+    def __init__(self):
+        self.objects = {}  # key -> (bytes, mtime)
+        self.lock = threading.Lock()
+
+    def _get(self, key):
+        with self.lock:
+            if key not in self.objects:
+                raise FileNotFoundError(key)
+            return self.objects[key]
+
+    def put(self, key, path):
+        with open(path, "rb") as f:
+            data = f.read()
+        with self.lock:
+            self.objects[key] = (data, time.time())
+        os.remove(path)
+
+    def fetch(self, key, path):
+        with open(path, "wb") as f:
+            f.write(self._get(key)[0])
+
+    def move(self, key, new_key):
+        with self.lock:
+            if key not in self.objects:
+                raise FileNotFoundError(key)
+            self.objects[new_key] = self.objects.pop(key)
+
+    def open(self, key, start=0, length=None):
+        data = self._get(key)[0]
+        return io.BytesIO(data[start:None if length is None else start + length])
+
+    def stat(self, key):
+        data, mtime = self._get(key)
+        return len(data), mtime
+
+    def delete(self, key):
+        with self.lock:
+            entry = self.objects.pop(key, None)
+        return None if entry is None else len(entry[0])
+
+    def list(self, prefix):
+        with self.lock:
+            items = [(key, len(data), mtime) for key, (data, mtime) in self.objects.items() if key.startswith(prefix)]
+        return iter(items)
+
+class S3Storage(Storage):
+    """Objects in an S3-compatible bucket (AWS S3, MinIO, ...), so API nodes and workers can share them.
+
+    Needs boto3. Credentials come from the usual AWS environment variables or config files.
+    Each process creates its own client: clients are not safe to share across fork.
+    """
+
+    def __init__(self, bucket=S3_BUCKET, prefix=S3_PREFIX, endpoint_url=S3_ENDPOINT_URL, region=S3_REGION):
+        if not bucket:
+            raise RuntimeError("STORAGE_BACKEND=s3 needs S3_BUCKET")
+        self.bucket = bucket
+        self.prefix = prefix
+        self.endpoint_url = endpoint_url
+        self.region = region
+        self._client = None
+        self.pid = None
+        self.lock = threading.Lock()
+
+    @property
+    def client(self):
+        with self.lock:
+            if self._client is None or self.pid != os.getpid():
+                try:
+                    import boto3
+                except ImportError:
+                    raise RuntimeError("STORAGE_BACKEND=s3 needs boto3 (pip install boto3)")
+                self._client = boto3.client("s3", endpoint_url=self.endpoint_url, region_name=self.region)
+                self.pid = os.getpid()
+            return self._client
+
+    def _key(self, key):
+        return self.prefix + key
+
+    def _missing(self, error):
+        return error.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound")
+
+    def put(self, key, path):
+        self.client.upload_file(path, self.bucket, self._key(key))
+        os.remove(path)
+
+    def fetch(self, key, path):
+        from botocore.exceptions import ClientError
+        try:
+            self.client.download_file(self.bucket, self._key(key), path)
+        except ClientError as e:
+            if self._missing(e):
+                raise FileNotFoundError(key)
+            raise
+
+    def move(self, key, new_key):
+        from botocore.exceptions import ClientError
+        try:
+            self.client.copy_object(Bucket=self.bucket, Key=self._key(new_key),
+                                    CopySource={"Bucket": self.bucket, "Key": self._key(key)})
+        except ClientError as e:
+            if self._missing(e):
+                raise FileNotFoundError(key)
+            raise
+        self.client.delete_object(Bucket=self.bucket, Key=self._key(key))
+
+    def open(self, key, start=0, length=None):
+        from botocore.exceptions import ClientError
+        extra = {}
+        if start or length is not None:
+            extra["Range"] = f"bytes={start}-{'' if length is None else start + length - 1}"
+        try:
+            return self.client.get_object(Bucket=self.bucket, Key=self._key(key), **extra)["Body"]
+        except ClientError as e:
+            if self._missing(e):
+                raise FileNotFoundError(key)
+            raise
+
+    def stat(self, key):
+        from botocore.exceptions import ClientError
+        try:
+            head = self.client.head_object(Bucket=self.bucket, Key=self._key(key))
+        except ClientError as e:
+            if self._missing(e):
+                raise FileNotFoundError(key)
+            raise
+        return head["ContentLength"], head["LastModified"].timestamp()
+
+    def delete(self, key):
+        try:
+            size = self.stat(key)[0]
+        except FileNotFoundError:
+            return None
+        self.client.delete_object(Bucket=self.bucket, Key=self._key(key))
+        return size
+
+    def list(self, prefix):
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self._key(prefix)):
+            for item in page.get("Contents", []):
+                yield item["Key"][len(self.prefix):], item["Size"], item["LastModified"].timestamp()
+
+BACKENDS = {"local": LocalStorage, "memory": MemoryStorage, "s3": S3Storage}
+
+def create_storage(backend=STORAGE_BACKEND):
+    try:
+        return BACKENDS[backend]()
+    except KeyError:
+        raise RuntimeError(f"Unknown STORAGE_BACKEND {backend!r}, expected one of {', '.join(BACKENDS)}")
+
+# Global instance
+storage = create_storage()
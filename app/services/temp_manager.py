@@ -1,34 +1,273 @@
-import sqlite3, time, os
-from app.core.config import TEMP_EXPIRY_SECONDS
+import sqlite3, time, os, threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from app.core.config import TEMP_EXPIRY_SECONDS, DB_POOL_SIZE, TEMP_CACHE_ENTRIES, TEMP_CACHE_TTL_SECONDS
+from app.services.storage import storage
+from app.services.precompress import variant_key
 
 DB = "temp.db"
 
+# Fixed SQL text, so every pooled connection prepares each statement once and reuses it
+# The API key comes from the job row unless the caller knows it (cache hits are saved before their job row).
+# An upsert rather than INSERT OR REPLACE, whose implicit delete would bypass the storage_usage triggers.
+_INSERT_TEMP = """
+    INSERT INTO temp_downloads (task_id, file_path, expires_at, content_hash, encodings, api_key_id, size_bytes,
+                                last_access_at)
+    VALUES (?, ?, ?, ?, ?, COALESCE(?, (SELECT api_key_id FROM jobs WHERE task_id=?)), ?, ?)
+    ON CONFLICT (task_id) DO UPDATE SET file_path=excluded.file_path, expires_at=excluded.expires_at,
+        content_hash=excluded.content_hash, encodings=excluded.encodings, api_key_id=excluded.api_key_id,
+        size_bytes=excluded.size_bytes, last_access_at=excluded.last_access_at
+"""
+_SELECT_TEMP = "SELECT file_path, expires_at, content_hash, encodings FROM temp_downloads WHERE task_id=?"
+_SELECT_EXPIRED_TEMP = "SELECT task_id, file_path FROM temp_downloads WHERE expires_at < ? ORDER BY expires_at LIMIT ?"
+_DELETE_TEMP = "DELETE FROM temp_downloads WHERE task_id=?"
+_SELECT_LEAST_RECENT_TEMP = "SELECT task_id, file_path, size_bytes FROM temp_downloads ORDER BY last_access_at LIMIT ?"
+_TOUCH_TEMP = "UPDATE temp_downloads SET last_access_at=? WHERE task_id=? AND last_access_at < ?"
+_SELECT_OUTPUT_USAGE = "SELECT bytes FROM storage_usage WHERE area='output'"
+_RENAME_TEMP = "UPDATE temp_downloads SET file_path=? WHERE file_path=?"
+
+class ConnectionPool:
+    """Reusable WAL-mode connections to one SQLite database.
+
+    Connections stay open between calls, so their prepared statement caches are
+    reused, and WAL lets the API keep reading while workers write. Each process
+    gets its own connections: ones inherited over fork are never used (or closed).
+    """
+
+    def __init__(self, path, size=DB_POOL_SIZE):
+        self.path = path
+        self.size = size
+        self.idle = []
+        self.inherited = []
+        self.pid = os.getpid()
+        self.lock = threading.Lock()
+
+    def _open(self):
+        conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False, cached_statements=256)
+        conn.execute("PRAGMA journal_mode=WAL")
+        # Safe with WAL: a power loss can drop the last commits but never corrupts the database
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    @contextmanager
+    def connection(self):
+        """A connection for one unit of work, committed on success and rolled back on error"""
+        with self.lock:
+            if self.pid != os.getpid():
+                self.inherited.extend(self.idle)
+                self.idle, self.pid = [], os.getpid()
+            conn = self.idle.pop() if self.idle else None
+        if conn is None:
+            conn = self._open()
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            with self.lock:
+                if len(self.idle) < self.size and self.pid == os.getpid():
+                    self.idle.append(conn)
+                    conn = None
+            if conn is not None:
+                conn.close()
+
+class LRUCache:
+    """Thread-safe least-recently-used map with a fixed number of entries.
+
+    With a ttl, entries are dropped that many seconds after they were stored, so
+    changes made by other processes show up within ttl seconds.
+    """
+
+    def __init__(self, max_entries, ttl=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()  # key -> (value, stored_at)
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            value, stored_at = entry
+            if self.ttl is not None and time.monotonic() - stored_at > self.ttl:
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        if self.max_entries <= 0:
+            return
+        with self.lock:
+            self.entries[key] = (value, time.monotonic())
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+pool = ConnectionPool(DB)
+# task_id -> (file_path, expires_at, content_hash, encodings). Only rows that exist are cached, so a
+# row written by a worker shows up on the next lookup. Rows deleted by another process (the sweeper,
+# output store eviction in a worker) are only invalidated locally there; the ttl bounds how long
+# this process can keep serving them.
+_temp_cache = LRUCache(TEMP_CACHE_ENTRIES, ttl=TEMP_CACHE_TTL_SECONDS)
+
 def init_db():
-    conn = sqlite3.connect(DB)
-    cur = conn.cursor()
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS temp_downloads (
-            task_id TEXT PRIMARY KEY,
-            file_path TEXT,
-            expires_at INTEGER
-        )
-    """)
-    conn.commit()
-    conn.close()
-
-def save_temp(task_id, file_path):
-    conn = sqlite3.connect(DB)
-    cur = conn.cursor()
-    cur.execute("""
-        INSERT INTO temp_downloads VALUES (?, ?, ?)
-    """, (task_id, file_path, int(time.time()) + TEMP_EXPIRY_SECONDS))
-    conn.commit()
-    conn.close()
+    with pool.connection() as conn:
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS temp_downloads (
+                task_id TEXT PRIMARY KEY,
+                file_path TEXT,
+                expires_at INTEGER,
+                api_key_id TEXT,
+                size_bytes INTEGER,
+                last_access_at REAL,
+                content_hash TEXT,
+                encodings TEXT
+            )
+        """)
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(temp_downloads)")}
+        for name, decl in (("api_key_id", "TEXT"), ("size_bytes", "INTEGER"), ("last_access_at", "REAL"),
+                           ("content_hash", "TEXT"), ("encodings", "TEXT")):
+            if name not in columns:
+                conn.execute(f"ALTER TABLE temp_downloads ADD COLUMN {name} {decl}")
+        # Keyset pagination walks (expires_at, task_id), overall or per API key; the sweeper uses the first too
+        conn.execute("DROP INDEX IF EXISTS idx_temp_downloads_expires")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_temp_downloads_expires_task ON temp_downloads (expires_at, task_id)")
+        conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_temp_downloads_key_expires_task
+            ON temp_downloads (api_key_id, expires_at, task_id)
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_temp_downloads_last_access ON temp_downloads (last_access_at)")
+        # Bytes held by download rows, kept current by triggers in the same transaction as every
+        # insert, resize and delete, so any process can read usage without summing the table
+        conn.execute("CREATE TABLE IF NOT EXISTS storage_usage (area TEXT PRIMARY KEY, bytes INTEGER NOT NULL)")
+        conn.execute("""
+            INSERT OR IGNORE INTO storage_usage (area, bytes)
+            VALUES ('output', (SELECT COALESCE(SUM(size_bytes), 0) FROM temp_downloads))
+        """)
+        conn.execute("""
+            CREATE TRIGGER IF NOT EXISTS temp_downloads_usage_insert AFTER INSERT ON temp_downloads BEGIN
+                UPDATE storage_usage SET bytes = bytes + COALESCE(NEW.size_bytes, 0) WHERE area='output';
+            END
+        """)
+        conn.execute("""
+            CREATE TRIGGER IF NOT EXISTS temp_downloads_usage_update AFTER UPDATE OF size_bytes ON temp_downloads BEGIN
+                UPDATE storage_usage SET bytes = bytes + COALESCE(NEW.size_bytes, 0) - COALESCE(OLD.size_bytes, 0)
+                WHERE area='output';
+            END
+        """)
+        conn.execute("""
+            CREATE TRIGGER IF NOT EXISTS temp_downloads_usage_delete AFTER DELETE ON temp_downloads BEGIN
+                UPDATE storage_usage SET bytes = bytes - COALESCE(OLD.size_bytes, 0) WHERE area='output';
+            END
+        """)
+
+def save_temp(task_id, file_path, api_key_id=None, content_hash=None, encodings=()):
+    """Make the stored object at file_path (a storage key) downloadable for TEMP_EXPIRY_SECONDS.
+
+    content_hash (sha256 hex of the file) becomes the download's ETag. encodings lists the
+    precompressed variants stored next to it ("br", "gzip", ...); they count towards its size.
+    """
+    now = time.time()
+    row = (file_path, int(now) + TEMP_EXPIRY_SECONDS, content_hash, ",".join(encodings) or None)
+    size = storage.stat(file_path)[0] + sum(storage.stat(variant_key(file_path, encoding))[0] for encoding in encodings)
+    with pool.connection() as conn:
+        conn.execute(_INSERT_TEMP, (task_id, *row, api_key_id, task_id, size, now))
+    _temp_cache.put(task_id, row)
 
 def get_temp(task_id):
-    conn = sqlite3.connect(DB)
-    cur = conn.cursor()
-    cur.execute("SELECT file_path, expires_at FROM temp_downloads WHERE task_id=?", (task_id,))
-    row = cur.fetchone()
-    conn.close()
-    return row
\ No newline at end of file
+    """(file_path, expires_at, content_hash, encodings) or None. Served from memory after the first lookup."""
+    row = _temp_cache.get(task_id)
+    if row is not None:
+        return row
+    with pool.connection() as conn:
+        row = conn.execute(_SELECT_TEMP, (task_id,)).fetchone()
+    if row is not None:
+        _temp_cache.put(task_id, row)
+    return row
+
+def list_temp(limit, after=None, status=None, api_key_id=None, now=None):
+    """One page of (task_id, file_path, expires_at) rows, latest expiry first.
+
+    after is the (expires_at, task_id) of the last row of the previous page; the
+    query seeks straight to it through an index, so every page costs the same.
+    status is "available" or "expired". Returns (rows, whether more rows follow).
+    """
+    clauses, params = [], []
+    if api_key_id is not None:
+        clauses.append("api_key_id = ?")
+        params.append(api_key_id)
+    if status == "available":
+        clauses.append("expires_at >= ?")
+        params.append(int(time.time() if now is None else now))
+    elif status == "expired":
+        clauses.append("expires_at < ?")
+        params.append(int(time.time() if now is None else now))
+    if after is not None:
+        clauses.append("(expires_at, task_id) < (?, ?)")
+        params.extend(after)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    with pool.connection() as conn:
+        rows = conn.execute(f"""
+            SELECT task_id, file_path, expires_at FROM temp_downloads {where}
+            ORDER BY expires_at DESC, task_id DESC LIMIT ?
+        """, (*params, limit + 1)).fetchall()
+    return rows[:limit], len(rows) > limit
+
+def expired_temp(now, limit):
+    """Up to limit (task_id, file_path) rows that expired before now, oldest first (uses the expires_at index)"""
+    with pool.connection() as conn:
+        return conn.execute(_SELECT_EXPIRED_TEMP, (int(now), limit)).fetchall()
+
+def existing_temp(task_ids):
+    """The subset of task_ids that still have a download row"""
+    task_ids = list(task_ids)
+    found = set()
+    with pool.connection() as conn:
+        # Chunked to stay under SQLite's bound-parameter limit
+        for start in range(0, len(task_ids), 500):
+            chunk = task_ids[start:start + 500]
+            rows = conn.execute(f"SELECT task_id FROM temp_downloads WHERE task_id IN ({','.join('?' * len(chunk))})",
+                                chunk)
+            found.update(row[0] for row in rows)
+    return found
+
+def least_recent_temp(limit):
+    """Up to limit (task_id, file_path, size_bytes) rows, least recently downloaded (or saved) first"""
+    with pool.connection() as conn:
+        return conn.execute(_SELECT_LEAST_RECENT_TEMP, (limit,)).fetchall()
+
+def touch_temp(accessed):
+    """Record downloads: {task_id: {"last_access_at": timestamp}}. A write-behind sink."""
+    with pool.connection() as conn:
+        conn.executemany(_TOUCH_TEMP, [(fields["last_access_at"], task_id, fields["last_access_at"])
+                                       for task_id, fields in accessed.items()])
+
+def output_usage():
+    """Bytes held by all download rows"""
+    with pool.connection() as conn:
+        row = conn.execute(_SELECT_OUTPUT_USAGE).fetchone()
+    return row[0] if row else 0
+
+def rename_temp(renames):
+    """Point download rows at new storage keys: [(old_key, new_key)]"""
+    with pool.connection() as conn:
+        conn.executemany(_RENAME_TEMP, [(new, old) for old, new in renames])
+    _temp_cache.clear()
+
+def delete_temp(task_ids):
+    with pool.connection() as conn:
+        conn.executemany(_DELETE_TEMP, [(task_id,) for task_id in task_ids])
+    for task_id in task_ids:
+        _temp_cache.invalidate(task_id)
@@ -0,0 +1,43 @@
+import os, hashlib
+from app.core.config import MAX_FILE_SIZE, UPLOAD_CHUNK_SIZE
+
+class UploadTooLargeError(Exception):
+    """Raised when an upload exceeds the configured size limit"""
+
+def save_upload(src, dest_path, max_bytes=MAX_FILE_SIZE, chunk_size=UPLOAD_CHUNK_SIZE):
+    """Stream a file object to dest_path in chunks. Returns (size, sha256 hex digest).
+
+    Blocking - call it from a worker thread. The size limit is checked after every
+    chunk, so an oversized upload is abandoned as soon as it crosses the limit.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with open(dest_path, "wb") as buffer:
+            while True:
+                chunk = src.read(chunk_size)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadTooLargeError(f"File exceeds the {max_bytes // (1024 * 1024)}MB upload limit")
+                digest.update(chunk)
+                buffer.write(chunk)
+    except BaseException:
+        try:
+            os.remove(dest_path)
+        except OSError:
+            pass
+        raise
+    return size, digest.hexdigest()
+
+def hash_file(path, chunk_size=UPLOAD_CHUNK_SIZE):
+    """sha256 hex digest of a local file, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
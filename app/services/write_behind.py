@@ -0,0 +1,112 @@
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+class WriteBehindQueue:
+    """Buffers keyed partial updates in memory and writes them to a sink from a background thread.
+
+    update() only merges into a dict, so callers never wait on the remote side. Several
+    updates to the same key between flushes collapse into one, and each flush hands the
+    sink everything pending in a single call. A failed flush keeps its updates and is
+    retried with exponential backoff; after max_retries consecutive failures they are dropped.
+    """
+
+    def __init__(self, sink, flush_interval=0.5, max_retries=5, backoff=1.0, max_backoff=30.0):
+        self.sink = sink  # callable taking {key: {field: value}}
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.thread = None
+        self.pid = None
+        self.failures = 0
+        self.closed = False
+        self.stats = {"updates": 0, "coalesced": 0, "flushes": 0, "failures": 0, "dropped": 0}
+
+    def update(self, key, fields):
+        with self.lock:
+            self.stats["updates"] += 1
+            current = self.pending.get(key)
+            if current is None:
+                self.pending[key] = dict(fields)
+            else:
+                current.update(fields)
+                self.stats["coalesced"] += 1
+            self._ensure_thread()
+
+    def _ensure_thread(self):
+        # Threads don't survive fork, so a forked child starts its own flusher
+        if self.thread is None or self.pid != os.getpid() or not self.thread.is_alive():
+            self.closed = False
+            self.pid = os.getpid()
+            self.thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+            self.thread.start()
+
+    def _delay(self):
+        if not self.failures:
+            return self.flush_interval
+        return min(self.backoff * 2 ** (self.failures - 1), self.max_backoff)
+
+    def _run(self):
+        while not self.closed:
+            self.wakeup.wait(self._delay())
+            self.wakeup.clear()
+            self.flush()
+
+    def flush(self):
+        """Write everything pending in one sink call. Returns False when the sink failed."""
+        with self.flush_lock:
+            with self.lock:
+                batch, self.pending = self.pending, {}
+            if not batch:
+                return True
+            try:
+                self.sink(batch)
+            except Exception as e:
+                with self.lock:
+                    self.failures += 1
+                    self.stats["failures"] += 1
+                    if self.failures > self.max_retries:
+                        logger.error("dropping buffered updates", extra={
+                            "updates": len(batch), "retries": self.max_retries, "error": str(e)})
+                        self.stats["dropped"] += len(batch)
+                        self.failures = 0
+                        return False
+                    # Updates made while the write was failing are newer and win over the retried ones
+                    for key, fields in batch.items():
+                        merged = dict(fields)
+                        merged.update(self.pending.get(key, {}))
+                        self.pending[key] = merged
+                logger.warning("write-behind flush failed", extra={
+                    "attempt": self.failures, "retry_in": round(self._delay(), 1), "error": str(e)})
+                return False
+            with self.lock:
+                self.failures = 0
+                self.stats["flushes"] += 1
+            return True
+
+    def close(self, timeout=5.0):
+        """Stop the flusher and write whatever is still pending (one last attempt)"""
+        self.closed = True
+        self.wakeup.set()
+        if self.thread is not None and self.pid == os.getpid() and self.thread is not threading.current_thread():
+            self.thread.join(timeout)
+        self.flush()
+
+class MemorySink:
+    """Sink that keeps every write in memory; for running without Firebase and for tests"""
+
+    def __init__(self):
+        self.batches = []
+        self.data = {}
+
+    def __call__(self, updates):
+        self.batches.append(updates)
+        for key, fields in updates.items():
+            self.data.setdefault(key, {}).update(fields)
@@ -0,0 +1,62 @@
+import io
+import os
+import time
+import zipfile
+from contextlib import closing
+from app.services.storage import storage
+
+# Already-compressed formats gain nothing from deflate; store them as-is to save CPU
+STORED_EXTENSIONS = {
+    "jpg", "jpeg", "png", "webp", "gif", "mp3", "ogg", "aac", "m4a", "flac",
+    "mp4", "avi", "mov", "webm", "docx", "xlsx", "pptx", "zip"
+}
+CHUNK_SIZE = 256 * 1024
+
+class _ChunkBuffer(io.RawIOBase):
+    """Write-only, non-seekable sink that hands out whatever zipfile wrote so far"""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def take(self):
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+def stream_zip(entries, chunk_size=CHUNK_SIZE):
+    """Yield a ZIP archive of (archive_name, storage key) entries chunk by chunk.
+
+    Nothing is buffered beyond one chunk: because the sink is not seekable,
+    zipfile writes sizes and CRCs in data descriptors after each member.
+    """
+    sink = _ChunkBuffer()
+    with zipfile.ZipFile(sink, "w", allowZip64=True) as archive:
+        for name, key in entries:
+            ext = os.path.splitext(name)[1].lstrip(".").lower()
+            info = zipfile.ZipInfo(name, date_time=time.localtime(storage.stat(key)[1])[:6])
+            info.compress_type = zipfile.ZIP_STORED if ext in STORED_EXTENSIONS else zipfile.ZIP_DEFLATED
+            with closing(storage.open(key)) as src, archive.open(info, "w", force_zip64=True) as dest:
+                while True:
+                    chunk = src.read(chunk_size)
+                    if not chunk:
+                        break
+                    dest.write(chunk)
+                    data = sink.take()
+                    if data:
+                        yield data
+            data = sink.take()
+            if data:
+                yield data
+    yield sink.take()
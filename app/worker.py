@@ -0,0 +1,57 @@
+"""
+Standalone conversion worker.
+
+Claims jobs from the durable queue in temp.db and converts them on a local
+process pool. Run as many of these as needed next to (or instead of) the
+embedded worker in the API process:
+
+    python -m app.worker --concurrency 4
+"""
+import argparse
+import logging
+import signal
+from app.core.config import CONVERSION_WORKERS
+from app.services.temp_manager import init_db
+from app.services.job_queue import init_queue
+from app.services.result_cache import init_cache
+from app.services.metrics import init_metrics
+from app.core.log import configure_logging
+from app.services.conversion_executor import ConversionExecutor
+from app.services.job_dispatcher import JobDispatcher
+
+logger = logging.getLogger(__name__)
+
+def main():
+    parser = argparse.ArgumentParser(description="NodeBlack conversion worker")
+    parser.add_argument("--concurrency", type=int, default=CONVERSION_WORKERS,
+                        help="number of conversion processes (default: CONVERSION_WORKERS)")
+    parser.add_argument("--no-preload", action="store_true",
+                        help="import converters on first use instead of before forking the workers")
+    parser.add_argument("--drain-timeout", type=float, default=None,
+                        help="seconds to wait for running jobs on shutdown (default: wait for all)")
+    args = parser.parse_args()
+
+    configure_logging()
+    init_db()
+    init_queue()
+    init_cache()
+    init_metrics()
+
+    executor = ConversionExecutor(workers=args.concurrency, queue_size=0, preload=not args.no_preload)
+    dispatcher = JobDispatcher(executor)
+
+    def handle_signal(signum, frame):
+        logger.info("shutdown requested, finishing running jobs without claiming new ones", extra={"signal": signum})
+        dispatcher.stop()
+
+    signal.signal(signal.SIGTERM, handle_signal)
+    signal.signal(signal.SIGINT, handle_signal)
+
+    executor.start()
+    dispatcher.run_forever()
+    # Jobs still running after the drain timeout keep their lease until it expires, then get retried elsewhere
+    dispatcher.drain(args.drain_timeout)
+    executor.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,264 @@
+"""
+Per-converter benchmarks.
+
+Runs every direct (source, target) pair in the converter registry against the
+synthetic fixtures in benchmarks/fixtures.py and reports latency percentiles,
+throughput and peak RSS per fixture size. Each pair runs in its own freshly
+spawned process, so import cost and memory from one converter never leak into
+another's numbers. Image pairs whose target has encoder settings run once per
+encoder profile ("png->jpg[smallest]"), so each profile's speed and output size
+can be compared.
+
+    python -m benchmarks.converters                          # all pairs, small + medium
+    python -m benchmarks.converters --only png,csv->xlsx --sizes small,medium,large
+    python -m benchmarks.converters --save-baseline          # after an intended change
+    python -m benchmarks.converters --max-regression 0.25    # exit 1 on >25% regressions vs the baseline
+    python -m benchmarks.converters --ci                     # same, and exit 2 when there is no baseline
+    python -m benchmarks.converters --only ->jpg,->webp --profiles fast,smallest
+
+Results are written as JSON (--output) and compared against the stored
+baseline (--baseline) when it exists. benchmarks/baseline.json is the reference
+baseline; cases that failed (e.g. a missing optional library) are left out of it.
+"""
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from benchmarks.fixtures import SIZES, GENERATORS, PIL_FORMATS, FixtureUnavailable, fixture_path
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH_DIR = os.path.join(ROOT, "benchmarks")
+DEFAULT_OUTPUT = os.path.join(BENCH_DIR, "results.json")
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, "baseline.json")
+CASE_TIMEOUT_SECONDS = 1800
+
+# Differences below these are noise, whatever the ratio says
+MIN_LATENCY_DELTA_MS = 5.0
+MIN_RSS_DELTA_MB = 8.0
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a non-empty list"""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+def _peak_rss_mb():
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def run_case(source, target, fixtures, iterations, warmup, options=None):
+    """Benchmark one converter on each (size, path) in fixtures, smallest first. Runs in a fresh process."""
+    os.chdir(ROOT)
+    from app.services.pipeline import registry
+    converter = registry.converters[(source, target)]
+    converter.load()
+    baseline_rss = _peak_rss_mb()
+
+    results = {}
+    workdir = tempfile.mkdtemp(prefix="nodeblack-bench-")
+    try:
+        for size, input_path in fixtures:
+            output_path = os.path.join(workdir, f"{size}.{target}")
+            latencies = []
+            for i in range(warmup + iterations):
+                started = time.perf_counter()
+                converter.run(input_path, output_path, options)
+                elapsed = (time.perf_counter() - started) * 1000
+                if i >= warmup:
+                    latencies.append(elapsed)
+            input_bytes = os.path.getsize(input_path)
+            p50 = percentile(latencies, 0.50)
+            # Sizes run in increasing order, so the peak so far is this size's peak
+            peak_rss = _peak_rss_mb()
+            results[size] = {
+                "input_bytes": input_bytes,
+                "output_bytes": os.path.getsize(output_path),
+                "iterations": iterations,
+                "latency_ms": {
+                    "min": round(min(latencies), 3),
+                    "p50": round(p50, 3),
+                    "p95": round(percentile(latencies, 0.95), 3),
+                    "p99": round(percentile(latencies, 0.99), 3),
+                    "max": round(max(latencies), 3),
+                    "mean": round(sum(latencies) / len(latencies), 3)
+                },
+                "throughput_mb_s": round(input_bytes / (1024 * 1024) / (p50 / 1000), 3) if p50 else None,
+                "peak_rss_mb": round(peak_rss, 1),
+                "peak_rss_delta_mb": round(peak_rss - baseline_rss, 1)
+            }
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return {"converter": converter.name, "options": options, "sizes": results}
+
+def _matches(pair, filters):
+    source, target = pair
+    return not filters or any(
+        f == f"{source}->{target}" or f == source or f == f"->{target}" for f in filters
+    )
+
+def list_pairs(filters=None):
+    """Direct (source, target) pairs of every available converter, sorted"""
+    from app.services.pipeline import registry
+    return sorted(pair for pair, converter in registry.converters.items()
+                  if converter.available and _matches(pair, filters))
+
+def list_cases(pairs, profiles=None):
+    """(key, source, target, options) per case: tunable image pairs once per encoder profile, the rest once"""
+    from app.services.pipeline import registry
+    from app.services.image_encoding import PROFILES
+    for source, target in pairs:
+        key = f"{source}->{target}"
+        tunable = registry.converters[(source, target)].category == "images" and any(
+            PIL_FORMATS.get(target) in settings for settings in PROFILES.values())
+        if profiles and tunable:
+            for profile in profiles:
+                yield f"{key}[{profile}]", source, target, {"profile": profile}
+        else:
+            yield key, source, target, None
+
+def run_benchmarks(pairs, sizes, iterations=5, warmup=1, profiles=None):
+    context = multiprocessing.get_context("spawn")
+    report = {
+        "meta": {
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+            "sizes": sizes,
+            "iterations": iterations,
+            "warmup": warmup,
+            "profiles": profiles
+        },
+        "results": {},
+        "skipped": {}
+    }
+    for key, source, target, options in list_cases(pairs, profiles):
+        fixtures = []
+        try:
+            for size in sizes:
+                fixtures.append((size, fixture_path(source, size)))
+        except KeyError:
+            report["skipped"][key] = f"no fixture generator for .{source}"
+            continue
+        except FixtureUnavailable as e:
+            report["skipped"][key] = str(e)
+            continue
+
+        started = time.time()
+        try:
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                result = pool.submit(run_case, source, target, fixtures, iterations, warmup,
+                                     options).result(CASE_TIMEOUT_SECONDS)
+        except Exception as e:
+            report["results"][key] = {"error": f"{type(e).__name__}: {e}"}
+            print(f"{key:<24} failed: {e}")
+            continue
+        report["results"][key] = result
+        summary = "  ".join(
+            f"{size} p50={stats['latency_ms']['p50']:.1f}ms out={stats['output_bytes'] / 1024:.0f}KB "
+            f"rss+{stats['peak_rss_delta_mb']:.0f}MB"
+            for size, stats in result["sizes"].items()
+        )
+        print(f"{key:<24} {summary}  ({time.time() - started:.1f}s)")
+    return report
+
+def compare(report, baseline, max_regression):
+    """[(case, metric, baseline, current)] for cases that got slower or bigger by more than max_regression"""
+    regressions = []
+    for key, result in report["results"].items():
+        previous = baseline.get("results", {}).get(key)
+        if not previous or "error" in previous:
+            continue
+        if "error" in result:
+            regressions.append((key, "error", "ok", result["error"]))
+            continue
+        for size, stats in result["sizes"].items():
+            before = previous["sizes"].get(size)
+            if not before:
+                continue
+            checks = [
+                ("latency_p50_ms", before["latency_ms"]["p50"], stats["latency_ms"]["p50"], MIN_LATENCY_DELTA_MS),
+                ("peak_rss_delta_mb", before["peak_rss_delta_mb"], stats["peak_rss_delta_mb"], MIN_RSS_DELTA_MB)
+            ]
+            for metric, old, new, floor in checks:
+                if new - old > floor and new > old * (1 + max_regression):
+                    regressions.append((f"{key}@{size}", metric, old, new))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark every NodeBlack converter on synthetic fixtures")
+    parser.add_argument("--sizes", default="small,medium",
+                        help=f"comma-separated fixture sizes out of {', '.join(SIZES)} (default: small,medium)")
+    parser.add_argument("--only", default="",
+                        help="comma-separated filters: 'png->jpg', a source like 'png', or a target like '->pdf'")
+    parser.add_argument("--iterations", type=int, default=5, help="measured runs per fixture (default: 5)")
+    parser.add_argument("--warmup", type=int, default=1, help="unmeasured runs per fixture (default: 1)")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="where to write the JSON results")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="stored results to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="also store these results as the new baseline")
+    parser.add_argument("--max-regression", type=float, default=0.25,
+                        help="allowed slowdown / memory growth vs the baseline as a fraction (default: 0.25)")
+    parser.add_argument("--profiles", default="fast,balanced,smallest",
+                        help="comma-separated encoder profiles to run image pairs with; empty for the server default "
+                             "(default: fast,balanced,smallest)")
+    parser.add_argument("--ci", action="store_true",
+                        help="fail (exit 2) instead of skipping the comparison when there is no baseline")
+    parser.add_argument("--list", action="store_true", help="only list the pairs that would run")
+    args = parser.parse_args()
+    os.chdir(ROOT)
+
+    sizes = [size.strip() for size in args.sizes.split(",") if size.strip()]
+    unknown = [size for size in sizes if size not in SIZES]
+    if unknown:
+        parser.error(f"unknown size(s): {', '.join(unknown)}")
+    sizes = [size for size in SIZES if size in sizes]  # smallest first, see run_case
+    pairs = list_pairs([f.strip() for f in args.only.split(",") if f.strip()])
+    profiles = [profile.strip() for profile in args.profiles.split(",") if profile.strip()]
+    if args.list:
+        for source, target in pairs:
+            print(f"{source}->{target}" + ("" if source in GENERATORS else "  (no fixture)"))
+        return
+
+    report = run_benchmarks(pairs, sizes, args.iterations, args.warmup, profiles)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results for {len(report['results'])} pairs written to {args.output}")
+    for key, reason in report["skipped"].items():
+        print(f"skipped {key}: {reason}")
+
+    if args.save_baseline:
+        # A failed case has nothing to compare against; leave it out so it gets measured once it works
+        baseline = {**report, "results": {key: result for key, result in report["results"].items()
+                                          if "error" not in result}}
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+        return
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save-baseline to create one")
+        if args.ci:
+            sys.exit(2)
+        return
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare(report, baseline, args.max_regression)
+    if baseline.get("meta", {}).get("platform") != report["meta"]["platform"]:
+        print(f"Note: baseline was recorded on {baseline.get('meta', {}).get('platform')}")
+    for case, metric, old, new in regressions:
+        print(f"REGRESSION {case} {metric}: {old} -> {new}")
+    if regressions:
+        sys.exit(1)
+    print(f"No regressions over {args.max_regression:.0%} against {args.baseline}")
+
+if __name__ == "__main__":
+    main()
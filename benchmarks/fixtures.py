@@ -0,0 +1,192 @@
+"""
+Synthetic, reproducible input files for the converter benchmarks.
+
+Every fixture is generated from a fixed seed, so two runs (or two machines)
+convert byte-identical inputs. Files are written once to FIXTURE_DIR and reused.
+"""
+import array
+import math
+import os
+import random
+import shutil
+import subprocess
+import wave
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".fixtures")
+SEED = 1234
+# Bump when a generator changes so stale fixtures are not reused
+VERSION = 1
+
+# Size knob per fixture kind: pixels per side, table rows, paragraphs, slides, pages, seconds
+SIZES = {
+    "small": {"image": 256, "table": 1_000, "text": 20, "slides": 5, "pages": 1, "audio": 2, "video": 1},
+    "medium": {"image": 1024, "table": 20_000, "text": 500, "slides": 50, "pages": 10, "audio": 30, "video": 5},
+    "large": {"image": 2560, "table": 100_000, "text": 5_000, "slides": 300, "pages": 50, "audio": 180, "video": 20},
+}
+
+PIL_FORMATS = {"png": "PNG", "jpg": "JPEG", "jpeg": "JPEG", "webp": "WEBP", "bmp": "BMP", "tiff": "TIFF", "gif": "GIF"}
+FFMPEG_AUDIO = ["mp3", "ogg", "flac", "aac", "m4a", "wma"]
+FFMPEG_VIDEO = ["mp4", "avi", "mov", "webm", "mkv", "flv"]
+
+class FixtureUnavailable(Exception):
+    """The library or tool needed to generate this fixture is not installed"""
+
+def ffmpeg_available():
+    return shutil.which("ffmpeg") is not None
+
+def _words(rng, count):
+    vocabulary = ["convert", "file", "format", "node", "black", "image", "table", "report", "quarter",
+                  "revenue", "latency", "worker", "queue", "upload", "result", "benchmark", "fixture"]
+    return " ".join(rng.choice(vocabulary) for _ in range(count))
+
+def _image(path, fmt, size):
+    side = SIZES[size]["image"]
+    try:
+        from PIL import Image
+    except ImportError:
+        raise FixtureUnavailable("Pillow is not installed")
+    rng = random.Random(SEED)
+    # A gradient with noise on top: compresses like a photo, not like a flat fill or pure noise
+    gradient = Image.linear_gradient("L").resize((side, side))
+    noise = Image.frombytes("L", (side, side), rng.randbytes(side * side))
+    img = Image.merge("RGB", (gradient, Image.blend(gradient, noise, 0.3), noise.rotate(90)))
+    if fmt == "gif":
+        img = img.convert("P", palette=Image.ADAPTIVE)
+    img.save(path, PIL_FORMATS[fmt])
+
+def _table_rows(rows):
+    rng = random.Random(SEED)
+    yield ["id", "name", "region", "quantity", "price", "updated"]
+    for i in range(rows):
+        yield [i, _words(rng, 2), rng.choice(["emea", "apac", "amer"]), rng.randint(1, 500),
+               round(rng.uniform(1, 1000), 2), f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"]
+
+def _csv(path, size):
+    import csv
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        csv.writer(f).writerows(_table_rows(SIZES[size]["table"]))
+
+def _xlsx(path, size):
+    try:
+        from openpyxl import Workbook
+    except ImportError:
+        raise FixtureUnavailable("openpyxl is not installed")
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Data")
+    for row in _table_rows(SIZES[size]["table"]):
+        sheet.append(row)
+    workbook.save(path)
+
+def _xls(path, size):
+    # The service writes .xls through xlsxwriter (XLSX content), so that is what it gets back as input
+    _xlsx(path, size)
+
+def _paragraphs(count):
+    rng = random.Random(SEED)
+    return [_words(rng, rng.randint(20, 80)) for _ in range(count)]
+
+def _txt(path, size):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n\n".join(_paragraphs(SIZES[size]["text"])))
+
+def _docx(path, size):
+    try:
+        from docx import Document
+    except ImportError:
+        raise FixtureUnavailable("python-docx is not installed")
+    doc = Document()
+    for i, text in enumerate(_paragraphs(SIZES[size]["text"])):
+        if i % 10 == 0:
+            doc.add_heading(text[:40], level=1)
+        doc.add_paragraph(text)
+    doc.save(path)
+
+def _pptx(path, size):
+    try:
+        from pptx import Presentation
+    except ImportError:
+        raise FixtureUnavailable("python-pptx is not installed")
+    prs = Presentation()
+    for i, text in enumerate(_paragraphs(SIZES[size]["slides"])):
+        slide = prs.slides.add_slide(prs.slide_layouts[1])
+        slide.shapes.title.text = f"Slide {i + 1}"
+        slide.placeholders[1].text = text
+    prs.save(path)
+
+def _pdf(path, size):
+    pages = SIZES[size]["pages"]
+    try:
+        import fitz  # PyMuPDF, installed with pdf2docx
+    except ImportError:
+        raise FixtureUnavailable("PyMuPDF is not installed")
+    paragraphs = _paragraphs(pages * 6)
+    doc = fitz.open()
+    for page_number in range(pages):
+        page = doc.new_page()
+        page.insert_text((72, 72), f"Page {page_number + 1}", fontsize=18)
+        body = "\n\n".join(paragraphs[page_number * 6:(page_number + 1) * 6])
+        page.insert_textbox(fitz.Rect(72, 100, 540, 760), body, fontsize=10)
+    doc.save(path)
+    doc.close()
+
+def _wav(path, size, rate=44100):
+    seconds = SIZES[size]["audio"]
+    rng = random.Random(SEED)
+    samples = array.array("h", (
+        int(12000 * math.sin(2 * math.pi * 440 * i / rate) + rng.randint(-2000, 2000))
+        for i in range(seconds * rate)
+    ))
+    with wave.open(path, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(rate)
+        f.writeframes(samples.tobytes())
+
+def _ffmpeg(args, path):
+    if not ffmpeg_available():
+        raise FixtureUnavailable("ffmpeg is not installed")
+    subprocess.run(["ffmpeg", "-y", "-loglevel", "error", *args, path], check=True)
+
+def _audio(path, size):
+    _ffmpeg(["-i", fixture_path("wav", size)], path)
+
+def _video(path, size):
+    seconds = SIZES[size]["video"]
+    # -bitexact keeps encoder version strings out of the file
+    _ffmpeg(["-f", "lavfi", "-i", f"testsrc=size=640x360:rate=25:duration={seconds}",
+             "-f", "lavfi", "-i", f"sine=frequency=440:duration={seconds}", "-shortest", "-fflags", "+bitexact"], path)
+
+# format -> generator(path, size)
+GENERATORS = {
+    **{fmt: (lambda path, size, fmt=fmt: _image(path, fmt, size)) for fmt in PIL_FORMATS},
+    "csv": _csv,
+    "xlsx": _xlsx,
+    "xls": _xls,
+    "txt": _txt,
+    "docx": _docx,
+    "pptx": _pptx,
+    "pdf": _pdf,
+    "wav": _wav,
+    **{fmt: _audio for fmt in FFMPEG_AUDIO},
+    **{fmt: _video for fmt in FFMPEG_VIDEO},
+}
+
+def fixture_path(fmt, size):
+    """Path of the fixture for (format, size), generating it on first use.
+
+    Raises FixtureUnavailable when the generator's library or tool is missing,
+    and KeyError for formats there is no generator for.
+    """
+    generate = GENERATORS[fmt]
+    path = os.path.join(FIXTURE_DIR, f"v{VERSION}-{size}.{fmt}")
+    if not os.path.exists(path):
+        os.makedirs(FIXTURE_DIR, exist_ok=True)
+        # Written under a temporary name so an interrupted run never leaves a truncated fixture behind
+        partial = os.path.join(FIXTURE_DIR, f"partial-v{VERSION}-{size}.{fmt}")
+        try:
+            generate(partial, size)
+            os.replace(partial, path)
+        finally:
+            if os.path.exists(partial):
+                os.remove(partial)
+    return path
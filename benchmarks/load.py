@@ -0,0 +1,297 @@
+"""
+End-to-end load test for the HTTP API.
+
+Each virtual user uploads a file to /api/convert, polls /api/status until the
+job finishes and downloads the result, then starts over. The run steps through
+one or more concurrency levels and reports, per level, end-to-end and per-phase
+p50/p95/p99 latency, error rates and throughput, which together give the
+throughput curve of the server.
+
+    python -m benchmarks.load                                      # in-process server, png->jpg, 1,2,4,8 users
+    python -m benchmarks.load --mix png->jpg:3,csv->xlsx:1,docx->txt:1 --concurrency 1,4,16 --duration 60
+    python -m benchmarks.load --mode uvicorn --server-workers 2    # separate `uvicorn app.main:app` process
+    python -m benchmarks.load --url https://staging.example.com --api-key ...
+
+Servers started by this script run with the result cache off (see --cache),
+because the fixtures repeat and every job after the first would be a cache hit.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import secrets
+import socket
+import subprocess
+import sys
+import threading
+import time
+from benchmarks.converters import ROOT, percentile
+from benchmarks.fixtures import SIZES, FixtureUnavailable, fixture_path
+
+DEFAULT_OUTPUT = os.path.join(ROOT, "benchmarks", "load_results.json")
+
+def parse_mix(text):
+    """'png->jpg:3,csv->xlsx' -> [((source, target), weight)]"""
+    mix = []
+    for item in text.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        pair, _, weight = item.partition(":")
+        source, _, target = pair.partition("->")
+        if not source or not target:
+            raise ValueError(f"Bad mix entry {item!r}, expected source->target[:weight]")
+        mix.append(((source.strip().lower(), target.strip().lower()), float(weight or 1)))
+    return mix
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+class InProcessServer:
+    """The FastAPI app under uvicorn on a background thread of this process"""
+
+    def __init__(self, port):
+        import uvicorn
+        from app.main import app
+        self.server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+        self.thread = threading.Thread(target=self.server.run, name="load-test-server", daemon=True)
+
+    def start(self):
+        self.thread.start()
+        while not self.server.started:
+            if not self.thread.is_alive():
+                raise RuntimeError("In-process server failed to start")
+            time.sleep(0.05)
+
+    def stop(self):
+        self.server.should_exit = True
+        self.thread.join(10)
+
+class UvicornServer:
+    """`uvicorn app.main:app` in a child process"""
+
+    def __init__(self, port, workers, env):
+        self.port = port
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+             "--workers", str(workers), "--log-level", "warning"],
+            cwd=ROOT, env=env
+        )
+
+    def start(self, timeout=60):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"uvicorn exited with status {self.process.returncode}")
+            try:
+                with socket.create_connection(("127.0.0.1", self.port), timeout=0.5):
+                    return
+            except OSError:
+                time.sleep(0.2)
+        raise RuntimeError("uvicorn did not start listening in time")
+
+    def stop(self):
+        self.process.terminate()
+        try:
+            self.process.wait(15)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+
+class Recorder:
+    def __init__(self):
+        self.samples = []  # dicts with ok, error, phase latencies in ms
+        self.started = time.perf_counter()
+
+    def add(self, sample):
+        sample["at"] = time.perf_counter() - self.started
+        self.samples.append(sample)
+
+    def summary(self, elapsed):
+        ok = [s for s in self.samples if s["ok"]]
+        errors = {}
+        for s in self.samples:
+            if not s["ok"]:
+                errors[s["error"]] = errors.get(s["error"], 0) + 1
+
+        def latencies(key):
+            values = [s[key] for s in ok if s.get(key) is not None]
+            if not values:
+                return None
+            return {name: round(percentile(values, fraction), 1)
+                    for name, fraction in (("p50", 0.50), ("p95", 0.95), ("p99", 0.99))} | {"max": round(max(values), 1)}
+
+        return {
+            "requests": len(self.samples),
+            "completed": len(ok),
+            "error_rate": round(1 - len(ok) / len(self.samples), 4) if self.samples else 0.0,
+            "errors": errors,
+            "throughput_per_s": round(len(ok) / elapsed, 3) if elapsed else 0.0,
+            # Completions per second over the run, to see warm-up and saturation within a level
+            "completed_per_second": [sum(1 for s in ok if int(s["at"]) == second) for second in range(int(elapsed) + 1)],
+            "latency_ms": {
+                "end_to_end": latencies("total_ms"),
+                "submit": latencies("submit_ms"),
+                "wait": latencies("wait_ms"),
+                "download": latencies("download_ms")
+            }
+        }
+
+async def run_conversion(session, base_url, api_key, pair, path, poll_interval, job_timeout, sync):
+    """One upload -> status -> download round trip. Returns a sample dict."""
+    import aiohttp
+    source, target = pair
+    sample = {"pair": f"{source}->{target}", "ok": False}
+    started = time.perf_counter()
+    try:
+        form = aiohttp.FormData()
+        with open(path, "rb") as f:
+            form.add_field("file", f.read(), filename=f"load.{source}")
+        params = {"target_format": target, **({"sync": "true"} if sync else {})}
+        async with session.post(f"{base_url}/api/convert", params=params, data=form,
+                                headers={"X-API-Key": api_key}) as response:
+            if response.status != 200:
+                sample["error"] = f"convert {response.status}"
+                return sample
+            if response.headers.get("X-Conversion-Mode") == "inline":
+                await response.read()
+                sample["submit_ms"] = sample["total_ms"] = (time.perf_counter() - started) * 1000
+                sample["ok"] = True
+                return sample
+            task_id = (await response.json())["task_id"]
+        submitted = time.perf_counter()
+        sample["submit_ms"] = (submitted - started) * 1000
+
+        while True:
+            async with session.get(f"{base_url}/api/status/{task_id}") as response:
+                status = (await response.json()).get("status")
+            if status == "ready":
+                break
+            if status in ("failed", "expired", "not_found"):
+                sample["error"] = f"job {status}"
+                return sample
+            if time.perf_counter() - submitted > job_timeout:
+                sample["error"] = "job timeout"
+                return sample
+            await asyncio.sleep(poll_interval)
+        ready = time.perf_counter()
+        sample["wait_ms"] = (ready - submitted) * 1000
+
+        async with session.get(f"{base_url}/api/download/{task_id}") as response:
+            body = await response.read()
+            # Errors come back as 200 JSON bodies, files always as attachments
+            if response.status != 200 or "attachment" not in response.headers.get("Content-Disposition", ""):
+                sample["error"] = f"download {response.status}"
+                return sample
+        finished = time.perf_counter()
+        sample.update(download_ms=(finished - ready) * 1000, total_ms=(finished - started) * 1000,
+                      output_bytes=len(body), ok=True)
+    except asyncio.TimeoutError:
+        sample["error"] = "client timeout"
+    except Exception as e:
+        sample["error"] = type(e).__name__
+    return sample
+
+async def run_level(base_url, api_key, files, concurrency, duration, poll_interval, job_timeout, sync, seed):
+    """Keep `concurrency` users busy for `duration` seconds"""
+    import aiohttp
+    recorder = Recorder()
+    deadline = time.perf_counter() + duration
+    rng = random.Random(seed)
+    pairs, weights = zip(*[(pair, weight) for pair, weight, _ in files])
+    paths = {pair: path for pair, _, path in files}
+
+    async def user():
+        while time.perf_counter() < deadline:
+            pair = rng.choices(pairs, weights)[0]
+            recorder.add(await run_conversion(session, base_url, api_key, pair, paths[pair],
+                                              poll_interval, job_timeout, sync))
+
+    timeout = aiohttp.ClientTimeout(total=job_timeout + 60)
+    async with aiohttp.ClientSession(timeout=timeout, connector=aiohttp.TCPConnector(limit=0)) as session:
+        started = time.perf_counter()
+        await asyncio.gather(*(user() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    return recorder.summary(elapsed)
+
+def print_level(concurrency, summary):
+    e2e = summary["latency_ms"]["end_to_end"] or {}
+    print(f"users={concurrency:<4} done={summary['completed']:<6} rps={summary['throughput_per_s']:<8} "
+          f"p50={e2e.get('p50', '-')}ms p95={e2e.get('p95', '-')}ms p99={e2e.get('p99', '-')}ms "
+          f"errors={summary['error_rate']:.1%} {summary['errors'] or ''}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test /api/convert -> /api/status -> /api/download")
+    parser.add_argument("--mode", choices=["inprocess", "uvicorn"], default="inprocess",
+                        help="how to run the server when --url is not given (default: inprocess)")
+    parser.add_argument("--url", default=None, help="test an already running server instead of starting one")
+    parser.add_argument("--api-key", default=os.getenv("API_KEY"), help="X-API-Key to send (default: $API_KEY)")
+    parser.add_argument("--server-workers", type=int, default=1, help="uvicorn --workers in uvicorn mode")
+    parser.add_argument("--cache", action="store_true", help="keep the result cache on in servers started here")
+    parser.add_argument("--mix", default="png->jpg", help="weighted file mix, e.g. 'png->jpg:3,csv->xlsx:1'")
+    parser.add_argument("--size", default="small", choices=list(SIZES), help="fixture size (default: small)")
+    parser.add_argument("--concurrency", default="1,2,4,8", help="comma-separated user counts, run in order")
+    parser.add_argument("--duration", type=float, default=30, help="seconds per concurrency level (default: 30)")
+    parser.add_argument("--poll-interval", type=float, default=0.1, help="seconds between status polls")
+    parser.add_argument("--job-timeout", type=float, default=300, help="give up on a job after this many seconds")
+    parser.add_argument("--sync", action="store_true", help="send sync=true (inline fast path where possible)")
+    parser.add_argument("--seed", type=int, default=1, help="seed for picking files from the mix")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="where to write the JSON report")
+    args = parser.parse_args()
+    os.chdir(ROOT)
+
+    levels = [int(level) for level in args.concurrency.split(",") if level.strip()]
+    files = []
+    for pair, weight in parse_mix(args.mix):
+        try:
+            files.append((pair, weight, fixture_path(pair[0], args.size)))
+        except (KeyError, FixtureUnavailable) as e:
+            parser.error(f"no {args.size} fixture for .{pair[0]}: {e}")
+
+    server = None
+    base_url = args.url.rstrip("/") if args.url else None
+    api_key = args.api_key
+    if base_url is None:
+        api_key = api_key or secrets.token_urlsafe(16)
+        os.environ["API_KEY"] = api_key
+        if not args.cache:
+            os.environ["RESULT_CACHE_ENABLED"] = "false"
+        port = _free_port()
+        server = InProcessServer(port) if args.mode == "inprocess" else UvicornServer(port, args.server_workers,
+                                                                                    dict(os.environ))
+        server.start()
+        base_url = f"http://127.0.0.1:{port}"
+    elif not api_key:
+        parser.error("--api-key (or $API_KEY) is required with --url")
+
+    report = {
+        "meta": {
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "target": args.url or f"{args.mode} (workers={args.server_workers if args.mode == 'uvicorn' else 1})",
+            "mix": args.mix,
+            "size": args.size,
+            "duration_per_level": args.duration,
+            "cache": args.cache if not args.url else "server setting",
+            "sync": args.sync,
+            "cpu_count": os.cpu_count()
+        },
+        "levels": []
+    }
+    try:
+        for concurrency in levels:
+            summary = asyncio.run(run_level(base_url, api_key, files, concurrency, args.duration,
+                                            args.poll_interval, args.job_timeout, args.sync, args.seed))
+            report["levels"].append({"concurrency": concurrency, **summary})
+            print_level(concurrency, summary)
+    finally:
+        if server is not None:
+            server.stop()
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Report written to {args.output}")
+
+if __name__ == "__main__":
+    main()
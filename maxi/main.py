@@ -57,6 +57,9 @@ class ConversionWorker(QThread):
                         elif status_data['status'] == 'expired':
                             self.finished.emit("File expired", False)
                             return
+                        elif status_data['status'] == 'failed':
+                            self.finished.emit(f"Conversion failed: {status_data.get('message')}", False)
+                            return
                 
                 self.finished.emit("Conversion timeout", False)
             else:
@@ -340,7 +343,7 @@ class NodeBlackTester(QMainWindow):
     
     def refresh_files(self):
         try:
-            response = requests.get("https://nodeblack.onrender.com/api/files")
+            response = requests.get("https://nodeblack.onrender.com/api/files", params={"check_files": "true"})
             if response.status_code == 200:
                 data = response.json()
                 self.files_list.clear()
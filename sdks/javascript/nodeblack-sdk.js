@@ -35,9 +35,10 @@ class NodeBlackClient {
      * @param {string} filePath - Path to input file
      * @param {string} targetFormat - Target format (e.g., 'jpg', 'png', 'mp3')
      * @param {number} timeout - Max wait time in seconds (default: 60)
+     * @param {Object} imageOptions - Image resizing and encoding: { width, height, fit, thumbnail, profile, quality, ... }
      * @returns {Promise<Object>} Result with task_id and status
      */
-    async convertFile(filePath, targetFormat, timeout = 60) {
+    async convertFile(filePath, targetFormat, timeout = 60, imageOptions = {}) {
         if (!fs.existsSync(filePath)) {
             throw new Error(`File not found: ${filePath}`);
         }
@@ -47,7 +48,7 @@ class NodeBlackClient {
 
         try {
             const response = await this.client.post('/api/convert', formData, {
-                params: { target_format: targetFormat },
+                params: { target_format: targetFormat, ...imageOptions },
                 headers: formData.getHeaders()
             });
 
@@ -59,11 +60,64 @@ class NodeBlackClient {
         }
     }
 
+    /**
+     * Convert a small file in a single request and save the result
+     * Small image/spreadsheet conversions are answered inline; anything else
+     * is queued as usual, awaited and downloaded.
+     * @param {string} filePath - Path to input file
+     * @param {string} targetFormat - Target format (e.g., 'jpg', 'csv')
+     * @param {string} outputPath - Where to write the converted file
+     * @param {number} timeout - Max wait time in seconds for queued conversions (default: 60)
+     * @param {Object} imageOptions - Image resizing and encoding: { width, height, fit, thumbnail, profile, quality, ... }
+     * @returns {Promise<string>} Path to the converted file
+     */
+    async convertFileSync(filePath, targetFormat, outputPath, timeout = 60, imageOptions = {}) {
+        if (!fs.existsSync(filePath)) {
+            throw new Error(`File not found: ${filePath}`);
+        }
+
+        const formData = new FormData();
+        formData.append('file', fs.createReadStream(filePath));
+
+        let response;
+        try {
+            response = await this.client.post('/api/convert', formData, {
+                params: { target_format: targetFormat, sync: true, ...imageOptions },
+                headers: formData.getHeaders(),
+                responseType: 'arraybuffer'
+            });
+        } catch (error) {
+            throw new Error(`Conversion failed: ${error.response?.data?.detail || error.message}`);
+        }
+
+        if (response.headers['x-conversion-mode'] !== 'inline') {
+            const { task_id } = JSON.parse(Buffer.from(response.data).toString('utf8'));
+            await this._waitForCompletion(task_id, timeout);
+            return this.downloadFile(task_id, outputPath);
+        }
+
+        const outputDir = path.dirname(outputPath);
+        if (!fs.existsSync(outputDir)) {
+            fs.mkdirSync(outputDir, { recursive: true });
+        }
+        fs.writeFileSync(outputPath, Buffer.from(response.data));
+        return outputPath;
+    }
+
     /**
      * Wait for conversion to complete
      * @private
      */
     async _waitForCompletion(taskId, timeout) {
+        try {
+            return await this._waitForEvents(taskId, timeout);
+        } catch (error) {
+            if (error.conversionFailed) {
+                throw error;
+            }
+            // Event stream unavailable: fall back to polling
+        }
+
         const startTime = Date.now();
 
         while (Date.now() - startTime < timeout * 1000) {
@@ -81,6 +135,49 @@ class NodeBlackClient {
         throw new Error(`Conversion timeout after ${timeout} seconds`);
     }
 
+    /**
+     * Follow /api/events/{taskId} (Server-Sent Events) until the job completes or fails
+     * @private
+     */
+    async _waitForEvents(taskId, timeout) {
+        const response = await this.client.get(`/api/events/${taskId}`, {
+            responseType: 'stream',
+            timeout: timeout * 1000
+        });
+
+        return new Promise((resolve, reject) => {
+            let buffer = '';
+            const timer = setTimeout(() => {
+                response.data.destroy();
+                reject(new Error(`Conversion timeout after ${timeout} seconds`));
+            }, timeout * 1000);
+            const finish = (callback, value) => {
+                clearTimeout(timer);
+                response.data.destroy();
+                callback(value);
+            };
+
+            response.data.on('data', chunk => {
+                buffer += chunk.toString('utf8');
+                const lines = buffer.split('\n');
+                buffer = lines.pop();
+                for (const line of lines) {
+                    if (!line.startsWith('data:')) continue;
+                    const event = JSON.parse(line.slice(5));
+                    if (event.state === 'completed') {
+                        return finish(resolve, { task_id: taskId, status: 'completed' });
+                    } else if (event.state === 'failed') {
+                        const error = new Error(`Conversion failed: ${event.error || 'Unknown error'}`);
+                        error.conversionFailed = true;
+                        return finish(reject, error);
+                    }
+                }
+            });
+            response.data.on('end', () => finish(reject, new Error('Event stream closed before the conversion finished')));
+            response.data.on('error', error => finish(reject, error));
+        });
+    }
+
     /**
      * Get conversion status
      * @param {string} taskId - Task ID
@@ -141,12 +238,16 @@ class NodeBlackClient {
     }
 
     /**
-     * List all converted files
-     * @returns {Promise<Object>} List of files
+     * List one page of this key's converted files
+     * @param {Object} options - limit, cursor (the previous page's next_cursor), status, checkFiles
+     * @returns {Promise<Object>} Files on this page and next_cursor
      */
-    async listFiles() {
+    async listFiles({ limit = 100, cursor, status, checkFiles = false } = {}) {
         try {
-            const response = await this.client.get('/api/files');
+            const params = { limit, check_files: checkFiles };
+            if (cursor) params.cursor = cursor;
+            if (status) params.status = status;
+            const response = await this.client.get('/api/files', { params });
             return response.data;
         } catch (error) {
             throw new Error(`Failed to list files: ${error.response?.data?.detail || error.message}`);
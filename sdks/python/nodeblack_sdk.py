@@ -15,6 +15,7 @@ Usage:
 
 import requests
 import time
+import json
 from typing import Optional, Dict, Any
 from pathlib import Path
 
@@ -25,7 +26,7 @@ class NodeBlackClient:
         self.session = requests.Session()
         self.session.headers.update({"X-API-Key": api_key})
     
-    def convert_file(self, file_path: str, target_format: str, timeout: int = 60) -> Dict[str, Any]:
+    def convert_file(self, file_path: str, target_format: str, timeout: int = 60, **image_options) -> Dict[str, Any]:
         """
         Convert a file to target format
         
@@ -33,6 +34,8 @@ class NodeBlackClient:
             file_path: Path to input file
             target_format: Target format (e.g., 'jpg', 'png', 'mp3')
             timeout: Max wait time in seconds
+            **image_options: Image resizing (width, height, fit, thumbnail) and encoding
+                (profile, quality, progressive, subsampling, optimize, compress_level, method, lossless, compression)
             
         Returns:
             Dict with task_id and status
@@ -44,7 +47,7 @@ class NodeBlackClient:
         
         with open(file_path, 'rb') as f:
             files = {'file': f}
-            params = {'target_format': target_format}
+            params = {'target_format': target_format, **image_options}
             
             response = self.session.post(
                 f"{self.base_url}/api/convert",
@@ -59,8 +62,50 @@ class NodeBlackClient:
         # Wait for completion
         return self._wait_for_completion(task_id, timeout)
     
+    def convert_file_sync(self, file_path: str, target_format: str, output_path: str, timeout: int = 60,
+                          **image_options) -> str:
+        """
+        Convert a small file in a single request and save the result
+        
+        The server answers small image/spreadsheet conversions inline; anything
+        else is queued as usual and this waits for it and downloads the result.
+        
+        Returns:
+            Path to the converted file
+        """
+        file_path = Path(file_path)
+        
+        if not file_path.exists():
+            raise FileNotFoundError(f"File not found: {file_path}")
+        
+        with open(file_path, 'rb') as f:
+            response = self.session.post(
+                f"{self.base_url}/api/convert",
+                files={'file': f},
+                params={'target_format': target_format, 'sync': 'true', **image_options}
+            )
+            response.raise_for_status()
+        
+        if response.headers.get('X-Conversion-Mode') != 'inline':
+            task_id = response.json()['task_id']
+            self._wait_for_completion(task_id, timeout)
+            return self.download_file(task_id, output_path)
+        
+        output_path = Path(output_path)
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        
+        with open(output_path, 'wb') as f:
+            f.write(response.content)
+        
+        return str(output_path)
+    
     def _wait_for_completion(self, task_id: str, timeout: int) -> Dict[str, Any]:
-        """Wait for conversion to complete"""
+        """Wait for conversion to complete, pushed over SSE with polling as fallback"""
+        try:
+            return self._wait_for_events(task_id, timeout)
+        except (requests.RequestException, ValueError):
+            pass
+        
         start_time = time.time()
         
         while time.time() - start_time < timeout:
@@ -75,6 +120,20 @@ class NodeBlackClient:
         
         raise TimeoutError(f"Conversion timeout after {timeout} seconds")
     
+    def _wait_for_events(self, task_id: str, timeout: int) -> Dict[str, Any]:
+        """Follow /api/events/{task_id} until the job completes or fails"""
+        with self.session.get(f"{self.base_url}/api/events/{task_id}", stream=True, timeout=timeout) as response:
+            response.raise_for_status()
+            for line in response.iter_lines(decode_unicode=True):
+                if not line or not line.startswith('data:'):
+                    continue
+                event = json.loads(line[5:])
+                if event['state'] == 'completed':
+                    return {'task_id': task_id, 'status': 'completed'}
+                elif event['state'] == 'failed':
+                    raise Exception(f"Conversion failed: {event.get('error') or 'Unknown error'}")
+        raise ValueError("Event stream closed before the conversion finished")
+    
     def get_status(self, task_id: str) -> Dict[str, Any]:
         """Get conversion status"""
         response = self.session.get(f"{self.base_url}/api/status/{task_id}")
@@ -100,9 +159,15 @@ class NodeBlackClient:
         response.raise_for_status()
         return response.json()
     
-    def list_files(self) -> Dict[str, Any]:
-        """List all converted files"""
-        response = self.session.get(f"{self.base_url}/api/files")
+    def list_files(self, limit: int = 100, cursor: Optional[str] = None, status: Optional[str] = None,
+                   check_files: bool = False) -> Dict[str, Any]:
+        """List one page of this key's converted files; pass next_cursor back as cursor for the next page"""
+        params = {"limit": limit, "check_files": str(check_files).lower()}
+        if cursor:
+            params["cursor"] = cursor
+        if status:
+            params["status"] = status
+        response = self.session.get(f"{self.base_url}/api/files", params=params)
         response.raise_for_status()
         return response.json()
 
@@ -0,0 +1,54 @@
+import os
+import shutil
+import tempfile
+import pytest
+
+# temp.db is opened relative to the working directory and config is read at import time,
+# so both are pointed at a scratch directory before anything under app/ is imported.
+WORKDIR = tempfile.mkdtemp(prefix="nodeblack-tests-")
+STORAGE_ROOT = os.path.join(WORKDIR, "storage")
+os.environ.update({
+    "API_KEY": "test-key",
+    "STORAGE_BACKEND": "local",
+    "STORAGE_ROOT": STORAGE_ROOT,
+    "EMBEDDED_WORKER": "false",
+    "PRECOMPRESS_MIN_BYTES": "64",
+})
+os.chdir(WORKDIR)
+
+from app.services.temp_manager import init_db, pool, _temp_cache
+from app.services.job_queue import init_queue, _finished_status_cache
+from app.services.result_cache import init_cache
+
+init_db()
+init_queue()
+init_cache()
+
+API_KEY = os.environ["API_KEY"]
+TABLES = ("jobs", "batches", "job_events", "temp_downloads", "conversion_cache")
+
+@pytest.fixture(autouse=True)
+def clean_state():
+    """Every test starts with empty tables, storage and lookup caches"""
+    yield
+    with pool.connection() as conn:
+        for table in TABLES:
+            conn.execute(f"DELETE FROM {table}")
+    _temp_cache.clear()
+    _finished_status_cache.clear()
+    shutil.rmtree(STORAGE_ROOT, ignore_errors=True)
+
+@pytest.fixture(scope="session")
+def client():
+    from fastapi.testclient import TestClient
+    from app.main import app
+    # Not entered as a context manager, so the startup hooks (keep-alive pings, sweeper) don't run
+    return TestClient(app, headers={"X-API-Key": API_KEY})
+
+@pytest.fixture
+def png_bytes():
+    import io
+    from PIL import Image
+    buf = io.BytesIO()
+    Image.linear_gradient("L").resize((64, 48)).convert("RGB").save(buf, "PNG")
+    return buf.getvalue()
@@ -0,0 +1,52 @@
+import io
+import zipfile
+from PIL import Image
+from app.services.job_queue import claim_job
+from app.services.pipeline import run_job
+
+def image(color):
+    buf = io.BytesIO()
+    Image.new("RGB", (16, 16), color).save(buf, "PNG")
+    return buf.getvalue()
+
+def run_all():
+    while (job := claim_job("test-worker", 60)) is not None:
+        run_job(job, "test-worker")
+
+def test_batch_converts_every_file_and_streams_one_zip(client):
+    files = [("files", ("red.png", image("red"), "image/png")), ("files", ("blue.png", image("blue"), "image/png")),
+             ("files", ("notes.exe", b"MZ", "application/octet-stream"))]
+    batch = client.post("/api/batch", params={"target_format": "jpg"}, files=files).json()
+    assert batch["accepted"] == 2
+    assert [item["filename"] for item in batch["rejected"]] == ["notes.exe"]
+    batch_id = batch["batch_id"]
+
+    status = client.get(f"/api/batch/{batch_id}").json()
+    assert status["counts"] == {"queued": 2} and not status["finished"] and status["download_url"] is None
+    assert client.get(f"/api/batch/{batch_id}/download").status_code == 409
+
+    run_all()
+    status = client.get(f"/api/batch/{batch_id}").json()
+    assert status["finished"] and status["download_url"] == f"/api/batch/{batch_id}/download"
+    response = client.get(status["download_url"])
+    assert response.headers["content-type"] == "application/zip"
+    archive = zipfile.ZipFile(io.BytesIO(response.content))
+    assert sorted(archive.namelist()) == ["blue.jpg", "red.jpg"]
+    assert archive.testzip() is None
+    assert Image.open(archive.open("red.jpg")).getpixel((8, 8))[0] > 200
+
+def test_zip_upload_is_expanded_into_its_members(client):
+    upload = io.BytesIO()
+    with zipfile.ZipFile(upload, "w") as archive:
+        archive.writestr("photos/a.png", image("red"))
+        archive.writestr("photos/b.png", image("green"))
+        archive.writestr("photos/.DS_Store", b"junk")
+    batch = client.post("/api/batch", params={"target_format": "webp"},
+                        files=[("files", ("photos.zip", upload.getvalue(), "application/zip"))]).json()
+    assert sorted(task["filename"] for task in batch["tasks"]) == ["a.png", "b.png"]
+
+def test_invalid_zip_and_unknown_batch(client):
+    response = client.post("/api/batch", params={"target_format": "jpg"},
+                           files=[("files", ("broken.zip", b"not a zip", "application/zip"))])
+    assert response.status_code == 400
+    assert client.get("/api/batch/missing").status_code == 404
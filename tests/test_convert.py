@@ -0,0 +1,72 @@
+import asyncio
+import time
+import pytest
+from app.api import convert
+from app.core.config import CONVERSION_RETRY_AFTER_SECONDS
+from app.services.conversion_executor import ConversionExecutor, QueueFullError
+from app.services.job_queue import enqueue_job, count_jobs
+from app.services.storage import storage
+
+def test_full_queue_returns_429_with_retry_after(client, png_bytes, monkeypatch):
+    monkeypatch.setattr(convert, "CONVERSION_QUEUE_SIZE", 1)
+    enqueue_job("waiting", "input/waiting_a.png", "output/waiting.jpg", "a.png", "jpg")
+    response = client.post("/api/convert", params={"target_format": "jpg"},
+                           files={"file": ("photo.png", png_bytes, "image/png")})
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == str(CONVERSION_RETRY_AFTER_SECONDS)
+    # Refused before the upload was stored or queued
+    assert count_jobs("queued") == 1
+    assert list(storage.list("input/")) == []
+
+def test_batch_jobs_do_not_count_against_single_uploads(client, png_bytes, monkeypatch):
+    monkeypatch.setattr(convert, "CONVERSION_QUEUE_SIZE", 1)
+    enqueue_job("in-batch", "input/in-batch_a.png", "output/in-batch.jpg", "a.png", "jpg", batch_id="b1")
+    response = client.post("/api/convert", params={"target_format": "jpg"},
+                           files={"file": ("photo.png", png_bytes, "image/png")})
+    assert response.status_code == 200, response.text
+
+def test_executor_refuses_work_past_its_capacity():
+    executor = ConversionExecutor(workers=1, queue_size=0, start_method="fork", preload=False)
+    try:
+        running = executor.submit(time.sleep, 0.5)
+        assert executor.is_full()
+        with pytest.raises(QueueFullError):
+            executor.submit(time.sleep, 0)
+        running.result(timeout=10)
+        # The slot frees up once the job is done (its callback runs just after the result is set)
+        deadline = time.time() + 5
+        while executor.is_full() and time.time() < deadline:
+            time.sleep(0.01)
+        executor.submit(time.sleep, 0).result(timeout=10)
+    finally:
+        executor.stop()
+
+def post_sync(client, png_bytes):
+    return client.post("/api/convert", params={"target_format": "jpg", "sync": True},
+                       files={"file": ("photo.png", png_bytes, "image/png")})
+
+def test_small_upload_is_converted_inline(client, png_bytes):
+    response = post_sync(client, png_bytes)
+    assert response.status_code == 200
+    assert response.headers["X-Conversion-Mode"] == "inline"
+    assert response.headers["content-type"] == "image/jpeg" and response.content[:3] == b"\xff\xd8\xff"
+    assert count_jobs("queued") == 0
+
+def test_large_upload_falls_back_to_the_queue(client, png_bytes, monkeypatch):
+    monkeypatch.setattr(convert, "SYNC_MAX_BYTES", len(png_bytes) - 1)
+    response = post_sync(client, png_bytes)
+    assert response.headers["X-Conversion-Mode"] == "queued"
+    assert "task_id" in response.json()
+    assert count_jobs("queued") == 1
+
+def test_busy_inline_slots_fall_back_to_the_queue(client, png_bytes, monkeypatch):
+    # Every slot taken by other inline conversions
+    monkeypatch.setattr(convert, "_inline_slots", asyncio.Semaphore(0))
+    response = post_sync(client, png_bytes)
+    assert response.headers["X-Conversion-Mode"] == "queued"
+    assert count_jobs("queued") == 1
+
+def test_multi_hop_route_is_never_inline(client):
+    response = client.post("/api/convert", params={"target_format": "txt", "sync": True},
+                           files={"file": ("doc.pdf", b"%PDF-1.4", "application/pdf")})
+    assert response.headers["X-Conversion-Mode"] == "queued"
@@ -0,0 +1,125 @@
+import hashlib
+import uuid
+import pytest
+from app.services.storage import storage, output_key
+from app.services.temp_manager import save_temp
+from app.services.precompress import write_variants, store_variants, COMPRESSORS
+
+DATA = bytes(range(256)) * 40
+
+def save_output(data, ext):
+    """A finished download row for data, like run_job leaves behind. Returns (task_id, ETag)."""
+    task_id = str(uuid.uuid4())
+    key = output_key(task_id, ext)
+    staged = storage.staging_path(key)
+    with open(staged, "wb") as f:
+        f.write(data)
+    encodings = store_variants(key, write_variants(staged))
+    content_hash = hashlib.sha256(data).hexdigest()
+    save_temp(task_id, key, content_hash=content_hash, encodings=encodings)
+    return task_id, f'"{content_hash}"'
+
+@pytest.fixture
+def download(client):
+    task_id, etag = save_output(DATA, "bin")
+
+    def get(method="GET", **headers):
+        return client.request(method, f"/api/download/{task_id}", headers={"Accept-Encoding": "identity", **headers})
+    get.etag = etag
+    return get
+
+def test_full_download(download):
+    response = download()
+    assert response.status_code == 200
+    assert response.content == DATA
+    assert response.headers["Accept-Ranges"] == "bytes"
+    assert response.headers["ETag"] == download.etag
+    assert response.headers["Content-Length"] == str(len(DATA))
+
+def test_head_sends_headers_only(download):
+    response = download("HEAD")
+    assert response.status_code == 200
+    assert response.content == b""
+    assert response.headers["Content-Length"] == str(len(DATA))
+
+@pytest.mark.parametrize("header, start, end", [
+    ("bytes=0-99", 0, 99),
+    ("bytes=100-", 100, len(DATA) - 1),
+    ("bytes=-10", len(DATA) - 10, len(DATA) - 1),
+    ("bytes=10000-99999", 10000, len(DATA) - 1),  # clamped to the end
+])
+def test_range(download, header, start, end):
+    response = download(Range=header)
+    assert response.status_code == 206
+    assert response.content == DATA[start:end + 1]
+    assert response.headers["Content-Range"] == f"bytes {start}-{end}/{len(DATA)}"
+
+@pytest.mark.parametrize("header", ["bytes=0-1,5-6", "bytes=abc", "items=0-10"])
+def test_unsupported_range_sends_everything(download, header):
+    response = download(Range=header)
+    assert response.status_code == 200
+    assert response.content == DATA
+
+@pytest.mark.parametrize("header", [f"bytes={len(DATA)}-", "bytes=-0"])
+def test_unsatisfiable_range(download, header):
+    response = download(Range=header)
+    assert response.status_code == 416
+    assert response.headers["Content-Range"] == f"bytes */{len(DATA)}"
+
+def test_if_none_match(download):
+    assert download(**{"If-None-Match": download.etag}).status_code == 304
+    assert download(**{"If-None-Match": f"W/{download.etag}"}).status_code == 304
+    assert download(**{"If-None-Match": '"something-else"'}).status_code == 200
+
+def test_if_range(download):
+    response = download(Range="bytes=0-9", **{"If-Range": download.etag})
+    assert response.status_code == 206 and response.content == DATA[:10]
+    # The client's copy is a different file: start over with the whole thing
+    response = download(Range="bytes=0-9", **{"If-Range": '"stale"'})
+    assert response.status_code == 200 and response.content == DATA
+
+def test_filename_and_type(client):
+    task_id, _ = save_output(b"\xff\xd8 not really a jpeg", "jpg")
+    response = client.get(f"/api/download/{task_id}")
+    assert response.headers["Content-Type"] == "image/jpeg"
+    assert response.headers["Content-Disposition"] == f"attachment; filename=converted_{task_id}.jpg"
+    assert "Vary" not in response.headers and "Content-Encoding" not in response.headers
+
+TEXT = b"id,name,region\n" + b"".join(b"%d,item %d,north\n" % (i, i) for i in range(500))
+
+def test_precompressed_variant(client):
+    task_id, etag = save_output(TEXT, "csv")
+    response = client.get(f"/api/download/{task_id}", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert response.headers["Vary"] == "Accept-Encoding"
+    assert response.headers["ETag"] == etag[:-1] + '-gzip"'
+    assert int(response.headers["Content-Length"]) < len(TEXT)
+    # Same file under the same name and type, only compressed on the wire
+    assert response.headers["Content-Type"].startswith("text/csv")
+    assert response.headers["Content-Disposition"] == f"attachment; filename=converted_{task_id}.csv"
+    assert response.content == TEXT  # decoded by the client
+
+def test_variant_follows_accept_encoding(client):
+    task_id, etag = save_output(TEXT, "csv")
+    for accept in ("identity", "gzip;q=0", "compress"):
+        response = client.get(f"/api/download/{task_id}", headers={"Accept-Encoding": accept})
+        assert "Content-Encoding" not in response.headers
+        assert response.headers["ETag"] == etag
+        assert response.headers["Vary"] == "Accept-Encoding"
+        assert response.content == TEXT
+    best = client.get(f"/api/download/{task_id}", headers={"Accept-Encoding": "*"})
+    assert best.headers["Content-Encoding"] == next(encoding for encoding in ("br", "zstd", "gzip")
+                                                    if encoding in COMPRESSORS)
+
+def test_variant_etag_revalidates(client):
+    task_id, etag = save_output(TEXT, "csv")
+    gzip_etag = etag[:-1] + '-gzip"'
+    headers = {"Accept-Encoding": "gzip", "If-None-Match": gzip_etag}
+    assert client.get(f"/api/download/{task_id}", headers=headers).status_code == 304
+    # The plain file's ETag doesn't validate the compressed one
+    headers["If-None-Match"] = etag
+    assert client.get(f"/api/download/{task_id}", headers=headers).status_code == 200
+
+def test_unknown_task(client):
+    assert client.get("/api/download/missing").json() == {"error": "File not found or expired"}
@@ -0,0 +1,74 @@
+import time
+from app.services.expiry_sweeper import ExpirySweeper
+from app.services.job_queue import enqueue_job, claim_job, complete_job, get_job
+from app.services.metrics import init_metrics
+from app.services.precompress import variant_key
+from app.services.storage import storage, input_key, output_key
+from app.services.temp_manager import pool, save_temp, get_temp
+
+GRACE = 600
+
+def store(key, data=b"x" * 100):
+    with open(storage.staging_path(key), "wb") as f:
+        f.write(data)
+    storage.put(key, storage.staging_path(key))
+    return key
+
+def expire(task_id):
+    with pool.connection() as conn:
+        conn.execute("UPDATE temp_downloads SET expires_at=? WHERE task_id=?", (int(time.time()) - 1, task_id))
+
+def test_expired_downloads_lose_file_variants_and_row():
+    old = store(output_key("aa01", "json"))
+    store(variant_key(old, "gzip"), b"x" * 20)
+    live = store(output_key("bb02", "json"))
+    save_temp("aa01", old, encodings=("gzip",))
+    save_temp("bb02", live)
+    expire("aa01")
+
+    rows, files, freed = ExpirySweeper().sweep_expired()
+    assert (rows, files, freed) == (1, 1, 120)
+    assert not storage.exists(old) and not storage.exists(variant_key(old, "gzip"))
+    assert get_temp("aa01") is None
+    assert storage.exists(live) and get_temp("bb02") is not None
+
+def test_expired_rows_go_in_batches():
+    for i in range(5):
+        task_id = f"aa{i:02d}"
+        save_temp(task_id, store(output_key(task_id, "bin")))
+        expire(task_id)
+    sweeper = ExpirySweeper(batch_size=2, max_batches=2)
+    # At most two batches per sweep; the next sweep picks up the rest
+    assert sweeper.sweep_expired()[0] == 4
+    assert sweeper.sweep_expired()[0] == 1
+
+def test_orphans_past_the_grace_period_are_deleted():
+    orphan_input = store(input_key("aa01", "a.png"))
+    queued_input = store(input_key("bb02", "b.png"))
+    enqueue_job("bb02", queued_input, output_key("bb02", "jpg"), "b.png", "jpg")
+    orphan_output = store(output_key("cc03", "jpg"))
+    downloadable = store(output_key("dd04", "jpg"))
+    save_temp("dd04", downloadable)
+
+    sweeper = ExpirySweeper(orphan_grace=GRACE)
+    # Too new to tell whether a job row is still coming
+    assert sweeper.sweep_orphans("input") == (0, 0)
+    later = time.time() + GRACE + 1
+    assert sweeper.sweep_orphans("input", now=later) == (1, 100)
+    assert sweeper.sweep_orphans("output", now=later) == (1, 100)
+    assert not storage.exists(orphan_input) and not storage.exists(orphan_output)
+    assert storage.exists(queued_input) and storage.exists(downloadable)
+
+def test_finished_jobs_past_retention_are_pruned():
+    init_metrics()
+    enqueue_job("aa01", "input/aa01_a.png", "output/aa01.jpg", "a.png", "jpg")
+    claim_job("w1", 60)
+    complete_job("aa01", "w1")
+    enqueue_job("bb02", "input/bb02_b.png", "output/bb02.jpg", "b.png", "jpg")
+    sweeper = ExpirySweeper(job_retention=60)
+
+    assert sweeper.sweep_records()["jobs"] == 0
+    assert sweeper.sweep_records(now=time.time() + 61)["jobs"] == 1
+    assert get_job("aa01") is None
+    # Still queued, however old
+    assert get_job("bb02") is not None
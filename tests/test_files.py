@@ -0,0 +1,76 @@
+import os
+import time
+from app.core.security import key_fingerprint
+from app.services.temp_manager import pool, list_temp
+
+OWN_KEY = key_fingerprint(os.environ["API_KEY"])
+
+def add_rows(rows):
+    """[(task_id, expires_at, api_key_id)] as download rows"""
+    with pool.connection() as conn:
+        conn.executemany("""
+            INSERT INTO temp_downloads (task_id, file_path, expires_at, api_key_id, size_bytes, last_access_at)
+            VALUES (?, ?, ?, ?, 0, 0)
+        """, [(task_id, f"output/{task_id}.txt", expires_at, api_key_id) for task_id, expires_at, api_key_id in rows])
+
+def walk(client, **params):
+    """task_ids of every page in order, and how many pages there were"""
+    task_ids, pages, cursor = [], 0, None
+    while True:
+        response = client.get("/api/files", params={**params, **({"cursor": cursor} if cursor else {})})
+        assert response.status_code == 200, response.text
+        body = response.json()
+        pages += 1
+        assert body["total"] == len(body["files"])
+        task_ids += [file["task_id"] for file in body["files"]]
+        cursor = body["next_cursor"]
+        if cursor is None:
+            return task_ids, pages
+
+def test_pages_cover_every_row_once_latest_expiry_first(client):
+    now = int(time.time())
+    # Several rows share an expiry, so pages have to break ties on task_id
+    add_rows([(f"t{i:02d}", now + 600 + i // 3, OWN_KEY) for i in range(10)])
+    task_ids, pages = walk(client, limit=4)
+    assert pages == 3
+    assert task_ids == sorted(task_ids, key=lambda t: (int(t[1:]) // 3, t), reverse=True)
+    assert sorted(task_ids) == [f"t{i:02d}" for i in range(10)]
+
+def test_rows_added_while_paging_do_not_shift_later_pages(client):
+    now = int(time.time())
+    add_rows([(f"t{i}", now + 600 + i, OWN_KEY) for i in range(6)])
+    first = client.get("/api/files", params={"limit": 3}).json()
+    assert [file["task_id"] for file in first["files"]] == ["t5", "t4", "t3"]
+    add_rows([("new", now + 1000, OWN_KEY)])
+    second = client.get("/api/files", params={"limit": 3, "cursor": first["next_cursor"]}).json()
+    assert [file["task_id"] for file in second["files"]] == ["t2", "t1", "t0"]
+    assert second["next_cursor"] is None
+
+def test_status_filter(client):
+    now = int(time.time())
+    add_rows([("live", now + 600, OWN_KEY), ("gone", now - 600, OWN_KEY)])
+    available = client.get("/api/files", params={"status": "available"}).json()["files"]
+    assert [(file["task_id"], file["status"]) for file in available] == [("live", "available")]
+    assert available[0]["download_url"] == "/api/download/live"
+    expired = client.get("/api/files", params={"status": "expired"}).json()["files"]
+    assert [(file["task_id"], file["download_url"]) for file in expired] == [("gone", None)]
+
+def test_api_key_only_sees_its_own_files(client):
+    now = int(time.time())
+    add_rows([("mine", now + 600, OWN_KEY), ("theirs", now + 601, "someone-else"), ("legacy", now + 602, None)])
+    task_ids, _ = walk(client)
+    assert task_ids == ["mine"]
+    rows, has_more = list_temp(10)
+    assert [row[0] for row in rows] == ["legacy", "theirs", "mine"] and not has_more
+
+def test_check_files(client):
+    add_rows([("missing", int(time.time()) + 600, OWN_KEY)])
+    listed = client.get("/api/files").json()["files"][0]
+    assert listed["file_exists"] is None
+    checked = client.get("/api/files", params={"check_files": True}).json()["files"][0]
+    assert checked["file_exists"] is False and checked["download_url"] is None
+
+def test_bad_parameters(client):
+    assert client.get("/api/files", params={"cursor": "not-a-cursor"}).status_code == 400
+    assert client.get("/api/files", params={"limit": 0}).status_code == 422
+    assert client.get("/api/files", params={"status": "deleted"}).status_code == 422
@@ -0,0 +1,53 @@
+import pytest
+from PIL import Image
+from app.services import image_converter
+from app.services.image_converter import flatten_alpha, convert_image, ImageTooLargeError
+
+PILLOW_DEFAULT_MAX_PIXELS = int(1024 * 1024 * 1024 // 4 // 3)
+
+@pytest.fixture
+def small_limit(monkeypatch):
+    monkeypatch.setattr(image_converter, "MAX_IMAGE_PIXELS", 200_000)
+
+def test_rgba_is_flattened_in_place(monkeypatch):
+    monkeypatch.setattr(image_converter, "STRIP_PIXELS", 1000)  # several strips
+    img = Image.new("RGBA", (100, 50), (255, 0, 0, 0))
+    img.paste((0, 0, 255, 255), (0, 0, 50, 50))
+    img.paste((0, 0, 0, 128), (50, 25, 100, 50))
+    flat = flatten_alpha(img)
+    assert flat is img and flat.mode == "RGBX"
+    assert flat.getpixel((10, 10))[:3] == (0, 0, 255)
+    assert flat.getpixel((60, 10))[:3] == (255, 255, 255)  # transparent -> background
+    assert flat.getpixel((60, 40))[:3] == (127, 127, 127)
+
+@pytest.mark.parametrize("mode, expected", [("LA", "L"), ("P", "RGB")])
+def test_other_alpha_modes_are_flattened_to_a_smaller_copy(mode, expected):
+    img = Image.new("RGBA", (20, 20), (0, 0, 0, 0)).convert(mode)
+    flat = flatten_alpha(img)
+    assert flat.mode == expected
+    assert flat.getpixel((5, 5)) in (255, (255, 255, 255))
+
+def test_transparent_png_to_jpeg(tmp_path):
+    Image.new("RGBA", (64, 64), (0, 128, 0, 255)).save(tmp_path / "in.png")
+    convert_image(str(tmp_path / "in.png"), str(tmp_path / "out.jpg"), "jpg")
+    out = Image.open(tmp_path / "out.jpg")
+    assert out.mode == "RGB" and out.size == (64, 64)
+    assert all(abs(a - b) < 8 for a, b in zip(out.getpixel((32, 32)), (0, 128, 0)))
+
+def test_pillow_bomb_check_is_left_alone():
+    assert Image.MAX_IMAGE_PIXELS == PILLOW_DEFAULT_MAX_PIXELS
+
+def test_images_over_the_limit_fail(tmp_path, small_limit):
+    Image.new("RGB", (800, 800)).save(tmp_path / "big.png")
+    with pytest.raises(ImageTooLargeError, match="megapixel limit"):
+        convert_image(str(tmp_path / "big.png"), str(tmp_path / "out.jpg"), "jpg")
+    with pytest.raises(ImageTooLargeError):
+        convert_image(str(tmp_path / "big.png"), str(tmp_path / "out.jpg"), "jpg", thumbnail=100)
+
+def test_jpeg_over_the_limit_can_still_be_thumbnailed(tmp_path, small_limit):
+    Image.new("RGB", (800, 800), "red").save(tmp_path / "big.jpg")
+    with pytest.raises(ImageTooLargeError):
+        convert_image(str(tmp_path / "big.jpg"), str(tmp_path / "out.png"), "png")
+    # draft() decodes at 1/8 scale, under the limit
+    convert_image(str(tmp_path / "big.jpg"), str(tmp_path / "thumb.png"), "png", thumbnail=100)
+    assert Image.open(tmp_path / "thumb.png").size == (100, 100)
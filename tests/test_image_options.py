@@ -0,0 +1,108 @@
+import pytest
+from PIL import Image
+from app.services.pipeline import resize_options, MAX_RESIZE_EDGE
+from app.services.image_converter import scaled_size, convert_image
+from app.services.image_encoding import encoder_options, save_args, resolve_options, PROFILES
+
+@pytest.mark.parametrize("kwargs, expected", [
+    ({}, None),
+    ({"width": 100}, {"width": 100}),
+    ({"height": 50}, {"height": 50}),
+    # fit changes nothing with one side given, so it is dropped to share cache entries
+    ({"width": 100, "fit": "cover"}, {"width": 100}),
+    ({"width": 100, "height": 50}, {"width": 100, "height": 50, "fit": "contain"}),
+    ({"width": 100, "height": 50, "fit": "cover"}, {"width": 100, "height": 50, "fit": "cover"}),
+    ({"thumbnail": 128}, {"thumbnail": 128}),
+])
+def test_resize_options(kwargs, expected):
+    assert resize_options(**kwargs) == expected
+
+@pytest.mark.parametrize("kwargs, message", [
+    ({"width": 0}, "width must be between"),
+    ({"height": MAX_RESIZE_EDGE + 1}, "height must be between"),
+    ({"thumbnail": -5}, "thumbnail must be between"),
+    ({"width": 10, "height": 10, "fit": "stretch"}, "fit must be one of"),
+    ({"thumbnail": 64, "width": 10}, "can't be combined"),
+    ({"fit": "cover"}, "fit needs width and height"),
+])
+def test_invalid_resize_options(kwargs, message):
+    with pytest.raises(ValueError, match=message):
+        resize_options(**kwargs)
+
+@pytest.mark.parametrize("kwargs, expected", [
+    ({"width": 100}, (100, 50)),
+    ({"height": 100}, (200, 100)),
+    ({"width": 100, "height": 100, "fit": "contain"}, (100, 50)),
+    ({"width": 100, "height": 100, "fit": "cover"}, (200, 100)),
+    ({"width": 100, "height": 100, "fit": "fill"}, (100, 100)),
+    ({"thumbnail": 50}, (50, 25)),
+    ({"thumbnail": 1000}, (400, 200)),  # never enlarged
+])
+def test_scaled_size(kwargs, expected):
+    assert scaled_size((400, 200), **kwargs) == expected
+
+def test_cover_is_cropped_to_the_box(tmp_path):
+    source = tmp_path / "wide.png"
+    Image.new("RGB", (400, 200), "red").save(source)
+    convert_image(str(source), str(tmp_path / "out.jpg"), "jpg", width=100, height=100, fit="cover")
+    assert Image.open(tmp_path / "out.jpg").size == (100, 100)
+
+def test_api_rejects_invalid_resize(client, png_bytes):
+    response = client.post("/api/convert", params={"target_format": "jpg", "width": 0},
+                           files={"file": ("photo.png", png_bytes, "image/png")})
+    assert response.status_code == 400
+    assert "width must be between" in response.json()["detail"]
+    response = client.post("/api/convert", params={"target_format": "jpg", "fit": "zoom", "width": 5, "height": 5},
+                           files={"file": ("photo.png", png_bytes, "image/png")})
+    assert response.status_code == 422
+
+def test_api_rejects_resize_for_non_images(client):
+    response = client.post("/api/convert", params={"target_format": "docx", "width": 100},
+                           files={"file": ("notes.txt", b"hello", "text/plain")})
+    assert response.status_code == 400
+    assert "only supported for image" in response.json()["detail"]
+
+@pytest.mark.parametrize("kwargs, expected", [
+    ({}, None),
+    ({"quality": None, "method": None}, None),
+    ({"profile": "smallest"}, {"profile": "smallest"}),
+    ({"quality": 90, "subsampling": "4:4:4"}, {"quality": 90, "subsampling": "4:4:4"}),
+    ({"profile": "fast", "compress_level": 0}, {"profile": "fast", "compress_level": 0}),
+])
+def test_encoder_options(kwargs, expected):
+    assert encoder_options(**kwargs) == expected
+
+@pytest.mark.parametrize("kwargs, message", [
+    ({"profile": "tiny"}, "profile must be one of"),
+    ({"quality": 0}, "quality must be between 1 and 100"),
+    ({"quality": 101}, "quality must be between"),
+    ({"compress_level": 10}, "compress_level must be between 0 and 9"),
+    ({"method": 7}, "method must be between 0 and 6"),
+    ({"subsampling": "4:1:1"}, "subsampling must be one of"),
+    ({"compression": "zip"}, "compression must be one of"),
+])
+def test_invalid_encoder_options(kwargs, message):
+    with pytest.raises(ValueError, match=message):
+        encoder_options(**kwargs)
+
+def test_knobs_override_the_profile_for_their_formats_only():
+    assert save_args("JPEG", "fast", quality=90) == {**PROFILES["fast"]["JPEG"], "quality": 90}
+    assert save_args("PNG", "fast", quality=90) == PROFILES["fast"]["PNG"]
+    assert save_args("TIFF", "smallest", compression="none") == {"compression": None}
+    assert save_args("BMP", "smallest") == {}
+
+def test_resolve_options_keys_cache_entries_on_the_output():
+    # The default profile is filled in, so asking for it by name is the same job
+    assert resolve_options(None, "jpg") == resolve_options({"profile": "balanced"}, "JPG") == {"profile": "balanced"}
+    # Knobs for other formats, or that repeat the profile, don't change the output
+    assert resolve_options({"compress_level": 1, "quality": 75}, "jpg") == {"profile": "balanced"}
+    assert resolve_options({"quality": 90, "width": 10}, "webp") == {"quality": 90, "width": 10, "profile": "balanced"}
+    # Nothing to tune: only resize options are kept
+    assert resolve_options({"profile": "smallest", "width": 10}, "bmp") == {"width": 10}
+    assert resolve_options({"width": 10}, "docx") == {"width": 10}
+
+def test_api_rejects_invalid_encoder_options(client, png_bytes):
+    for params, status in (({"quality": 0}, 400), ({"compression": "zip"}, 400), ({"profile": "tiny"}, 422)):
+        response = client.post("/api/convert", params={"target_format": "jpg", **params},
+                               files={"file": ("photo.png", png_bytes, "image/png")})
+        assert response.status_code == status, params
@@ -0,0 +1,57 @@
+import asyncio
+from app.api.events import _event_stream, _snapshot
+from app.services import job_events
+from app.services.job_events import JobEventBroadcaster
+from app.services.job_queue import enqueue_job, claim_job, complete_job, get_job, latest_event_seq
+
+def running_job(task_id="job1"):
+    enqueue_job(task_id, f"input/{task_id}_a.png", f"output/{task_id}.jpg", "a.png", "jpg")
+    claim_job("w1", 60)
+
+async def collect(stream):
+    return [chunk async for chunk in stream]
+
+def test_stream_ends_after_the_terminal_event():
+    running_job()
+    broadcaster = JobEventBroadcaster()
+    broadcaster.last_seq = latest_event_seq()
+
+    async def scenario():
+        queue = broadcaster.subscribe(task_id="job1")
+        stream = _event_stream(queue, first=_snapshot(get_job("job1")),
+                               unsubscribe=lambda: broadcaster.unsubscribe(queue, task_id="job1"))
+        complete_job("job1", "w1")
+        assert await broadcaster.poll_once() == 1
+        return await asyncio.wait_for(collect(stream), timeout=5)
+
+    chunks = asyncio.run(scenario())
+    assert [line for chunk in chunks for line in chunk.split("\n") if line.startswith("event:")] == [
+        "event: running", "event: completed"]
+    assert not broadcaster.by_task
+
+def test_subscriber_during_idle_seq_refresh_gets_later_events(monkeypatch):
+    running_job()
+    broadcaster = JobEventBroadcaster(interval=0.01)
+    calls = []
+
+    def racing_latest_event_seq():
+        # The first refresh with nobody listening races a subscriber and the job finishing
+        calls.append(1)
+        if len(calls) == 2:
+            broadcaster.subscribe(task_id="job1")
+            complete_job("job1", "w1")
+        return latest_event_seq()
+    monkeypatch.setattr(job_events, "latest_event_seq", racing_latest_event_seq)
+
+    async def scenario():
+        broadcaster.start()
+        try:
+            while not broadcaster.by_task:
+                await asyncio.sleep(0.01)
+            queue = next(iter(broadcaster.by_task["job1"]))
+            return await asyncio.wait_for(queue.get(), timeout=5)
+        finally:
+            broadcaster.stop()
+
+    event = asyncio.run(scenario())
+    assert (event["task_id"], event["state"]) == ("job1", "completed")
@@ -0,0 +1,109 @@
+import time
+import pytest
+from app.core.config import JOB_MAX_ATTEMPTS
+from app.services import job_queue
+from app.services.job_queue import (enqueue_job, claim_job, complete_job, fail_job, defer_job, renew_lease, get_job,
+                                    count_jobs)
+
+@pytest.fixture
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(job_queue, "JOB_RETRY_BACKOFF_SECONDS", 0)
+
+def enqueue(task_id, **kwargs):
+    enqueue_job(task_id, f"input/{task_id}_a.png", f"output/{task_id}.jpg", "a.png", "jpg", **kwargs)
+
+def test_claim_takes_oldest_runnable_job():
+    enqueue("first")
+    enqueue("second")
+    job = claim_job("w1", 60)
+    assert job["task_id"] == "first"
+    assert job["status"] == "running" and job["attempts"] == 1 and job["lease_owner"] == "w1"
+    assert claim_job("w2", 60)["task_id"] == "second"
+    assert claim_job("w3", 60) is None
+
+def test_complete_only_by_lease_owner():
+    enqueue("t1")
+    claim_job("w1", 60)
+    complete_job("t1", "w2")
+    assert get_job("t1")["status"] == "running"
+    complete_job("t1", "w1")
+    job = get_job("t1")
+    assert job["status"] == "completed" and job["lease_owner"] is None and job["finished_at"]
+
+def test_expired_lease_is_reclaimed_by_another_worker():
+    enqueue("t1")
+    claim_job("w1", -1)  # lease already expired, as if w1 died
+    job = claim_job("w2", 60)
+    assert job["task_id"] == "t1" and job["attempts"] == 2 and job["lease_owner"] == "w2"
+    # w1 lost the job, so its late outcome is ignored
+    assert fail_job("t1", "w1", "late") is None
+    assert get_job("t1")["lease_owner"] == "w2"
+
+def test_renewed_lease_is_not_reclaimed():
+    enqueue("t1")
+    claim_job("w1", 1)
+    renew_lease(["t1"], "w1", 60)
+    assert get_job("t1")["lease_expires_at"] > time.time() + 30
+    assert claim_job("w2", 60) is None
+
+def test_abandoned_job_out_of_attempts_fails():
+    enqueue("t1")
+    for attempt in range(JOB_MAX_ATTEMPTS):
+        claim_job(f"w{attempt}", -1)
+    assert claim_job("w-last", 60) is None
+    job = get_job("t1")
+    assert job["status"] == "failed" and job["error"] == "Worker lease expired"
+
+def test_failed_attempt_is_retried_after_backoff():
+    enqueue("t1")
+    claim_job("w1", 60)
+    assert fail_job("t1", "w1", "boom") == "queued"
+    job = get_job("t1")
+    assert job["status"] == "queued" and job["error"] == "boom" and job["available_at"] > time.time()
+    assert claim_job("w1", 60) is None  # not due yet
+
+def test_retries_stop_after_max_attempts(no_backoff):
+    enqueue("t1")
+    statuses = []
+    for _ in range(JOB_MAX_ATTEMPTS):
+        claim_job("w1", 60)
+        statuses.append(fail_job("t1", "w1", "boom"))
+    assert statuses == ["queued"] * (JOB_MAX_ATTEMPTS - 1) + ["failed"]
+    assert get_job("t1")["status"] == "failed"
+    assert claim_job("w1", 60) is None
+
+def test_permanent_failure_is_not_retried():
+    enqueue("t1")
+    claim_job("w1", 60)
+    assert fail_job("t1", "w1", "Unsupported conversion", retry=False) == "failed"
+    job = get_job("t1")
+    assert job["attempts"] == 1 and job["finished_at"]
+
+def test_defer_gives_the_attempt_back():
+    enqueue("t1")
+    claim_job("w1", 60)
+    assert defer_job("t1", "w1", 0, "Waiting for output storage space")
+    assert get_job("t1")["attempts"] == 0
+    assert claim_job("w2", 60)["attempts"] == 1
+    assert not defer_job("t1", "w1", 0, "not the owner")
+
+def test_count_jobs_separates_batches():
+    enqueue("single")
+    enqueue("in-batch", batch_id="b1")
+    assert count_jobs("queued") == 2
+    assert count_jobs("queued", batch=False) == 1
+    assert count_jobs("queued", batch=True) == 1
+
+def test_crashed_worker_process_names_the_error():
+    from concurrent.futures import Future
+    from concurrent.futures.process import BrokenProcessPool
+    from app.services.job_dispatcher import JobDispatcher
+    dispatcher = JobDispatcher(executor=None)
+    enqueue("job1")
+    claim_job(dispatcher.worker_id, 60)
+    future = Future()
+    # Exceptions without a message used to leave the error blank
+    future.set_exception(BrokenProcessPool())
+    dispatcher._job_done("job1", future)
+    job = get_job("job1")
+    assert job["status"] == "queued" and job["error"] == "Conversion worker crashed: BrokenProcessPool"
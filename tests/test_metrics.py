@@ -0,0 +1,47 @@
+from app.services.pipeline import plan_conversion
+
+def scrape(client):
+    """{series with labels: value} from /metrics"""
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    series = {}
+    for line in response.text.splitlines():
+        if line and not line.startswith("#"):
+            name, value = line.rsplit(" ", 1)
+            series[name] = float(value)
+    return response.text, series
+
+def test_stage_counters_and_gauges_carry_their_labels(client, png_bytes):
+    _, before = scrape(client)
+    client.post("/api/convert", params={"target_format": "jpg", "sync": True},
+                files={"file": ("photo.png", png_bytes, "image/png")})
+    client.post("/api/convert", params={"target_format": "webp"},
+                files={"file": ("photo.png", png_bytes, "image/png")})
+    text, after = scrape(client)
+
+    def grew(series, by=1):
+        return after[series] - before.get(series, 0) == by
+
+    converter = plan_conversion("photo.png", "jpg")[0].name
+    # Labels are sorted by name, le last
+    inline = f'converter="{converter}",source="png",stage="inline",target="jpg"'
+    assert grew(f"nodeblack_stage_duration_seconds_count{{{inline}}}")
+    assert grew(f'nodeblack_stage_duration_seconds_bucket{{{inline},le="+Inf"}}')
+    assert f"nodeblack_stage_duration_seconds_sum{{{inline}}}" in after
+    assert grew('nodeblack_stage_duration_seconds_count{converter="",source="png",stage="upload",target="webp"}')
+    assert grew('nodeblack_upload_bytes_total{source="png"}', 2 * len(png_bytes))
+
+    assert after["nodeblack_queue_depth"] == 1
+    assert after['nodeblack_storage_bytes{area="input"}'] == len(png_bytes)
+    assert "# TYPE nodeblack_stage_duration_seconds histogram" in text
+    assert "# TYPE nodeblack_jobs_total counter" in text
+
+def test_histogram_buckets_are_cumulative(client, png_bytes):
+    client.post("/api/convert", params={"target_format": "jpg", "sync": True},
+                files={"file": ("photo.png", png_bytes, "image/png")})
+    _, series = scrape(client)
+    converter = plan_conversion("photo.png", "jpg")[0].name
+    prefix = f'nodeblack_stage_duration_seconds_bucket{{converter="{converter}",source="png",stage="inline",target="jpg",le='
+    buckets = [value for name, value in series.items() if name.startswith(prefix)]
+    assert buckets == sorted(buckets) and buckets[-1] > 0
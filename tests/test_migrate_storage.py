@@ -0,0 +1,51 @@
+import os
+from app.migrate_storage import migrate
+from app.services.job_queue import enqueue_job, get_job
+from app.services.storage import storage, input_key, output_key
+from app.services.temp_manager import pool, save_temp, get_temp
+
+TASK_IDS = ["aabb0001", "aabb0002", "ccdd0003"]
+
+def store(key, data=b"data"):
+    with open(storage.staging_path(key), "wb") as f:
+        f.write(data)
+    return key
+
+def flat_tree():
+    """Objects and rows as versions before sharding stored them"""
+    for task_id in TASK_IDS:
+        store(f"output/{task_id}.txt")
+        save_temp(task_id, f"output/{task_id}.txt")
+    store("input/ccdd0003_notes.txt")
+    enqueue_job("ccdd0003", "input/ccdd0003_notes.txt", "output/ccdd0003.txt", "notes.txt", "txt")
+    # The oldest rows hold full local paths
+    with pool.connection() as conn:
+        conn.execute("UPDATE temp_downloads SET file_path=? WHERE task_id='aabb0001'",
+                     (os.path.join(storage.root, "output/aabb0001.txt"),))
+
+def test_dry_run_moves_nothing(capsys):
+    flat_tree()
+    assert migrate(dry_run=True) == 4
+    assert "output/aabb0002.txt -> output/aa/bb/aabb0002.txt" in capsys.readouterr().out
+    assert storage.exists("output/aabb0002.txt")
+    assert get_temp("aabb0002")[0] == "output/aabb0002.txt"
+
+def test_flat_objects_and_their_rows_move_into_shards():
+    flat_tree()
+    assert migrate(batch_size=2) == 4
+    assert sorted(key for key, _, _ in storage.list("")) == [
+        input_key("ccdd0003", "notes.txt"),
+        *sorted(output_key(task_id, "txt") for task_id in TASK_IDS)]
+    for task_id in TASK_IDS:
+        assert get_temp(task_id)[0] == output_key(task_id, "txt")
+    job = get_job("ccdd0003")
+    assert (job["input_path"], job["output_path"]) == (input_key("ccdd0003", "notes.txt"), output_key("ccdd0003", "txt"))
+    # Nothing left to do the second time
+    assert migrate() == 0
+
+def test_downloads_keep_working_during_the_move(client):
+    flat_tree()
+    # Objects moved but rows not yet renamed, as between the steps of a batch
+    storage.move("output/aabb0002.txt", output_key("aabb0002", "txt"))
+    response = client.get("/api/download/aabb0002")
+    assert response.status_code == 200 and response.content == b"data"
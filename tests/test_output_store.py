@@ -0,0 +1,83 @@
+import os
+import time
+import pytest
+from app.services.output_store import OutputStore
+from app.services.storage import storage, output_key
+from app.services.temp_manager import save_temp, touch_temp, output_usage, get_temp
+from app.services.job_queue import enqueue_job, claim_job
+
+def save_output(task_id, size, accessed_at):
+    key = output_key(task_id, "bin")
+    with open(storage.staging_path(key), "wb") as f:
+        f.write(b"x" * size)
+    save_temp(task_id, key)
+    touch_temp({task_id: {"last_access_at": accessed_at}})
+    return key
+
+def test_usage_follows_download_rows():
+    save_output("aa01", 100, 1)
+    save_output("bb02", 250, 2)
+    assert output_usage() == 350
+
+def test_reserve_evicts_least_recently_downloaded():
+    store = OutputStore(quota=1000, min_free=0)
+    now = time.time()
+    old = save_output("aa01", 400, now - 30)
+    recent = save_output("bb02", 400, now - 10)
+    middle = save_output("cc03", 100, now - 20)
+
+    assert store.reserve(300)
+    # 900 used + 300 needed is 200 over: the oldest download alone frees enough
+    assert not storage.exists(old)
+    assert get_temp("aa01") is None
+    assert storage.exists(recent) and storage.exists(middle)
+    assert output_usage() == 500
+
+def test_no_eviction_when_it_fits():
+    store = OutputStore(quota=1000, min_free=0)
+    key = save_output("aa01", 400, time.time())
+    assert store.reserve(600)
+    assert storage.exists(key)
+
+def test_running_jobs_count_against_the_quota():
+    store = OutputStore(quota=1000, min_free=0)
+    enqueue_job("job1", "input/job1_a.png", "output/job1.bmp", "a.png", "bmp", estimated_bytes=900)
+    claim_job("w1", 60)
+    # Nothing stored to evict, and the running job's estimate leaves no room
+    assert not store.reserve(200)
+    # The running job itself doesn't wait on its own reservation
+    assert store.reserve(900, "job1")
+
+def test_fits_ever():
+    store = OutputStore(quota=1000, min_free=0)
+    save_output("aa01", 800, time.time())
+    assert store.fits_ever(1000)
+    assert not store.fits_ever(1001)
+
+def test_estimate_is_pessimistic_for_uncompressed_targets():
+    store = OutputStore(quota=1000, min_free=0)
+    assert store.estimate(100, "BMP") > store.estimate(100, "jpg") >= 100
+
+def test_outputs_shared_with_the_result_cache_free_nothing(tmp_path):
+    store = OutputStore(quota=1000, min_free=0)
+    now = time.time()
+    shared = save_output("aa01", 400, now - 20)
+    os.link(storage.local_path(shared), tmp_path / "cached.bin")
+    alone = save_output("bb02", 300, now - 10)
+    # The shared output goes first but stays on disk, so the next one is evicted too
+    assert store.evict(100) == 300
+    assert not storage.exists(shared) and not storage.exists(alone)
+    assert (tmp_path / "cached.bin").stat().st_size == 400
+
+def test_failed_conversion_leaves_no_partial_output():
+    key = output_key("aa01", "bin")
+    with pytest.raises(RuntimeError):
+        with storage.writable_path(key) as path:
+            with open(path, "wb") as f:
+                f.write(b"half")
+            raise RuntimeError("converter crashed")
+    assert not storage.exists(key)
+    with storage.writable_path(key) as path:
+        with open(path, "wb") as f:
+            f.write(b"whole")
+    assert storage.stat(key)[0] == 5
@@ -0,0 +1,105 @@
+import gzip
+import hashlib
+import os
+from app.services import result_cache, precompress
+from app.services.precompress import write_variants
+from app.services.result_cache import make_cache_key, lookup, store
+from app.services.job_queue import claim_job, get_job
+from app.services.pipeline import run_job
+from app.services.storage import storage, input_key
+
+def test_key_depends_on_content_target_and_options():
+    key = make_cache_key("abc", "jpg", {"profile": "fast"})
+    assert key == make_cache_key("abc", "JPG", {"profile": "fast"})
+    assert key != make_cache_key("abd", "jpg", {"profile": "fast"})
+    assert key != make_cache_key("abc", "png", {"profile": "fast"})
+    assert key != make_cache_key("abc", "jpg", {"profile": "smallest"})
+
+def test_lookup_hit_and_miss(tmp_path):
+    output = tmp_path / "out.jpg"
+    output.write_bytes(b"converted")
+    store("k1", str(output))
+
+    assert lookup("k1", str(tmp_path / "hit.jpg")) == {}
+    assert (tmp_path / "hit.jpg").read_bytes() == b"converted"
+    assert lookup("k2", str(tmp_path / "miss.jpg")) is None
+    assert not (tmp_path / "miss.jpg").exists()
+
+def test_lookup_forgets_entries_whose_object_is_gone(tmp_path):
+    output = tmp_path / "out.jpg"
+    output.write_bytes(b"converted")
+    store("k1", str(output))
+    storage.delete(result_cache._cache_object_key("k1", ".jpg"))
+
+    assert lookup("k1", str(tmp_path / "hit.jpg")) is None
+    assert result_cache.cache_stats()["entries"] == 0
+
+TEXT = b"id,name\n" + b"".join(b"%d,item %d\n" % (i, i) for i in range(500))
+
+def cached_text_output(tmp_path, cache_key):
+    output = tmp_path / "out.json"
+    output.write_bytes(TEXT)
+    variants = write_variants(str(output))
+    assert "gzip" in variants
+    store(cache_key, str(output), variants)
+
+def test_variants_are_cached_with_the_output(tmp_path):
+    cached_text_output(tmp_path, "k1")
+    dest = tmp_path / "hit.json"
+    variants = lookup("k1", str(dest))
+    assert variants["gzip"] == str(dest) + ".gz"
+    assert gzip.decompress((tmp_path / "hit.json.gz").read_bytes()) == TEXT
+    assert result_cache.size_bytes() == len(TEXT) + sum(os.path.getsize(path) for path in variants.values())
+
+def test_missing_variant_drops_the_whole_entry(tmp_path):
+    cached_text_output(tmp_path, "k1")
+    storage.delete(result_cache._cache_object_key("k1", ".json") + ".gz")
+    dest = tmp_path / "hit.json"
+    assert lookup("k1", str(dest)) is None
+    assert not dest.exists()
+    assert not storage.exists(result_cache._cache_object_key("k1", ".json"))
+
+def test_cache_hit_serves_stored_variants_without_compressing(client, tmp_path, monkeypatch):
+    cached_text_output(tmp_path, make_cache_key(hashlib.sha256(b"id,name\n1,a\n").hexdigest(), "json"))
+
+    def no_compression(src, dest):
+        raise AssertionError("a cache hit compressed its output again")
+    monkeypatch.setitem(precompress.COMPRESSORS, "gzip", no_compression)
+    response = client.post("/api/convert", params={"target_format": "json"},
+                           files={"file": ("data.csv", b"id,name\n1,a\n", "text/csv")})
+    assert response.json()["cached"] is True
+    download = client.get(f"/api/download/{response.json()['task_id']}", headers={"Accept-Encoding": "gzip"})
+    assert download.headers["Content-Encoding"] == "gzip"
+    assert download.content == TEXT
+
+def convert(client, png_bytes, **params):
+    response = client.post("/api/convert", params={"target_format": "jpg", **params},
+                           files={"file": ("photo.png", png_bytes, "image/png")})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+def test_same_upload_is_served_from_cache(client, png_bytes):
+    first = convert(client, png_bytes)
+    assert "cached" not in first
+    job = claim_job("test-worker", 60)
+    assert job["task_id"] == first["task_id"]
+    run_job(job, "test-worker")
+    assert get_job(first["task_id"])["status"] == "completed"
+
+    second = convert(client, png_bytes)
+    assert second["cached"] is True
+    assert claim_job("test-worker", 60) is None  # nothing was queued
+    assert client.get(f"/api/status/{second['task_id']}").json()["status"] == "ready"
+    downloads = [client.get(f"/api/download/{result['task_id']}").content for result in (first, second)]
+    assert downloads[0] == downloads[1] and downloads[0][:2] == b"\xff\xd8"
+    # The upload of a cache hit is not kept around
+    assert not storage.exists(input_key(second["task_id"], "photo.png"))
+
+def test_different_options_miss_the_cache(client, png_bytes):
+    convert(client, png_bytes)
+    run_job(claim_job("test-worker", 60), "test-worker")
+
+    assert "cached" not in convert(client, png_bytes, width=32)
+    assert "cached" not in convert(client, png_bytes, profile="smallest")
+    # The server's default profile is spelled out in the key, so naming it still hits
+    assert convert(client, png_bytes, profile="balanced")["cached"] is True
@@ -0,0 +1,80 @@
+import pytest
+from app.services.converter_registry import ConverterRegistry
+from app.services.job_queue import get_job
+from app.services.pipeline import registry, plan_conversion, job_options, resize_options
+
+def convert(input_path, output_path):
+    pass
+
+def make_registry():
+    registry = ConverterRegistry()
+    registry.register(["pdf"], ["docx"], convert, "documents", cost=5.0)
+    registry.register(["docx"], ["txt", "pptx"], convert, "documents", cost=0.5)
+    registry.register(["txt"], ["pptx"], convert, "documents", cost=0.5)
+    registry.register(["wav"], ["mp3"], convert, "audio", cost=3.0, available=False)
+    return registry
+
+def route_of(route):
+    return [(converter.source, converter.target) for converter in route]
+
+def test_direct_converter_is_one_hop():
+    assert route_of(make_registry().plan_route("pdf", "docx")) == [("pdf", "docx")]
+
+def test_multi_hop_route_through_intermediate_format():
+    assert route_of(make_registry().plan_route("PDF", "txt")) == [("pdf", "docx"), ("docx", "txt")]
+
+def test_cheapest_route_wins_and_direct_beats_equal_chain():
+    registry = make_registry()
+    # docx->pptx directly (0.5) beats docx->txt->pptx (1.0 plus a hop)
+    assert route_of(registry.plan_route("docx", "pptx")) == [("docx", "pptx")]
+    registry.converters[("docx", "pptx")].cost = 10.0
+    assert route_of(registry.plan_route("docx", "pptx")) == [("docx", "txt"), ("txt", "pptx")]
+
+def test_no_route():
+    registry = make_registry()
+    assert registry.plan_route("txt", "pdf") is None
+    assert registry.plan_route("pdf", "txt", max_hops=1) is None
+
+def test_unavailable_converter_is_not_planned():
+    registry = make_registry()
+    assert registry.plan_route("wav", "mp3") is None
+    assert "not available" in registry.unavailable_reason("wav", "mp3")
+
+def test_plan_conversion_rejects_unsupported_pairs():
+    assert route_of(plan_conversion("photo.PNG", "JPG")) == [("png", "jpg")]
+    with pytest.raises(ValueError, match="Unsupported conversion"):
+        plan_conversion("photo.png", "exe")
+    with pytest.raises(ValueError):
+        plan_conversion("no-extension", "jpg")
+
+def test_plan_conversion_only_takes_options_for_images():
+    assert plan_conversion("photo.png", "webp", resize_options(width=100))
+    with pytest.raises(ValueError, match="only supported for image"):
+        plan_conversion("notes.txt", "docx", resize_options(width=100))
+
+@pytest.fixture
+def video_available(monkeypatch):
+    for converter in registry.converters.values():
+        if converter.category == "video":
+            monkeypatch.setattr(converter, "available", True)
+
+def test_image_route_gets_resolved_encoder_options():
+    route = plan_conversion("photo.png", "jpg")
+    assert job_options(route, "jpg") == {"profile": "balanced"}
+    assert job_options(route, "jpg", {"width": 10}) == {"width": 10, "profile": "balanced"}
+
+def test_mixed_category_route_takes_no_encoder_options(video_available):
+    route = plan_conversion("clip.mp4", "png")
+    assert [(converter.source, converter.target, converter.category) for converter in route] == [
+        ("mp4", "gif", "video"), ("gif", "png", "images")]
+    options = job_options(route, "png")
+    assert options is None
+    # What the worker does with the stored job
+    assert plan_conversion("clip.mp4", "png", options) == route
+
+def test_mixed_category_upload_is_queued_without_options(client, video_available):
+    response = client.post("/api/convert", params={"target_format": "png"},
+                           files={"file": ("clip.mp4", b"not really a video", "video/mp4")})
+    assert response.status_code == 200, response.text
+    job = get_job(response.json()["task_id"])
+    assert job["status"] == "queued" and job["options"] is None
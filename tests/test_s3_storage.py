@@ -0,0 +1,66 @@
+import pytest
+from app.services.storage import Storage, S3Storage
+
+@pytest.fixture
+def s3(monkeypatch):
+    moto = pytest.importorskip("moto")
+    for name, value in (("AWS_ACCESS_KEY_ID", "testing"), ("AWS_SECRET_ACCESS_KEY", "testing"),
+                        ("AWS_DEFAULT_REGION", "us-east-1")):
+        monkeypatch.setenv(name, value)
+    with moto.mock_aws():
+        store = S3Storage(bucket="nodeblack", prefix="files/", endpoint_url=None, region="us-east-1")
+        store.client.create_bucket(Bucket="nodeblack")
+        yield store
+
+def put_bytes(store, key, data, tmp_path):
+    path = tmp_path / "upload"
+    path.write_bytes(data)
+    store.put(key, str(path))
+    assert not path.exists()
+
+def test_put_stat_and_open_ranges(s3, tmp_path):
+    put_bytes(s3, "output/ab/cd/abcd.txt", b"0123456789", tmp_path)
+    assert s3.stat("output/ab/cd/abcd.txt")[0] == 10
+    assert s3.client.head_object(Bucket="nodeblack", Key="files/output/ab/cd/abcd.txt")["ContentLength"] == 10
+    assert s3.open("output/ab/cd/abcd.txt").read() == b"0123456789"
+    assert s3.open("output/ab/cd/abcd.txt", 2, 3).read() == b"234"
+    assert s3.open("output/ab/cd/abcd.txt", 7).read() == b"789"
+    with s3.local_copy("output/ab/cd/abcd.txt") as path:
+        assert open(path, "rb").read() == b"0123456789"
+
+def test_missing_objects(s3, tmp_path):
+    with pytest.raises(FileNotFoundError):
+        s3.stat("output/nothing.txt")
+    with pytest.raises(FileNotFoundError):
+        s3.open("output/nothing.txt")
+    with pytest.raises(FileNotFoundError):
+        s3.fetch("output/nothing.txt", str(tmp_path / "nothing.txt"))
+    assert not s3.exists("output/nothing.txt")
+    assert s3.delete("output/nothing.txt") is None
+
+def test_delete_move_and_list(s3, tmp_path):
+    put_bytes(s3, "input/ab/cd/abcd_a.png", b"aaaa", tmp_path)
+    put_bytes(s3, "output/abcd.png", b"bb", tmp_path)
+    assert sorted((key, size) for key, size, _ in s3.list("output/")) == [("output/abcd.png", 2)]
+
+    s3.move("output/abcd.png", "output/ab/cd/abcd.png")
+    # Flat keys stored before sharding still find the object
+    assert s3.locate("output/abcd.png") == ("output/ab/cd/abcd.png", 2)
+    assert s3.delete("output/ab/cd/abcd.png") == 2
+    assert [key for key, _, _ in s3.list("")] == ["input/ab/cd/abcd_a.png"]
+
+def test_writable_path_stores_what_was_written(s3):
+    with s3.writable_path("output/ab/cd/abcd.txt") as path:
+        with open(path, "wb") as f:
+            f.write(b"converted")
+    assert s3.open("output/ab/cd/abcd.txt").read() == b"converted"
+
+def test_backends_implement_the_whole_interface():
+    with pytest.raises(TypeError):
+        Storage()
+
+    class Partial(Storage):
+        def put(self, key, path):
+            pass
+    with pytest.raises(TypeError):
+        Partial()
@@ -0,0 +1,49 @@
+import time
+from app.services import job_queue
+from app.services.job_queue import enqueue_job, claim_job, complete_job, fail_job
+from app.services.storage import storage, output_key
+from app.services.temp_manager import save_temp
+
+def enqueue(task_id, **kwargs):
+    enqueue_job(task_id, f"input/{task_id}_a.png", output_key(task_id, "jpg"), "a.png", "jpg", **kwargs)
+
+def status(client, task_id):
+    return client.get(f"/api/status/{task_id}").json()
+
+def test_status_follows_the_job_through_its_states(client):
+    enqueue("job1", received_at=time.time() - 1)
+    queued = status(client, "job1")
+    assert (queued["state"], queued["status"], queued["attempts"]) == ("queued", "queued", 0)
+    assert queued["timings"]["started_at"] is None and "queue_seconds" not in queued["timings"]
+
+    claim_job("w1", 60)
+    running = status(client, "job1")
+    assert (running["state"], running["status"]) == ("running", "processing")
+    assert running["timings"]["queue_seconds"] >= 1
+
+    with open(storage.staging_path(output_key("job1", "jpg")), "wb") as f:
+        f.write(b"converted")
+    save_temp("job1", output_key("job1", "jpg"))
+    complete_job("job1", "w1")
+    ready = status(client, "job1")
+    assert (ready["state"], ready["status"]) == ("completed", "ready")
+    assert ready["download_url"] == "/api/download/job1"
+    assert ready["timings"]["run_seconds"] >= 0
+
+def test_retries_and_failures_report_the_error(client, monkeypatch):
+    monkeypatch.setattr(job_queue, "JOB_RETRY_BACKOFF_SECONDS", 0)
+    enqueue("job1")
+    claim_job("w1", 60)
+    fail_job("job1", "w1", "ffmpeg exited with 1")
+    retrying = status(client, "job1")
+    assert retrying["status"] == "queued" and retrying["message"] == "Retrying after error: ffmpeg exited with 1"
+
+    claim_job("w1", 60)
+    fail_job("job1", "w1", "unreadable file", retry=False)
+    failed = status(client, "job1")
+    assert (failed["status"], failed["error"], failed["attempts"]) == ("failed", "unreadable file", 2)
+
+def test_completed_job_without_a_download_has_expired(client):
+    enqueue("job1", status="completed")
+    assert status(client, "job1")["status"] == "expired"
+    assert status(client, "missing")["status"] == "not_found"
@@ -0,0 +1,45 @@
+import sqlite3
+import pytest
+from app.services import temp_manager
+from app.services.temp_manager import ConnectionPool, LRUCache
+from app.services.job_queue import enqueue_job, claim_job, fail_job, get_job_status, _finished_status_cache
+
+def test_pool_reuses_wal_connections_and_rolls_back_on_error(tmp_path):
+    pool = ConnectionPool(str(tmp_path / "pool.db"), size=1)
+    with pool.connection() as conn:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        conn.execute("CREATE TABLE t (x INTEGER)")
+    with pool.connection() as again:
+        assert again is conn
+    with pytest.raises(sqlite3.IntegrityError):
+        with pool.connection() as conn:
+            conn.execute("INSERT INTO t VALUES (1)")
+            raise sqlite3.IntegrityError("boom")
+    with pool.connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 0
+        # Only size connections stay open; extra ones are closed after use
+        with pool.connection() as extra:
+            assert extra is not conn
+    assert len(pool.idle) == 1
+
+def test_lru_cache_evicts_least_recently_used_and_expires(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(temp_manager.time, "monotonic", lambda: now[0])
+    cache = LRUCache(2, ttl=10)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("b") is None and cache.get("a") == 1 and cache.get("c") == 3
+    now[0] += 11
+    assert cache.get("a") is None
+    assert LRUCache(0).get("a") is None
+
+def test_only_finished_job_status_is_cached():
+    enqueue_job("job1", "input/job1_a.png", "output/job1.jpg", "a.png", "jpg")
+    assert get_job_status("job1")["status"] == "queued"
+    assert _finished_status_cache.get("job1") is None
+    claim_job("w1", 60)
+    fail_job("job1", "w1", "broken", retry=False)
+    assert get_job_status("job1")["status"] == "failed"
+    assert _finished_status_cache.get("job1")["error"] == "broken"
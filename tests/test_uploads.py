@@ -0,0 +1,41 @@
+import functools
+import hashlib
+import io
+import pytest
+from app.api import convert
+from app.services.uploads import save_upload, hash_file, UploadTooLargeError
+from app.services.storage import storage
+
+class CountingReader(io.BytesIO):
+    """BytesIO that records how much was read from it"""
+
+    def __init__(self, data):
+        super().__init__(data)
+        self.consumed = 0
+
+    def read(self, size=-1):
+        chunk = super().read(size)
+        self.consumed += len(chunk)
+        return chunk
+
+def test_upload_is_streamed_and_hashed(tmp_path):
+    data = bytes(range(256)) * 40
+    size, digest = save_upload(io.BytesIO(data), tmp_path / "upload", chunk_size=1000)
+    assert size == len(data) and digest == hashlib.sha256(data).hexdigest()
+    assert (tmp_path / "upload").read_bytes() == data
+    assert hash_file(tmp_path / "upload", chunk_size=7) == digest
+
+def test_oversized_upload_is_abandoned_at_the_limit(tmp_path):
+    src = CountingReader(b"x" * 10_000)
+    with pytest.raises(UploadTooLargeError):
+        save_upload(src, tmp_path / "upload", max_bytes=2500, chunk_size=1000)
+    # Stopped reading at the first chunk past the limit, and left nothing behind
+    assert src.consumed == 3000
+    assert not (tmp_path / "upload").exists()
+
+def test_api_answers_413_for_oversized_uploads(client, png_bytes, monkeypatch):
+    monkeypatch.setattr(convert, "save_upload", functools.partial(save_upload, max_bytes=len(png_bytes) - 1))
+    response = client.post("/api/convert", params={"target_format": "jpg"},
+                           files={"file": ("photo.png", png_bytes, "image/png")})
+    assert response.status_code == 413
+    assert list(storage.list("input/")) == []
@@ -0,0 +1,91 @@
+import pytest
+from app.services.write_behind import WriteBehindQueue, MemorySink
+
+class FailingSink(MemorySink):
+    """MemorySink that raises until failures run out"""
+
+    def __init__(self, failures):
+        super().__init__()
+        self.failures = failures
+
+    def __call__(self, updates):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("sink unavailable")
+        super().__call__(updates)
+
+@pytest.fixture
+def make_queue():
+    queues = []
+
+    def make(sink, **kwargs):
+        # Long interval: the background flusher stays out of the way and tests flush by hand
+        queue = WriteBehindQueue(sink, flush_interval=60, **kwargs)
+        queues.append(queue)
+        return queue
+    yield make
+    for queue in queues:
+        queue.closed = True
+        queue.wakeup.set()
+
+def test_updates_between_flushes_are_coalesced_into_one_batch(make_queue):
+    sink = MemorySink()
+    queue = make_queue(sink)
+    queue.update("job1", {"status": "processing"})
+    queue.update("job1", {"status": "completed", "download_url": "/api/download/job1"})
+    queue.update("job2", {"status": "failed"})
+    assert sink.batches == []
+
+    assert queue.flush()
+    assert sink.batches == [{
+        "job1": {"status": "completed", "download_url": "/api/download/job1"},
+        "job2": {"status": "failed"},
+    }]
+    assert queue.stats["updates"] == 3 and queue.stats["coalesced"] == 1 and queue.stats["flushes"] == 1
+    # Nothing pending: no empty write
+    assert queue.flush()
+    assert len(sink.batches) == 1
+
+def test_close_flushes_what_is_pending(make_queue):
+    sink = MemorySink()
+    queue = make_queue(sink)
+    queue.update("job1", {"status": "completed"})
+    queue.close(timeout=1)
+
+    assert not queue.thread.is_alive()
+
+def test_failed_flush_is_retried_and_newer_updates_win(make_queue):
+    sink = FailingSink(failures=1)
+    queue = make_queue(sink)
+    queue.update("job1", {"status": "processing", "progress": 0.5})
+    assert not queue.flush()
+    assert queue.failures == 1 and queue._delay() == queue.backoff
+    queue.update("job1", {"status": "completed"})
+
+    assert queue.flush()
+    assert sink.batches == [{"job1": {"status": "completed", "progress": 0.5}}]
+    assert queue.failures == 0 and queue._delay() == queue.flush_interval
+
+def test_updates_are_dropped_after_max_retries(make_queue):
+    sink = FailingSink(failures=3)
+    queue = make_queue(sink, max_retries=2, backoff=1.0)
+    queue.update("job1", {"status": "completed"})
+    assert not queue.flush()
+    assert not queue.flush()
+    assert queue._delay() == 2.0
+    assert not queue.flush()
+    assert queue.pending == {} and queue.stats["dropped"] == 1 and queue.stats["failures"] == 3
+    # The sink recovers; later updates go through as usual
+    queue.update("job2", {"status": "failed"})
+    assert queue.flush()
+    assert sink.data == {"job2": {"status": "failed"}}
+
+def test_job_updates_go_through_the_configured_sink(monkeypatch):
+    from app.core import firebase
+    sink = MemorySink()
+    monkeypatch.setattr(firebase.job_update_writer, "sink", sink)
+    firebase.update_job("job1", {"status": "queued"})
+    firebase.update_job("job1", {"status": "completed"})
+    firebase.job_update_writer.flush()
+    # Other tests' updates may be in the same batch
+    assert sink.data["job1"] == {"status": "completed"}